@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+    
+    def ready(self):
+        # Connect the cache invalidation and login signal handlers
+        from . import caching  # noqa: F401
+        from . import middleware  # noqa: F401
@@ -0,0 +1,473 @@
+"""
+Database backups and restores.
+
+A backup is a gzip-compressed artifact plus a JSON manifest next to it that
+records checksums of both the artifact and the database it holds. SQLite
+databases are copied with the online backup API a few pages at a time, so
+the app keeps running during the backup. An incremental backup stores only
+the blocks that changed since the previous backup of the same database.
+MySQL databases are dumped with mysqldump, compressed as the dump arrives.
+"""
+
+import datetime
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import struct
+import subprocess
+import tempfile
+import time
+from collections import namedtuple
+from pathlib import Path
+
+MANIFEST_VERSION = 1
+
+FILENAME_PREFIX = 'bachatbuddy'
+
+# Bytes read and written at a time while copying, hashing and compressing
+CHUNK_SIZE = 1024 * 1024
+
+# gzip level 1 compresses about twice as fast as the usual 6 and the files
+# come out only slightly larger
+DEFAULT_COMPRESS_LEVEL = 1
+
+# Incremental backups compare the database in blocks of this many bytes
+BLOCK_SIZE = 1024 * 1024
+
+# Each changed block in an incremental artifact: block index, length, data
+BLOCK_HEADER = struct.Struct('>QI')
+
+Backup = namedtuple('Backup', ['manifest_path', 'manifest', 'steps', 'restarts', 'duration'])
+
+
+class BackupError(Exception):
+    """A backup or restore failed, or a backup did not pass verification"""
+
+
+class _HashingWriter:
+    """File wrapper that hashes everything written through it"""
+
+    def __init__(self, file):
+        self.file = file
+        self.sha256 = hashlib.sha256()
+
+    def write(self, data):
+        self.sha256.update(data)
+        return self.file.write(data)
+
+    def flush(self):
+        self.file.flush()
+
+
+def _sha256_file(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _fsync_directory(path):
+    if hasattr(os, 'O_DIRECTORY'):
+        fd = os.open(path, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+
+def _backup_name():
+    return f"{FILENAME_PREFIX}_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S_%f')}"
+
+
+def read_manifest(path):
+    try:
+        with open(path) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError) as e:
+        raise BackupError(f'Could not read manifest {path}: {e}')
+    if manifest.get('version') != MANIFEST_VERSION:
+        raise BackupError(f'{path} is not a version {MANIFEST_VERSION} backup manifest')
+    return manifest
+
+
+def write_manifest(path, manifest):
+    """Write a manifest atomically, so a half-written one is never picked up"""
+    temp = f'{path}.tmp'
+    with open(temp, 'w') as f:
+        json.dump(manifest, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp, path)
+
+
+def latest_manifest(directory, engine, database):
+    """Path of the newest manifest in directory for the given database, or None"""
+    candidates = []
+    for path in Path(directory).glob(f'{FILENAME_PREFIX}_*.json'):
+        try:
+            manifest = read_manifest(path)
+        except BackupError:
+            continue
+        if manifest['engine'] == engine and manifest['database'] == database:
+            candidates.append((manifest['created'], path))
+    return max(candidates)[1] if candidates else None
+
+
+def verify_artifact(directory, manifest):
+    """Check an artifact against the checksum in its manifest"""
+    path = os.path.join(directory, manifest['artifact'])
+    if not os.path.exists(path):
+        raise BackupError(f"Backup file {path} is missing")
+    if _sha256_file(path) != manifest['artifact_sha256']:
+        raise BackupError(f"Backup file {path} does not match its manifest checksum")
+    return path
+
+
+class _TooManyRestarts(Exception):
+    pass
+
+
+def sqlite_snapshot(source, target, pages=1024, pause=0.0, max_restarts=3):
+    """
+    Copy a live SQLite database to target with the online backup API.
+
+    Each step copies up to pages pages and holds a read lock on the source
+    only while it runs, and pause seconds are slept between steps to leave
+    the disk to the app. A write from another connection between steps makes
+    SQLite start the copy over, so under a steady stream of writes a stepped
+    copy may never finish; after max_restarts restarts the rest is copied in
+    a single step instead. In WAL mode that step does not block writers
+    either. Either way the result is a consistent snapshot.
+    Returns (steps, restarts).
+    """
+    steps = restarts = 0
+    last_remaining = None
+
+    def progress(status, remaining, total):
+        nonlocal steps, restarts, last_remaining
+        steps += 1
+        if last_remaining is not None and remaining > last_remaining:
+            restarts += 1
+            if restarts >= max_restarts:
+                raise _TooManyRestarts()
+        last_remaining = remaining
+        if pause and remaining:
+            time.sleep(pause)
+
+    src = sqlite3.connect(source)
+    dst = sqlite3.connect(target)
+    try:
+        try:
+            src.backup(dst, pages=pages, progress=progress)
+        except _TooManyRestarts:
+            src.backup(dst)
+            steps += 1
+        # The copy carries the source's journal mode; make it a plain file
+        # that opens without -wal and -shm companions
+        dst.execute('PRAGMA journal_mode=DELETE')
+    except sqlite3.Error as e:
+        raise BackupError(f'SQLite backup of {source} failed: {e}')
+    finally:
+        dst.close()
+        src.close()
+    return steps, restarts
+
+
+def _blocks(path, block_size):
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            yield block
+
+
+def _write_sqlite_artifact(snapshot, artifact, compress_level, base_blocks):
+    """
+    Compress a snapshot into artifact and return its checksums and block
+    hashes. With base_blocks, only blocks whose hash differs are written.
+    """
+    database_sha256 = hashlib.sha256()
+    blocks = []
+    changed = 0
+
+    with open(artifact, 'wb') as raw:
+        writer = _HashingWriter(raw)
+        with gzip.GzipFile(fileobj=writer, mode='wb', compresslevel=compress_level, mtime=0) as out:
+            for index, block in enumerate(_blocks(snapshot, BLOCK_SIZE)):
+                database_sha256.update(block)
+                digest = hashlib.sha256(block).hexdigest()
+                blocks.append(digest)
+
+                if base_blocks is None:
+                    out.write(block)
+                elif index >= len(base_blocks) or base_blocks[index] != digest:
+                    out.write(BLOCK_HEADER.pack(index, len(block)))
+                    out.write(block)
+                    changed += 1
+        raw.flush()
+        os.fsync(raw.fileno())
+
+    return {
+        'artifact_sha256': writer.sha256.hexdigest(),
+        'sha256': database_sha256.hexdigest(),
+        'size': os.path.getsize(snapshot),
+        'blocks': blocks,
+        'changed_blocks': changed if base_blocks is not None else len(blocks),
+    }
+
+
+def backup_sqlite(source, directory, incremental=False, pages=1024, pause=0.0, max_restarts=3,
+                  compress_level=DEFAULT_COMPRESS_LEVEL):
+    """Back up the SQLite database at source into directory and return a Backup"""
+    started = time.perf_counter()
+    source = os.path.abspath(source)
+    database = os.path.basename(source)
+    os.makedirs(directory, exist_ok=True)
+
+    base_path = base = None
+    if incremental:
+        base_path = latest_manifest(directory, 'sqlite', database)
+        if base_path is None:
+            raise BackupError(
+                f'No earlier backup of {database} in {directory} to build an incremental backup on'
+            )
+        base = read_manifest(base_path)
+        if base['block_size'] != BLOCK_SIZE:
+            raise BackupError(f'{base_path} was made with a different block size')
+
+    name = _backup_name()
+    artifact = os.path.join(directory, f"{name}.{'incr' if incremental else 'sqlite3'}.gz")
+
+    # The snapshot sits next to the backups, so it is on the same disk
+    # rather than in a possibly small temporary directory
+    fd, snapshot = tempfile.mkstemp(dir=directory, suffix='.snapshot')
+    os.close(fd)
+    try:
+        steps, restarts = sqlite_snapshot(
+            source,
+            snapshot,
+            pages=pages,
+            pause=pause,
+            max_restarts=max_restarts
+        )
+        details = _write_sqlite_artifact(
+            snapshot,
+            artifact,
+            compress_level,
+            base['blocks'] if base else None
+        )
+    except BaseException:
+        if os.path.exists(artifact):
+            os.remove(artifact)
+        raise
+    finally:
+        os.remove(snapshot)
+
+    manifest = {
+        'version': MANIFEST_VERSION,
+        'engine': 'sqlite',
+        'kind': 'incremental' if incremental else 'full',
+        'created': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        'database': database,
+        'artifact': os.path.basename(artifact),
+        'base': os.path.basename(base_path) if base_path else None,
+        'block_size': BLOCK_SIZE,
+        **details,
+    }
+    manifest_path = os.path.join(directory, f'{name}.json')
+    write_manifest(manifest_path, manifest)
+    _fsync_directory(directory)
+
+    return Backup(manifest_path, manifest, steps, restarts, time.perf_counter() - started)
+
+
+def backup_chain(manifest_path):
+    """Manifests needed to restore a backup, from its full backup onwards"""
+    directory = os.path.dirname(os.path.abspath(manifest_path))
+    chain = [read_manifest(manifest_path)]
+    seen = {os.path.basename(manifest_path)}
+    while chain[-1]['base']:
+        base = chain[-1]['base']
+        if base in seen:
+            raise BackupError(f'Backup chain of {manifest_path} loops back to {base}')
+        seen.add(base)
+        chain.append(read_manifest(os.path.join(directory, base)))
+    chain.reverse()
+    if chain[0]['kind'] != 'full':
+        raise BackupError(f'Backup chain of {manifest_path} does not start with a full backup')
+    return directory, chain
+
+
+def _database_is_ok(path):
+    connection = sqlite3.connect(path)
+    try:
+        return connection.execute('PRAGMA quick_check').fetchone()[0] == 'ok'
+    except sqlite3.DatabaseError:
+        return False
+    finally:
+        connection.close()
+
+
+def restore_sqlite(manifest_path, target):
+    """
+    Rebuild the database described by manifest_path and swap it in at target.
+
+    Every artifact in the chain is checked against its manifest first, and
+    the rebuilt file against the database checksum and SQLite's quick_check,
+    so target is only replaced by a verified copy. The swap is a rename on
+    the same file system. Nothing may have the database open while it runs.
+    """
+    directory, chain = backup_chain(manifest_path)
+    manifest = chain[-1]
+    if manifest['engine'] != 'sqlite':
+        raise BackupError(f"{manifest_path} is a {manifest['engine']} backup, not SQLite")
+    artifacts = [verify_artifact(directory, m) for m in chain]
+
+    target = os.path.abspath(target)
+    target_directory = os.path.dirname(target)
+    os.makedirs(target_directory, exist_ok=True)
+    fd, temp = tempfile.mkstemp(dir=target_directory, suffix='.restoring')
+    try:
+        with os.fdopen(fd, 'r+b') as out:
+            with gzip.open(artifacts[0], 'rb') as src:
+                shutil.copyfileobj(src, out, CHUNK_SIZE)
+
+            block_size = manifest['block_size']
+            for artifact in artifacts[1:]:
+                with gzip.open(artifact, 'rb') as src:
+                    while header := src.read(BLOCK_HEADER.size):
+                        index, length = BLOCK_HEADER.unpack(header)
+                        out.seek(index * block_size)
+                        out.write(src.read(length))
+
+            out.truncate(manifest['size'])
+            out.flush()
+            os.fsync(out.fileno())
+
+        if _sha256_file(temp) != manifest['sha256']:
+            raise BackupError(f'Restored database does not match the checksum in {manifest_path}')
+        if not _database_is_ok(temp):
+            raise BackupError(f'Restored database from {manifest_path} failed PRAGMA quick_check')
+
+        if os.path.exists(target):
+            # Fold any write-ahead log into the old file first; a log left
+            # next to the new file would be replayed into it
+            connection = sqlite3.connect(target)
+            try:
+                connection.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+            finally:
+                connection.close()
+        for suffix in ('-wal', '-shm', '-journal'):
+            if os.path.exists(target + suffix):
+                os.remove(target + suffix)
+
+        os.replace(temp, target)
+        _fsync_directory(target_directory)
+    except BaseException:
+        if os.path.exists(temp):
+            os.remove(temp)
+        raise
+
+    return manifest
+
+
+def _mysql_command(program, db_settings):
+    """Command line and environment for a MySQL client program"""
+    cmd = [
+        program,
+        f"--user={db_settings['USER']}",
+        f"--host={db_settings['HOST']}",
+        f"--port={db_settings['PORT']}",
+    ]
+    # Passed in the environment rather than on the visible command line
+    env = {**os.environ, 'MYSQL_PWD': db_settings['PASSWORD']}
+    return cmd, env
+
+
+def backup_mysql(db_settings, directory, compress_level=DEFAULT_COMPRESS_LEVEL):
+    """Dump a MySQL database with mysqldump, compressing as the dump arrives"""
+    started = time.perf_counter()
+    os.makedirs(directory, exist_ok=True)
+    name = _backup_name()
+    artifact = os.path.join(directory, f'{name}.sql.gz')
+
+    cmd, env = _mysql_command('mysqldump', db_settings)
+    cmd += ['--single-transaction', '--quick', '--lock-tables=false', db_settings['NAME']]
+
+    dump_sha256 = hashlib.sha256()
+    size = 0
+    try:
+        process = subprocess.Popen(cmd, stdout=subprocess.PIPE, env=env)
+    except OSError as e:
+        raise BackupError(f'Could not run mysqldump: {e}')
+    try:
+        with open(artifact, 'wb') as raw:
+            writer = _HashingWriter(raw)
+            with gzip.GzipFile(fileobj=writer, mode='wb', compresslevel=compress_level, mtime=0) as out:
+                for chunk in iter(lambda: process.stdout.read(CHUNK_SIZE), b''):
+                    dump_sha256.update(chunk)
+                    size += len(chunk)
+                    out.write(chunk)
+            raw.flush()
+            os.fsync(raw.fileno())
+        if process.wait() != 0:
+            raise BackupError(f'mysqldump exited with status {process.returncode}')
+    except BaseException:
+        process.kill()
+        process.wait()
+        if os.path.exists(artifact):
+            os.remove(artifact)
+        raise
+
+    manifest = {
+        'version': MANIFEST_VERSION,
+        'engine': 'mysql',
+        'kind': 'full',
+        'created': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        'database': db_settings['NAME'],
+        'artifact': os.path.basename(artifact),
+        'base': None,
+        'artifact_sha256': writer.sha256.hexdigest(),
+        'sha256': dump_sha256.hexdigest(),
+        'size': size,
+    }
+    manifest_path = os.path.join(directory, f'{name}.json')
+    write_manifest(manifest_path, manifest)
+
+    return Backup(manifest_path, manifest, 1, 0, time.perf_counter() - started)
+
+
+def restore_mysql(manifest_path, db_settings):
+    """Check a mysqldump backup against its manifest, then load it with mysql"""
+    manifest = read_manifest(manifest_path)
+    if manifest['engine'] != 'mysql':
+        raise BackupError(f"{manifest_path} is a {manifest['engine']} backup, not MySQL")
+    artifact = verify_artifact(os.path.dirname(os.path.abspath(manifest_path)), manifest)
+
+    # The dump is checked in full before any of it reaches the database
+    dump_sha256 = hashlib.sha256()
+    with gzip.open(artifact, 'rb') as src:
+        for chunk in iter(lambda: src.read(CHUNK_SIZE), b''):
+            dump_sha256.update(chunk)
+    if dump_sha256.hexdigest() != manifest['sha256']:
+        raise BackupError(f'Dump in {artifact} does not match the checksum in {manifest_path}')
+
+    cmd, env = _mysql_command('mysql', db_settings)
+    cmd.append(db_settings['NAME'])
+    try:
+        process = subprocess.Popen(cmd, stdin=subprocess.PIPE, env=env)
+    except OSError as e:
+        raise BackupError(f'Could not run mysql: {e}')
+    with gzip.open(artifact, 'rb') as src:
+        try:
+            shutil.copyfileobj(src, process.stdin, CHUNK_SIZE)
+        except BrokenPipeError:
+            pass
+        finally:
+            process.stdin.close()
+    if process.wait() != 0:
+        raise BackupError(f'mysql exited with status {process.returncode}')
+
+    return manifest
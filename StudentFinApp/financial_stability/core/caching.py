@@ -0,0 +1,162 @@
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Achievement, Budget, Category, SavingsGoal, Transaction, UserProfile
+from .services import SAVINGS_CATEGORY_KEY
+
+HITS_KEY = 'dashboard:stats:hits'
+MISSES_KEY = 'dashboard:stats:misses'
+
+
+def _version_key(scope):
+    return f'dashboard:version:{scope}'
+
+
+def _new_version():
+    # Versions start from the clock so a version key that was evicted can
+    # never come back with a number an older cached entry was stored under
+    return int(time.time() * 1000)
+
+
+def get_version(scope):
+    """Current data version for a user id, or for the shared 'categories' scope"""
+    key = _version_key(scope)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _new_version(), None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(scope):
+    """Invalidate everything cached under the current version of a scope"""
+    key = _version_key(scope)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, _new_version(), None)
+
+
+def invalidate_version(scope):
+    """
+    Bump a scope's version now and again when the current transaction commits.
+
+    The first bump lets the rest of the transaction see its own changes. Until
+    the commit other requests still read the old rows, and anything they cache
+    lands under the new version; the second bump retires it.
+    """
+    bump_version(scope)
+    transaction.on_commit(lambda: bump_version(scope))
+
+
+def data_version(user):
+    """Version string that changes whenever data shown on the user's pages changes"""
+    return f'{get_version(user.pk)}.{get_version("categories")}'
+
+
+def _count(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 0, None)
+        cache.incr(key)
+
+
+def _dashboard_version(user, now):
+    return f'{user.pk}:{now.year}-{now.month:02d}:{data_version(user)}'
+
+
+def _with_fragment_key(context, version):
+    # Template fragments are cached under the same version as the context
+    return {
+        **context,
+        'fragment_key': version,
+        'fragment_timeout': settings.DASHBOARD_CACHE_TIMEOUT,
+    }
+
+
+def get_dashboard_context(user, now, build):
+    """
+    Return the dashboard context for a user and month, computing it with
+    build() and caching it on a miss. The context also carries the
+    fragment_key and fragment_timeout that the template's {% cache %}
+    blocks vary on.
+    """
+    version = _dashboard_version(user, now)
+    key = f'dashboard:{version}'
+    context = cache.get(key)
+
+    if context is None:
+        _count(MISSES_KEY)
+        context = build()
+        cache.set(key, context, settings.DASHBOARD_CACHE_TIMEOUT)
+    else:
+        _count(HITS_KEY)
+
+    return _with_fragment_key(context, version)
+
+
+async def aget_dashboard_context(user, now, build):
+    """Async get_dashboard_context(); build is a coroutine function"""
+    version = await sync_to_async(_dashboard_version)(user, now)
+    key = f'dashboard:{version}'
+    context = await cache.aget(key)
+
+    if context is None:
+        await sync_to_async(_count)(MISSES_KEY)
+        context = await build()
+        await cache.aset(key, context, settings.DASHBOARD_CACHE_TIMEOUT)
+    else:
+        await sync_to_async(_count)(HITS_KEY)
+
+    return _with_fragment_key(context, version)
+
+
+def dashboard_cache_stats():
+    """Hit and miss counters for the dashboard cache"""
+    hits = cache.get(HITS_KEY, 0)
+    misses = cache.get(MISSES_KEY, 0)
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': round(hits / total, 4) if total else None,
+    }
+
+
+@receiver(post_save, sender=Transaction)
+@receiver(post_delete, sender=Transaction)
+@receiver(post_save, sender=Budget)
+@receiver(post_delete, sender=Budget)
+@receiver(post_save, sender=SavingsGoal)
+@receiver(post_delete, sender=SavingsGoal)
+@receiver(post_save, sender=Achievement)
+@receiver(post_delete, sender=Achievement)
+@receiver(post_save, sender=UserProfile)
+def invalidate_user_cache(sender, instance, **kwargs):
+    """Drop the cached pages of the user whose data changed"""
+    invalidate_version(instance.user_id)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_category_cache(sender, instance, **kwargs):
+    """Category names, icons and colors appear on every user's pages"""
+    invalidate_version('categories')
+    # The Savings category may have been deleted or renamed
+    cache.delete(SAVINGS_CATEGORY_KEY)
+    transaction.on_commit(lambda: cache.delete(SAVINGS_CATEGORY_KEY))
+
+
+@receiver(post_save, sender=User)
+def invalidate_new_user_cache(sender, instance, created, **kwargs):
+    """SQLite can hand a deleted user's id to a new account; never serve it old pages"""
+    if created:
+        bump_version(instance.pk)
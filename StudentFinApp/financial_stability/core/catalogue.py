@@ -0,0 +1,106 @@
+"""
+Process-wide catalogue of categories.
+
+Categories are shared by every user and almost never change, so forms,
+filters and the importer read them from here instead of the database. The
+catalogue is stored in Django's cache under the shared 'categories' data
+version, and each process also keeps the last one it loaded. Saving or
+deleting a Category bumps that version (see caching.invalidate_category_cache),
+so the next read in every process loads the catalogue again.
+"""
+
+from collections import namedtuple
+
+from django.core.cache import cache
+from django.utils.choices import BaseChoiceIterator
+
+from .caching import get_version
+from .models import Category
+
+# Old versions are never read again; let them expire eventually
+CATALOGUE_TIMEOUT = 24 * 60 * 60
+
+CategoryEntry = namedtuple('CategoryEntry', ['id', 'name', 'icon', 'color', 'is_expense'])
+
+
+class Catalogue:
+    """All categories at one data version, by id and by lowercased name"""
+
+    def __init__(self, version, entries):
+        self.version = version
+        self.entries = entries
+        self.by_id = {entry.id: entry for entry in entries}
+        self.by_name = {}
+        for entry in entries:
+            # The oldest category wins when two share a name
+            self.by_name.setdefault(entry.name.strip().lower(), entry.id)
+
+    def __iter__(self):
+        return iter(self.entries)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, pk):
+        return self.by_id.get(pk)
+
+    def id_for(self, name):
+        """Id of the category with this name, ignoring case and surrounding spaces"""
+        return self.by_name.get(name.strip().lower())
+
+    def filter(self, is_expense=None):
+        if is_expense is None:
+            return list(self.entries)
+        return [entry for entry in self.entries if entry.is_expense == is_expense]
+
+    def instance(self, pk):
+        """A Category built from the catalogue, good for assigning to a foreign key"""
+        entry = self.by_id[pk]
+        return Category.from_db(None, CategoryEntry._fields, entry)
+
+
+# The catalogue this process loaded last; replaced whole, never modified
+_loaded = None
+
+
+def _key(version):
+    return f'categories:catalogue:{version}'
+
+
+def get_catalogue():
+    """The current catalogue; one cache read when nothing has changed"""
+    global _loaded
+    version = get_version('categories')
+    catalogue = _loaded
+    if catalogue is not None and catalogue.version == version:
+        return catalogue
+
+    entries = cache.get(_key(version))
+    if entries is None:
+        entries = [
+            CategoryEntry(*row)
+            for row in Category.objects.order_by('id').values_list(*CategoryEntry._fields)
+        ]
+        cache.set(_key(version), entries, CATALOGUE_TIMEOUT)
+
+    catalogue = _loaded = Catalogue(version, entries)
+    return catalogue
+
+
+class CatalogueChoiceIterator(BaseChoiceIterator):
+    """Choices for a CategoryChoiceField, read from the catalogue when rendered"""
+
+    def __init__(self, field):
+        self.field = field
+
+    def __iter__(self):
+        if self.field.empty_label is not None:
+            yield ('', self.field.empty_label)
+        for entry in get_catalogue().filter(self.field.is_expense):
+            yield (entry.id, entry.name)
+
+    def __len__(self):
+        return len(get_catalogue().filter(self.field.is_expense)) + (self.field.empty_label is not None)
+
+    def __bool__(self):
+        return self.field.empty_label is not None or len(self) > 0
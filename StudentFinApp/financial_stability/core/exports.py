@@ -0,0 +1,110 @@
+import csv
+import json
+from decimal import Decimal
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+EXPORT_FORMATS = ('csv', 'json')
+
+# Rows fetched from the database per round trip
+EXPORT_CHUNK_SIZE = 2000
+
+# Rows joined into each chunk of the response body
+ROWS_PER_WRITE = 500
+
+TRANSACTION_EXPORT_HEADER = ('id', 'date', 'description', 'category', 'type', 'amount')
+
+REPORT_EXPORT_HEADER = ('month', 'income', 'expenses', 'savings', 'savings_rate')
+
+CENTS = Decimal('0.01')
+
+
+class Echo:
+    """File-like object whose write() hands back the line csv.writer produced"""
+
+    def write(self, value):
+        return value
+
+
+def _chunked(lines, size=ROWS_PER_WRITE):
+    """Join lines into larger pieces so the server is not called once per row"""
+    buffer = []
+    for line in lines:
+        buffer.append(line)
+        if len(buffer) >= size:
+            yield ''.join(buffer)
+            buffer = []
+    if buffer:
+        yield ''.join(buffer)
+
+
+def csv_lines(header, rows):
+    """Yield a CSV document one line at a time"""
+    writer = csv.writer(Echo())
+    yield writer.writerow(header)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def json_lines(header, rows):
+    """Yield a JSON array of objects one element at a time"""
+    yield '['
+    separator = ''
+    for row in rows:
+        yield separator + json.dumps(dict(zip(header, row)), cls=DjangoJSONEncoder)
+        separator = ','
+    yield ']'
+
+
+def transaction_rows(queryset, tz=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Yield export rows for a Transaction queryset, newest first.
+
+    Rows are read as tuples with values_list() and iterator(), so only one
+    chunk of rows is held in memory and no model instances are built.
+    Dates are written in tz; pass it from the view, since a streaming body
+    is produced after the request's timezone has been deactivated.
+    """
+    rows = (
+        queryset
+        .order_by('-date', '-id')
+        .values_list('id', 'date', 'description', 'category__name', 'is_expense', 'amount')
+        .iterator(chunk_size=chunk_size)
+    )
+    for pk, date, description, category, is_expense, amount in rows:
+        yield (
+            pk,
+            timezone.localtime(date, tz).isoformat(),
+            description,
+            category or '',
+            'expense' if is_expense else 'income',
+            amount,
+        )
+
+
+def report_rows(monthly_data):
+    """Yield export rows for monthly_rollup() output"""
+    for data in monthly_data:
+        yield (
+            f"{data['year']}-{data['month']:02d}",
+            data['income'].quantize(CENTS),
+            data['expenses'].quantize(CENTS),
+            data['savings'].quantize(CENTS),
+            data['savings_rate'],
+        )
+
+
+def streaming_export(header, rows, format, filename):
+    """Build a StreamingHttpResponse that writes rows as CSV or JSON"""
+    if format == 'json':
+        lines = json_lines(header, rows)
+        content_type = 'application/json'
+    else:
+        lines = csv_lines(header, rows)
+        content_type = 'text/csv'
+
+    response = StreamingHttpResponse(_chunked(lines), content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{filename}.{format}"'
+    return response
@@ -1,9 +1,46 @@
+import zoneinfo
+
 from django import forms
 from django.contrib.auth.forms import UserCreationForm, AuthenticationForm
 from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from .catalogue import CatalogueChoiceIterator, get_catalogue
 from .models import UserProfile, Transaction, Budget, Category, SavingsGoal
 from django.utils import timezone
 
+class CategoryChoiceField(forms.ModelChoiceField):
+    """
+    Category select whose options and validation come from the category
+    catalogue, so neither rendering nor validating a form queries categories.
+    Set is_expense to offer only expense or only income categories.
+    """
+    is_expense = None
+    
+    def _get_choices(self):
+        if hasattr(self, '_choices'):
+            return self._choices
+        return CatalogueChoiceIterator(self)
+    
+    choices = property(_get_choices, forms.ChoiceField.choices.fset)
+    
+    def to_python(self, value):
+        if value in self.empty_values:
+            return None
+        if isinstance(value, Category):
+            value = value.pk
+        catalogue = get_catalogue()
+        try:
+            entry = catalogue.get(int(value))
+        except (TypeError, ValueError):
+            entry = None
+        if entry is None or (self.is_expense is not None and entry.is_expense != self.is_expense):
+            raise ValidationError(
+                self.error_messages['invalid_choice'],
+                code='invalid_choice',
+                params={'value': value},
+            )
+        return catalogue.instance(entry.id)
+
 class CustomUserCreationForm(UserCreationForm):
     """Enhanced user registration form"""
     email = forms.EmailField(required=True)
@@ -48,15 +85,21 @@ class CustomAuthenticationForm(AuthenticationForm):
 
 class UserProfileForm(forms.ModelForm):
     """Form for editing user profile information"""
+    # Suggestions for the timezone input; a select of ~600 options renders slowly
+    timezone_names = sorted(zoneinfo.available_timezones())
     
     class Meta:
         model = UserProfile
-        fields = ['monthly_income', 'emergency_fund_goal', 'preferred_currency', 'dark_mode']
+        fields = ['monthly_income', 'emergency_fund_goal', 'preferred_currency', 'dark_mode', 'timezone']
         widgets = {
             'monthly_income': forms.NumberInput(attrs={'class': 'form-control'}),
             'emergency_fund_goal': forms.NumberInput(attrs={'class': 'form-control'}),
             'preferred_currency': forms.Select(attrs={'class': 'form-control'}),
             'dark_mode': forms.CheckboxInput(attrs={'class': 'form-check-input'}),
+            'timezone': forms.TextInput(attrs={'class': 'form-control', 'list': 'timezone-names'}),
+        }
+        help_texts = {
+            'timezone': "Months and dates are shown in this timezone, e.g. Asia/Karachi",
         }
 
 class TransactionForm(forms.ModelForm):
@@ -66,13 +109,10 @@ class TransactionForm(forms.ModelForm):
         self.user = kwargs.pop('user', None)
         super().__init__(*args, **kwargs)
         
-        # Filter categories by user and transaction type
-        if self.user:
-            self.fields['category'].queryset = Category.objects.all()  # We'll filter in the view
-    
     class Meta:
         model = Transaction
         fields = ['amount', 'description', 'category', 'date', 'is_expense']
+        field_classes = {'category': CategoryChoiceField}
         widgets = {
             'amount': forms.NumberInput(attrs={'class': 'form-control', 'step': '0.01'}),
             'description': forms.TextInput(attrs={'class': 'form-control'}),
@@ -90,10 +130,10 @@ class BudgetForm(forms.ModelForm):
         
         # Only show expense categories for budgets
         if self.user:
-            self.fields['category'].queryset = Category.objects.filter(is_expense=True)
+            self.fields['category'].is_expense = True
         
         # Set default month/year to current
-        now = timezone.now()
+        now = timezone.localtime()
         if not self.instance.pk:  # If creating new budget
             self.initial['month'] = now.month
             self.initial['year'] = now.year
@@ -101,6 +141,7 @@ class BudgetForm(forms.ModelForm):
     class Meta:
         model = Budget
         fields = ['category', 'amount', 'month', 'year']
+        field_classes = {'category': CategoryChoiceField}
         widgets = {
             'category': forms.Select(attrs={'class': 'form-control'}),
             'amount': forms.NumberInput(attrs={'class': 'form-control', 'step': '0.01'}),
@@ -111,6 +152,10 @@ class BudgetForm(forms.ModelForm):
 class SavingsGoalForm(forms.ModelForm):
     """Form for creating savings goals"""
     
+    def __init__(self, *args, **kwargs):
+        self.user = kwargs.pop('user', None)
+        super().__init__(*args, **kwargs)
+    
     class Meta:
         model = SavingsGoal
         fields = ['name', 'target_amount', 'current_amount', 'target_date']
@@ -148,4 +193,21 @@ class CategoryForm(forms.ModelForm):
             'icon': forms.TextInput(attrs={'class': 'form-control'}),
             'color': forms.TextInput(attrs={'class': 'form-control', 'type': 'color'}),
             'is_expense': forms.CheckboxInput(attrs={'class': 'form-check-input'}),
-        } 
\ No newline at end of file
+        } 
+
+class TransactionImportForm(forms.Form):
+    """Form for uploading a bank export to import transactions from"""
+    FORMAT_CHOICES = [
+        ('auto', 'Detect from file name'),
+        ('csv', 'CSV (date, description, amount, category, type)'),
+        ('ofx', 'OFX / QFX'),
+    ]
+    
+    file = forms.FileField(
+        widget=forms.ClearableFileInput(attrs={'class': 'form-control', 'accept': '.csv,.ofx,.qfx'})
+    )
+    format = forms.ChoiceField(
+        choices=FORMAT_CHOICES,
+        initial='auto',
+        widget=forms.Select(attrs={'class': 'form-control'})
+    )
@@ -0,0 +1,248 @@
+import csv
+import io
+import os
+import re
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+
+from .caching import invalidate_version
+from .catalogue import get_catalogue
+from .forms import TransactionForm
+from .models import MonthlySummary, Transaction, month_bucket, user_timezone
+
+IMPORT_FORMATS = ('csv', 'ofx')
+
+# Only the first errors are kept for display; the rest are just counted
+MAX_REPORTED_ERRORS = 100
+
+OFX_FIELDS = ('TRNTYPE', 'DTPOSTED', 'TRNAMT', 'NAME', 'MEMO')
+OFX_DEBIT_TYPES = ('DEBIT', 'PAYMENT', 'CHECK', 'FEE', 'SRVCHG', 'ATM', 'POS', 'XFER', 'DIRECTDEBIT')
+
+
+def detect_format(filename):
+    """Guess the import format from a file name"""
+    extension = os.path.splitext(filename)[1].lower()
+    if extension in ('.ofx', '.qfx'):
+        return 'ofx'
+    return 'csv'
+
+
+def iter_csv_rows(stream):
+    """
+    Yield (row number, fields) for each line of a CSV export.
+
+    Expected columns are date, description, amount and optionally category
+    and type ("expense" or "income"). Without a type column negative amounts
+    are expenses and positive amounts are income.
+    """
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    reader = csv.DictReader(text)
+    if reader.fieldnames:
+        reader.fieldnames = [name.strip().lower() for name in reader.fieldnames]
+
+    for row in reader:
+        yield reader.line_num, {
+            'date': row.get('date'),
+            'description': row.get('description'),
+            'amount': row.get('amount'),
+            'category': row.get('category'),
+            'type': row.get('type'),
+        }
+
+
+def _ofx_tokens(text, chunk_size=64 * 1024):
+    """Yield (tag, value) pairs from OFX markup, reading it a chunk at a time"""
+    buffer = ''
+    while True:
+        chunk = text.read(chunk_size)
+        if not chunk:
+            break
+        parts = (buffer + chunk).split('<')
+        # The last tag may continue in the next chunk
+        buffer = parts.pop()
+        for part in parts:
+            if '>' in part:
+                tag, value = part.split('>', 1)
+                yield tag.strip().upper(), value.strip()
+
+    if '>' in buffer:
+        tag, value = buffer.split('>', 1)
+        yield tag.strip().upper(), value.strip()
+
+
+def _ofx_date(value):
+    """Convert an OFX date like 20240115093000.000[-5:EST] to ISO format"""
+    digits = re.match(r'\d{8,14}', value or '')
+    if not digits:
+        return value
+    digits = digits.group().ljust(14, '0')
+    return f'{digits[0:4]}-{digits[4:6]}-{digits[6:8]} {digits[8:10]}:{digits[10:12]}:{digits[12:14]}'
+
+
+def iter_ofx_rows(stream):
+    """
+    Yield (transaction number, fields) for each STMTTRN block of an OFX file.
+
+    Works for both the SGML (OFX 1.x, no closing tags) and XML variants.
+    """
+    text = io.TextIOWrapper(stream, encoding='utf-8', errors='replace')
+    current = None
+    number = 0
+
+    for tag, value in _ofx_tokens(text):
+        if tag == 'STMTTRN':
+            current = {}
+        elif tag == '/STMTTRN' and current is not None:
+            number += 1
+            amount = current.get('TRNAMT', '')
+            if current.get('TRNTYPE') in OFX_DEBIT_TYPES or amount.startswith('-'):
+                kind = 'expense'
+            else:
+                kind = 'income'
+            yield number, {
+                'date': _ofx_date(current.get('DTPOSTED')),
+                'description': current.get('NAME') or current.get('MEMO'),
+                'amount': amount,
+                'category': None,
+                'type': kind,
+            }
+            current = None
+        elif current is not None and tag in OFX_FIELDS:
+            current[tag] = value
+
+
+def iter_rows(stream, format):
+    """Yield (row number, fields) from a binary file in the given format"""
+    if format == 'ofx':
+        return iter_ofx_rows(stream)
+    return iter_csv_rows(stream)
+
+
+class ImportResult:
+    """Counters and reported errors for one import run"""
+
+    def __init__(self):
+        self.rows = 0
+        self.created = 0
+        self.error_count = 0
+        self.errors = []
+
+    def add_error(self, row, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((row, message))
+
+
+class TransactionImporter:
+    """
+    Validate parsed rows and insert them for a user in batches.
+
+    Rows go through the same field validation as TransactionForm, and a
+    row's category must be of the row's type. Each batch is written with
+    one bulk_create inside its own database transaction, together with the
+    matching MonthlySummary updates, so memory use stays at one batch no
+    matter how large the file is.
+    """
+
+    def __init__(self, user, batch_size=1000, progress=None):
+        self.user = user
+        self.batch_size = batch_size
+        self.progress = progress
+        self.fields = TransactionForm.base_fields
+        self.categories = get_catalogue()
+        self.timezone = user_timezone(user.pk)
+
+    def clean(self, fields):
+        """Return an unsaved Transaction for a parsed row or raise ValidationError"""
+        amount = (fields.get('amount') or '').strip().replace(',', '')
+        kind = (fields.get('type') or '').strip().lower()
+        if kind not in ('', 'expense', 'income'):
+            raise ValidationError(f'Unknown type "{kind}", expected expense or income')
+
+        amount = self.fields['amount'].clean(amount)
+        if kind:
+            is_expense = kind == 'expense'
+        else:
+            is_expense = amount < 0
+        amount = abs(amount)
+        if amount == 0:
+            raise ValidationError('Amount must not be zero')
+
+        category_name = (fields.get('category') or '').strip()
+        category_id = None
+        if category_name:
+            category_id = self.categories.id_for(category_name)
+            if category_id is None:
+                raise ValidationError(f'Unknown category "{category_name}"')
+            if self.categories.get(category_id).is_expense != is_expense:
+                kind = 'an expense' if is_expense else 'an income'
+                raise ValidationError(f'"{category_name}" is not {kind} category')
+
+        # Dates without an offset are the user's local dates, whatever
+        # timezone is active (the import command runs in UTC)
+        with timezone.override(self.timezone):
+            date = self.fields['date'].clean((fields.get('date') or '').strip())
+        return Transaction(
+            user=self.user,
+            category_id=category_id,
+            amount=amount,
+            description=self.fields['description'].clean((fields.get('description') or '').strip()),
+            date=date,
+            is_expense=is_expense,
+            year_month=month_bucket(date, self.timezone),
+        )
+
+    def run(self, rows):
+        """Import (row number, fields) pairs and return an ImportResult"""
+        result = ImportResult()
+        batch = []
+
+        try:
+            for number, fields in rows:
+                result.rows += 1
+                try:
+                    batch.append(self.clean(fields))
+                except ValidationError as error:
+                    result.add_error(number, '; '.join(error.messages))
+                    continue
+
+                if len(batch) >= self.batch_size:
+                    self.write(batch, result)
+                    batch = []
+
+            if batch:
+                self.write(batch, result)
+        finally:
+            # bulk_create skips the signals that invalidate cached pages
+            if result.created:
+                invalidate_version(self.user.pk)
+
+        return result
+
+    def write(self, batch, result):
+        """Insert one batch and add it to the monthly summaries atomically"""
+        totals = {}
+        for entry in batch:
+            key = (entry.year_month, entry.category_id, entry.is_expense)
+            if key not in totals:
+                totals[key] = [Decimal('0'), 0]
+            totals[key][0] += entry.amount
+            totals[key][1] += 1
+
+        with transaction.atomic():
+            Transaction.objects.bulk_create(batch)
+            for (bucket, category_id, is_expense), (amount, count) in totals.items():
+                MonthlySummary.objects.record(self.user.pk, bucket, category_id, is_expense, amount, count)
+
+        result.created += len(batch)
+        if self.progress:
+            self.progress(result)
+
+
+def import_transactions(user, stream, format='csv', batch_size=1000, progress=None):
+    """Stream a CSV or OFX file into the user's transactions"""
+    importer = TransactionImporter(user, batch_size=batch_size, progress=progress)
+    return importer.run(iter_rows(stream, format))
@@ -1,11 +1,11 @@
-import os
-import datetime
-import subprocess
 from django.core.management.base import BaseCommand, CommandError
-from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from core.backups import DEFAULT_COMPRESS_LEVEL, BackupError, backup_mysql, backup_sqlite
+
 
 class Command(BaseCommand):
-    help = 'Backup MySQL database to a file'
+    help = 'Back up the database to a compressed file with a checksum manifest'
 
     def add_arguments(self, parser):
         parser.add_argument(
@@ -13,61 +13,90 @@ class Command(BaseCommand):
             default='backups',
             help='Directory where backups will be stored',
         )
-        
+
         parser.add_argument(
             '--compress',
             action='store_true',
-            help='Compress the backup file with gzip',
+            help='Backups are always compressed; kept so existing scripts keep working',
+        )
+
+        parser.add_argument(
+            '--compress-level',
+            type=int,
+            default=DEFAULT_COMPRESS_LEVEL,
+            choices=range(1, 10),
+            metavar='{1-9}',
+            help='gzip compression level; lower is faster, higher is smaller',
+        )
+
+        parser.add_argument(
+            '--incremental',
+            action='store_true',
+            help='SQLite only: store only what changed since the last backup in --output-dir',
+        )
+
+        parser.add_argument(
+            '--pages',
+            type=int,
+            default=1024,
+            help='SQLite only: database pages copied per step of the online backup',
+        )
+
+        parser.add_argument(
+            '--pause',
+            type=float,
+            default=0.0,
+            help='SQLite only: seconds to wait between steps, leaving the disk to the app',
+        )
+
+        parser.add_argument(
+            '--database',
+            default=DEFAULT_DB_ALIAS,
+            help='Database alias to back up',
         )
 
     def handle(self, *args, **options):
-        # Create backup directory if it doesn't exist
-        output_dir = options['output_dir']
-        if not os.path.exists(output_dir):
-            os.makedirs(output_dir)
-        
-        # Generate backup filename with timestamp
-        timestamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
-        filename = f"bachatbuddy_{timestamp}.sql"
-        filepath = os.path.join(output_dir, filename)
-        
-        # Get database credentials from settings
-        db_settings = settings.DATABASES['default']
-        user = db_settings['USER']
-        password = db_settings['PASSWORD']
-        database = db_settings['NAME']
-        host = db_settings['HOST']
-        port = db_settings['PORT']
-        
-        # MySQL dump command
-        cmd = [
-            'mysqldump',
-            f'--user={user}',
-            f'--password={password}',
-            f'--host={host}',
-            f'--port={port}',
-            '--single-transaction',
-            '--quick',
-            '--lock-tables=false',
-            database
-        ]
-        
-        # Execute the backup
+        if options['pages'] == 0 or options['pause'] < 0:
+            raise CommandError('--pages must not be 0 and --pause must not be negative')
+
+        db_settings = connections[options['database']].settings_dict
+        engine = db_settings['ENGINE']
+
+        self.stdout.write('Starting database backup...')
         try:
-            with open(filepath, 'w') as f:
-                self.stdout.write(self.style.SUCCESS('Starting database backup...'))
-                subprocess.run(cmd, stdout=f, check=True)
-            
-            # Compress if requested
-            if options['compress']:
-                compress_cmd = ['gzip', filepath]
-                subprocess.run(compress_cmd, check=True)
-                filepath = f"{filepath}.gz"
-                self.stdout.write(self.style.SUCCESS(f'Backup compressed to {filepath}'))
-            
-            self.stdout.write(self.style.SUCCESS(f'Database backup completed: {filepath}'))
-            
-        except subprocess.CalledProcessError as e:
+            if engine == 'django.db.backends.sqlite3':
+                backup = backup_sqlite(
+                    db_settings['NAME'],
+                    options['output_dir'],
+                    incremental=options['incremental'],
+                    pages=options['pages'],
+                    pause=options['pause'],
+                    compress_level=options['compress_level']
+                )
+            elif engine == 'django.db.backends.mysql':
+                if options['incremental']:
+                    raise CommandError('--incremental is only supported for SQLite')
+                backup = backup_mysql(
+                    db_settings,
+                    options['output_dir'],
+                    compress_level=options['compress_level']
+                )
+            else:
+                raise CommandError(f'backup_db cannot back up {engine}; use sqlite or mysql')
+        except BackupError as e:
             raise CommandError(f'Database backup failed: {e}')
-        except Exception as e:
-            raise CommandError(f'An error occurred: {e}') 
\ No newline at end of file
+        except OSError as e:
+            raise CommandError(f'An error occurred: {e}')
+
+        manifest = backup.manifest
+        if manifest['kind'] == 'incremental':
+            self.stdout.write(
+                f"{manifest['changed_blocks']} of {len(manifest['blocks'])} blocks changed since {manifest['base']}"
+            )
+        if backup.restarts:
+            self.stdout.write(f'The copy restarted {backup.restarts} times because the database was written to')
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Database backup completed in {backup.duration:.2f}s: {manifest['artifact']} "
+            f"(manifest {backup.manifest_path})"
+        ))
@@ -0,0 +1,243 @@
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from financial_stability.database import database_config
+from core.backups import DEFAULT_COMPRESS_LEVEL, backup_sqlite, restore_sqlite
+from core.management.commands.benchmark_writes import percentile
+
+# Seconds of writes measured with no backup running, for comparison
+IDLE_SECONDS = 3
+
+# Pause between one writer's transactions, like requests arriving
+WRITE_INTERVAL = 0.005
+
+
+class Command(BaseCommand):
+    help = 'Time SQLite backups and restores of a large scratch database and their effect on concurrent writes'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--size-mb',
+            type=int,
+            default=2048,
+            help='Size of the scratch database in MiB',
+        )
+
+        parser.add_argument(
+            '--writers',
+            type=int,
+            default=4,
+            help='Threads writing to the database while backups run',
+        )
+
+        parser.add_argument(
+            '--pages',
+            type=int,
+            default=1024,
+            help='Pages per step for the stepped backup',
+        )
+
+        parser.add_argument(
+            '--pause',
+            type=float,
+            default=0.001,
+            help='Seconds between steps of the stepped backup',
+        )
+
+        parser.add_argument(
+            '--compress-level',
+            type=int,
+            default=DEFAULT_COMPRESS_LEVEL,
+            help='gzip compression level for the backups',
+        )
+
+        parser.add_argument(
+            '--directory',
+            help='Where to put the scratch database and backups (a temporary directory by default)',
+        )
+
+        parser.add_argument(
+            '--json',
+            dest='json_path',
+            help='Also write the results to this JSON file',
+        )
+
+    def handle(self, *args, **options):
+        if options['size_mb'] < 1 or options['writers'] < 1:
+            raise CommandError('--size-mb and --writers must be at least 1')
+
+        # The writers connect the way the app does with SQLite
+        sqlite_env = {**os.environ, 'DB_ENGINE': 'sqlite'}
+        init_command = database_config(sqlite_env, settings.BASE_DIR)['OPTIONS']['init_command']
+        self.pragmas = [pragma for pragma in init_command.split('; ') if pragma]
+
+        with tempfile.TemporaryDirectory(dir=options['directory']) as directory:
+            database = os.path.join(directory, 'scratch.sqlite3')
+            backups = os.path.join(directory, 'backups')
+
+            self.stdout.write(f"Creating a {options['size_mb']} MiB scratch database...")
+            self.create_database(database, options['size_mb'])
+
+            backup_options = {'compress_level': options['compress_level']}
+            phases = [
+                ('single step', lambda: backup_sqlite(database, backups, pages=-1, **backup_options)),
+                ('stepped', lambda: backup_sqlite(
+                    database,
+                    backups,
+                    pages=options['pages'],
+                    pause=options['pause'],
+                    **backup_options
+                )),
+                ('incremental', lambda: backup_sqlite(database, backups, incremental=True, **backup_options)),
+            ]
+
+            results = {}
+            with self.writers(database, options['writers']) as phase:
+                phase('idle')
+                time.sleep(IDLE_SECONDS)
+                results['idle'] = {'writes': phase.summary('idle')}
+
+                for name, run in phases:
+                    phase(name)
+                    backup = run()
+                    manifest = backup.manifest
+                    results[name] = {
+                        'seconds': round(backup.duration, 2),
+                        'mib_per_second': round(manifest['size'] / 2 ** 20 / backup.duration, 1),
+                        'steps': backup.steps,
+                        'restarts': backup.restarts,
+                        'artifact_mib': round(os.path.getsize(os.path.join(backups, manifest['artifact'])) / 2 ** 20, 1),
+                        'writes': phase.summary(name),
+                    }
+                    last = backup.manifest_path
+
+            # A restore replaces the file, so the app is not running
+            started = time.perf_counter()
+            restore_sqlite(last, os.path.join(directory, 'restored.sqlite3'))
+            results['restore'] = {'seconds': round(time.perf_counter() - started, 2)}
+
+        for name, result in results.items():
+            self.report(name, result)
+
+        if options['json_path']:
+            with open(options['json_path'], 'w') as f:
+                json.dump(results, f, indent=2)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Backed up a {options['size_mb']} MiB database with {options['writers']} concurrent writers"
+        ))
+
+    def connect(self, path):
+        connection = sqlite3.connect(path, isolation_level=None)
+        for pragma in self.pragmas:
+            connection.execute(pragma)
+        return connection
+
+    def create_database(self, path, size_mb):
+        """Rows of hex text, which compresses about as well as real data"""
+        connection = self.connect(path)
+        connection.execute('CREATE TABLE filler (data TEXT)')
+        connection.execute('CREATE TABLE writes (id INTEGER PRIMARY KEY, at REAL, payload TEXT)')
+        rows_per_batch = 10000
+        # Each row holds about 3 KiB
+        for _ in range(max(1, size_mb * 2 ** 20 // (3072 * rows_per_batch))):
+            connection.execute('BEGIN')
+            connection.execute(
+                'WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < ?) '
+                'INSERT INTO filler SELECT hex(randomblob(1536)) FROM n',
+                [rows_per_batch]
+            )
+            connection.execute('COMMIT')
+        connection.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+        connection.close()
+
+    def writers(self, path, count):
+        return _Writers(self, path, count)
+
+    def report(self, name, result):
+        parts = []
+        if 'seconds' in result:
+            parts.append(f"{result['seconds']:>7.2f} s")
+        if 'mib_per_second' in result:
+            parts.append(
+                f"{result['mib_per_second']:>6.1f} MiB/s  {result['artifact_mib']:>7.1f} MiB written  "
+                f"{result['steps']} steps, {result['restarts']} restarts"
+            )
+        writes = result.get('writes')
+        if writes:
+            parts.append(
+                f"writes: {writes['count']} at p50 {writes['p50_ms']} ms, p95 {writes['p95_ms']} ms, "
+                f"max {writes['max_ms']} ms"
+            )
+        self.stdout.write(f"{name:<12} " + '  '.join(parts))
+
+
+class _Writers:
+    """Threads inserting rows while they run, with latencies kept per phase"""
+
+    def __init__(self, command, path, count):
+        self.command = command
+        self.path = path
+        self.count = count
+        self.lock = threading.Lock()
+        self.latencies = {}
+        self.current = None
+        self.stopping = threading.Event()
+        self.failures = []
+
+    def __enter__(self):
+        self.threads = [threading.Thread(target=self.run) for _ in range(self.count)]
+        for thread in self.threads:
+            thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stopping.set()
+        for thread in self.threads:
+            thread.join()
+        if self.failures and exc_info[0] is None:
+            raise CommandError(f'A writer failed: {self.failures[0]!r}')
+
+    def __call__(self, name):
+        with self.lock:
+            self.current = name
+            self.latencies[name] = []
+
+    def run(self):
+        try:
+            connection = self.command.connect(self.path)
+            while not self.stopping.is_set():
+                started = time.perf_counter()
+                connection.execute('BEGIN IMMEDIATE')
+                connection.execute(
+                    'INSERT INTO writes (at, payload) VALUES (?, hex(randomblob(256)))',
+                    [time.time()]
+                )
+                connection.execute('COMMIT')
+                elapsed = (time.perf_counter() - started) * 1000
+                with self.lock:
+                    if self.current is not None:
+                        self.latencies[self.current].append(elapsed)
+                time.sleep(WRITE_INTERVAL)
+            connection.close()
+        except Exception as e:
+            self.failures.append(e)
+
+    def summary(self, name):
+        with self.lock:
+            samples = list(self.latencies[name])
+        if not samples:
+            return {'count': 0, 'p50_ms': None, 'p95_ms': None, 'max_ms': None}
+        return {
+            'count': len(samples),
+            'p50_ms': round(percentile(samples, 50), 2),
+            'p95_ms': round(percentile(samples, 95), 2),
+            'max_ms': round(max(samples), 2),
+        }
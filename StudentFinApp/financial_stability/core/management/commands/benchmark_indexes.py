@@ -0,0 +1,241 @@
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.db.models import Q, Sum
+from django.utils import timezone
+
+from core.caching import bump_version
+from core.models import Budget, Category, MonthlySummary, Transaction
+from core.reports import month_window, monthly_rollup
+
+from .benchmark_writes import scratch_database
+
+BENCH_PREFIX = 'bench_idx_'
+DATABASE_FILE = 'benchmark_indexes.sqlite3'
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed transactions into a scratch SQLite database and compare query plans '
+        'and timings with and without the Transaction indexes'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--transactions',
+            type=int,
+            default=1_000_000,
+            help='Number of transactions to seed',
+        )
+
+        parser.add_argument(
+            '--users',
+            type=int,
+            default=100,
+            help='Number of users the transactions are spread across',
+        )
+
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=5,
+            help='Number of timed runs per query',
+        )
+
+        parser.add_argument(
+            '--directory',
+            help='Create the scratch database in this directory instead of a temporary one',
+        )
+
+        parser.add_argument(
+            '--keep',
+            action='store_true',
+            help='Keep the seeded scratch database in --directory and reuse it on later runs',
+        )
+
+    def handle(self, *args, **options):
+        if options['users'] < 1 or options['transactions'] < options['users']:
+            raise CommandError('Need at least one user and one transaction per user')
+        if options['keep'] and not options['directory']:
+            raise CommandError('--keep needs a --directory to keep the scratch database in')
+
+        default = connections['default'].settings_dict
+        if default['ENGINE'] != 'django.db.backends.sqlite3':
+            raise CommandError('benchmark_indexes seeds a scratch SQLite database; DB_ENGINE is not sqlite')
+
+        self.repeat = options['repeat']
+
+        if options['directory']:
+            os.makedirs(options['directory'], exist_ok=True)
+            self.benchmark(options, options['directory'], default['OPTIONS'])
+        else:
+            with tempfile.TemporaryDirectory() as directory:
+                self.benchmark(options, directory, default['OPTIONS'])
+
+    def benchmark(self, options, directory, db_options):
+        """Run the comparison on a seeded database in directory"""
+        path = os.path.join(directory, DATABASE_FILE)
+
+        if os.path.exists(path):
+            self.stdout.write(f'Reusing the benchmark database at {path}')
+        else:
+            # Seed under another name so an interrupted run is never reused
+            partial = f'{path}.partial'
+            if os.path.exists(partial):
+                os.remove(partial)
+            with scratch_database(partial, db_options):
+                self.stdout.write('Creating a scratch database...')
+                call_command('migrate', verbosity=0, interactive=False)
+                self.seed(options['transactions'], options['users'])
+            os.replace(partial, path)
+
+        try:
+            with scratch_database(path, db_options):
+                self.compare()
+        finally:
+            if not options['keep']:
+                for suffix in ('', '-wal', '-shm'):
+                    if os.path.exists(path + suffix):
+                        os.remove(path + suffix)
+
+    def compare(self):
+        """Time the queries without the Transaction indexes, then with them"""
+        user = User.objects.filter(username__startswith=BENCH_PREFIX).order_by('id').first()
+        indexes = Transaction._meta.indexes
+
+        try:
+            with connection.schema_editor() as editor:
+                for index in indexes:
+                    editor.remove_index(Transaction, index)
+            self.analyze()
+            before = self.run_queries(user, 'without indexes')
+        finally:
+            with connection.schema_editor() as editor:
+                for index in indexes:
+                    editor.add_index(Transaction, index)
+            self.analyze()
+
+        after = self.run_queries(user, 'with indexes')
+
+        self.stdout.write(self.style.SUCCESS('\nSummary (median ms)'))
+        for name in before:
+            speedup = before[name] / after[name] if after[name] else float('inf')
+            self.stdout.write(f'{name:<32} {before[name]:>10.2f} {after[name]:>10.2f} {speedup:>8.1f}x')
+
+    def seed(self, total, user_count):
+        """Bulk insert benchmark users, categories and transactions"""
+        self.stdout.write(f'Seeding {total} transactions across {user_count} users...')
+        rng = random.Random(42)
+
+        users = User.objects.bulk_create([
+            User(username=f'{BENCH_PREFIX}{i}') for i in range(user_count)
+        ])
+        categories = Category.objects.bulk_create([
+            Category(name=f'{BENCH_PREFIX}{i}', icon='tag', is_expense=i > 1)
+            for i in range(12)
+        ])
+        # bulk_create skips the signal that reloads the category catalogue
+        bump_version('categories')
+
+        now = timezone.now()
+        Budget.objects.bulk_create([
+            Budget(user=user, category=category, amount=Decimal('500.00'), month=now.month, year=now.year)
+            for user in users
+            for category in categories
+            if category.is_expense
+        ])
+
+        batch = []
+        per_user = total // user_count
+        for user in users:
+            for _ in range(per_user):
+                category = rng.choice(categories)
+                batch.append(Transaction(
+                    user=user,
+                    category=category,
+                    amount=Decimal(rng.randint(100, 500000)) / 100,
+                    description='Benchmark transaction',
+                    date=now - timedelta(minutes=rng.randint(0, 5 * 365 * 24 * 60)),
+                    is_expense=category.is_expense,
+                ))
+                if len(batch) >= 10000:
+                    Transaction.objects.bulk_create(batch)
+                    batch = []
+        if batch:
+            Transaction.objects.bulk_create(batch)
+
+        # bulk_create skips the signals that keep the summaries current
+        MonthlySummary.objects.rebuild(users)
+
+    def analyze(self):
+        """Refresh planner statistics so plans reflect the current indexes"""
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def run_queries(self, user, label):
+        """Print plans and return median timings for the hot access paths"""
+        now = timezone.now()
+        month_start, month_end = month_window(1, now)
+        report_start, report_end = month_window(12, now)
+        category = Category.objects.filter(name__startswith=BENCH_PREFIX, is_expense=True).first()
+
+        queries = {
+            'dashboard: recent transactions': lambda: list(
+                Transaction.objects.filter(user=user).order_by('-date')[:5]
+            ),
+            'dashboard: monthly totals': lambda: Transaction.objects.filter(
+                user=user
+            ).between(month_start, month_end).totals(),
+            'dashboard: budget progress': lambda: list(
+                Budget.objects.filter(user=user).with_progress(now.year, now.month)
+            ),
+            'transactions: first page': lambda: list(
+                Transaction.objects.filter(user=user).order_by('-date', '-id')[:50]
+            ),
+            'transactions: category filter': lambda: list(
+                Transaction.objects.filter(user=user, category=category, is_expense=True).order_by('-date')[:50]
+            ),
+            'report: 12 month rollup': lambda: monthly_rollup(user, report_start, report_end),
+        }
+        explain = {
+            'dashboard: recent transactions': Transaction.objects.filter(user=user).order_by('-date')[:5],
+            'dashboard: monthly totals': Transaction.objects.filter(
+                user=user
+            ).between(month_start, month_end).values('user').annotate(
+                income=Sum('amount', filter=Q(is_expense=False)),
+                expenses=Sum('amount', filter=Q(is_expense=True)),
+            ),
+            'dashboard: budget progress': Budget.objects.filter(user=user).with_progress(now.year, now.month),
+            'transactions: first page': Transaction.objects.filter(user=user).order_by('-date', '-id')[:50],
+            'transactions: category filter': Transaction.objects.filter(
+                user=user, category=category, is_expense=True
+            ).order_by('-date')[:50],
+            'report: 12 month rollup': MonthlySummary.objects.filter(user=user).between(
+                report_start, report_end
+            ).values('year', 'month').annotate(total=Sum('total')),
+        }
+
+        self.stdout.write(self.style.SUCCESS(f'\n=== {label} ==='))
+        timings = {}
+        for name, run in queries.items():
+            run()  # Warm the page cache
+            samples = []
+            for _ in range(self.repeat):
+                started = time.perf_counter()
+                run()
+                samples.append((time.perf_counter() - started) * 1000)
+            timings[name] = statistics.median(samples)
+
+            self.stdout.write(f'\n{name}: {timings[name]:.2f} ms')
+            self.stdout.write(explain[name].explain())
+
+        return timings
@@ -0,0 +1,224 @@
+import json
+import statistics
+import threading
+import time
+import urllib.error
+import urllib.request
+from socketserver import ThreadingMixIn
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.core.wsgi import get_wsgi_application
+from django.db import connection
+from django.test import Client
+from django.urls import reverse
+
+# Benchmark name -> URL name
+ENDPOINTS = {
+    'dashboard': 'dashboard',
+    'transactions': 'transactions',
+    'budgets': 'budgets',
+    'report': 'income_expense_report',
+}
+
+
+class ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def percentile(samples, percent):
+    """Percentile of a list of samples, interpolating between ranks"""
+    if len(samples) == 1:
+        return samples[0]
+    return statistics.quantiles(samples, n=100, method='inclusive')[percent - 1]
+
+
+class Command(BaseCommand):
+    help = 'Drive the main views concurrently and report latency percentiles and throughput per endpoint'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--prefix',
+            default='load_',
+            help='Username prefix of the users to log in as (see generate_data)',
+        )
+
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=200,
+            help='Timed requests per endpoint',
+        )
+
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=4,
+            help='Number of concurrent workers',
+        )
+
+        parser.add_argument(
+            '--mode',
+            choices=['client', 'wsgi'],
+            default='client',
+            help='Call views through the test client or over HTTP to a local WSGI server',
+        )
+
+        parser.add_argument(
+            '--endpoint',
+            action='append',
+            dest='endpoints',
+            choices=list(ENDPOINTS),
+            help='Endpoint to benchmark; repeat for several (default: all)',
+        )
+
+        parser.add_argument(
+            '--json',
+            dest='json_path',
+            help='Also write the results to this JSON file',
+        )
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1 or options['concurrency'] < 1:
+            raise CommandError('--requests and --concurrency must be at least 1')
+
+        users = list(User.objects.filter(username__startswith=options['prefix']).order_by('id'))
+        if not users:
+            raise CommandError(
+                f"No users starting with '{options['prefix']}'; run generate_data first"
+            )
+
+        self.concurrency = options['concurrency']
+        self.users = users
+        self.server = None
+        if options['mode'] == 'wsgi':
+            self.start_server()
+
+        results = {}
+        try:
+            for name in options['endpoints'] or list(ENDPOINTS):
+                results[name] = self.run_endpoint(reverse(ENDPOINTS[name]), options['requests'])
+                self.report(name, results[name])
+        finally:
+            if self.server:
+                self.server.shutdown()
+
+        if options['json_path']:
+            with open(options['json_path'], 'w') as f:
+                json.dump(results, f, indent=2)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Benchmarked {len(results)} endpoints with {self.concurrency} workers ({options['mode']} mode)"
+        ))
+
+    def start_server(self):
+        """Serve the project on a free local port in a background thread"""
+        self.server = make_server(
+            '127.0.0.1',
+            0,
+            get_wsgi_application(),
+            server_class=ThreadingWSGIServer,
+            handler_class=QuietHandler
+        )
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.base_url = f'http://127.0.0.1:{self.server.server_port}'
+
+    def make_session(self, user):
+        """Return a function that GETs a path as the given user"""
+        client = Client()
+        client.force_login(user)
+
+        if not self.server:
+            return lambda path: client.get(path).status_code
+
+        cookie = f'{settings.SESSION_COOKIE_NAME}={client.cookies[settings.SESSION_COOKIE_NAME].value}'
+
+        def fetch(path):
+            request = urllib.request.Request(self.base_url + path, headers={'Cookie': cookie})
+            try:
+                with urllib.request.urlopen(request) as response:
+                    response.read()
+                    return response.status
+            except urllib.error.HTTPError as e:
+                return e.code
+
+        return fetch
+
+    def run_endpoint(self, path, total):
+        """Issue total requests to path across the workers and time them"""
+        latencies = []
+        errors = []
+        counter = iter(range(total))
+        lock = threading.Lock()
+        ready = threading.Barrier(self.concurrency + 1)
+
+        def worker(index):
+            try:
+                # Each worker logs in as its own slice of the users before timing starts
+                sessions = [self.make_session(user) for user in self.users[index::self.concurrency][:10]]
+                if not sessions:
+                    sessions = [self.make_session(self.users[index % len(self.users)])]
+                sessions[0](path)  # Warm up
+            except BaseException:
+                ready.abort()
+                connection.close()
+                raise
+
+            try:
+                ready.wait()
+
+                request_number = 0
+                while True:
+                    with lock:
+                        if next(counter, None) is None:
+                            break
+                    fetch = sessions[request_number % len(sessions)]
+                    request_number += 1
+
+                    started = time.perf_counter()
+                    status = fetch(path)
+                    elapsed = (time.perf_counter() - started) * 1000
+
+                    with lock:
+                        latencies.append(elapsed)
+                        if status >= 400:
+                            errors.append(status)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(self.concurrency)]
+        for thread in threads:
+            thread.start()
+        try:
+            ready.wait()
+        except threading.BrokenBarrierError:
+            for thread in threads:
+                thread.join()
+            raise CommandError(f'A worker failed while preparing to request {path}')
+        started = time.perf_counter()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        return {
+            'requests': len(latencies),
+            'errors': len(errors),
+            'p50_ms': round(percentile(latencies, 50), 2),
+            'p95_ms': round(percentile(latencies, 95), 2),
+            'p99_ms': round(percentile(latencies, 99), 2),
+            'throughput_rps': round(len(latencies) / elapsed, 2),
+        }
+
+    def report(self, name, result):
+        self.stdout.write(
+            f"{name:<14} {result['requests']:>6} req {result['errors']:>4} err  "
+            f"p50 {result['p50_ms']:>8.2f} ms  p95 {result['p95_ms']:>8.2f} ms  "
+            f"p99 {result['p99_ms']:>8.2f} ms  {result['throughput_rps']:>8.2f} req/s"
+        )
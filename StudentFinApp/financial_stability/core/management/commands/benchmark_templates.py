@@ -0,0 +1,130 @@
+import copy
+import json
+import statistics
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.http import QueryDict
+from django.template.backends.django import DjangoTemplates
+from django.test import RequestFactory
+from django.utils import timezone
+
+from core.views import assemble_report_context, build_dashboard_context, report_params, report_queries
+
+BASE_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+
+# (name, template loaders, whether {% cache %} fragments are kept). Django
+# wraps the project's loaders in the cached loader by default, so the
+# uncached row is a reference point the app never runs with
+CONFIGURATIONS = [
+    ('uncached (reference)', BASE_LOADERS, False),
+    ('cached loader (default)', [('django.template.loaders.cached.Loader', BASE_LOADERS)], False),
+    ('default + fragments', [('django.template.loaders.cached.Loader', BASE_LOADERS)], True),
+]
+
+
+def make_engine(loaders):
+    """A template engine like the project's, with the given loaders"""
+    params = copy.deepcopy(settings.TEMPLATES[0])
+    params.pop('BACKEND')
+    params['NAME'] = 'benchmark'
+    params['APP_DIRS'] = False
+    params['OPTIONS']['loaders'] = loaders
+    return DjangoTemplates(params)
+
+
+class Command(BaseCommand):
+    help = 'Time rendering of the dashboard and report templates with and without the widget fragment cache'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--prefix',
+            default='load_',
+            help='Username prefix of the user whose data is rendered (see generate_data)',
+        )
+
+        parser.add_argument(
+            '--renders',
+            type=int,
+            default=200,
+            help='Timed renders per page and configuration',
+        )
+
+        parser.add_argument(
+            '--json',
+            dest='json_path',
+            help='Also write the results to this JSON file',
+        )
+
+    def handle(self, *args, **options):
+        if options['renders'] < 1:
+            raise CommandError('--renders must be at least 1')
+
+        user = User.objects.filter(username__startswith=options['prefix']).order_by('id').first()
+        if user is None:
+            raise CommandError(
+                f"No users starting with '{options['prefix']}'; run generate_data first"
+            )
+
+        request = RequestFactory().get('/')
+        request.user = user
+
+        # Contexts are built once, so only template loading and rendering is timed
+        now = timezone.localtime()
+        params = report_params(QueryDict())
+        results = {name: query() for name, query in report_queries(user, params).items()}
+        pages = {
+            'dashboard': ('core/dashboard.html', build_dashboard_context(user, now)),
+            'report': ('core/income_expense_report.html', assemble_report_context(params, **results)),
+        }
+
+        report = {}
+        for page, (template_name, context) in pages.items():
+            report[page] = {}
+            for name, loaders, fragments in CONFIGURATIONS:
+                engine = make_engine(loaders)
+                render_context = {
+                    **context,
+                    'fragment_key': f'benchmark:{user.pk}:{time.time_ns()}',
+                    # A zero timeout makes every {% cache %} block render again
+                    'fragment_timeout': settings.DASHBOARD_CACHE_TIMEOUT if fragments else 0,
+                }
+                report[page][name] = self.time_renders(engine, template_name, render_context, request, options['renders'])
+
+            # Speed-ups are relative to Django's default, the cached loader
+            baseline = report[page]['cached loader (default)']['mean_ms']
+            for name, result in report[page].items():
+                result['speedup'] = round(baseline / result['mean_ms'], 2)
+                self.stdout.write(
+                    f"{page:<10} {name:<26} mean {result['mean_ms']:>7.3f} ms  "
+                    f"p95 {result['p95_ms']:>7.3f} ms  {result['speedup']:>5.2f}x"
+                )
+
+        if options['json_path']:
+            with open(options['json_path'], 'w') as f:
+                json.dump(report, f, indent=2)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Rendered each page {options['renders']} times per configuration"
+        ))
+
+    def time_renders(self, engine, template_name, context, request, renders):
+        """Load and render a template repeatedly and return timing statistics"""
+        # Warm up, filling the template and fragment caches where enabled
+        engine.get_template(template_name).render(context, request)
+
+        samples = []
+        for _ in range(renders):
+            started = time.perf_counter()
+            engine.get_template(template_name).render(context, request)
+            samples.append((time.perf_counter() - started) * 1000)
+
+        return {
+            'mean_ms': round(statistics.mean(samples), 3),
+            'p95_ms': round(statistics.quantiles(samples, n=20)[-1] if len(samples) > 1 else samples[0], 3),
+        }
@@ -0,0 +1,199 @@
+import json
+import os
+import shutil
+import statistics
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connections
+from django.db.models import F
+from django.db.transaction import atomic
+from django.utils import timezone
+
+from financial_stability.database import database_config
+from core.models import Category, SavingsGoal, Transaction
+
+# What an SQLite connection looks like without the settings from
+# financial_stability/database.py: rollback journal, deferred transactions
+# and the sqlite3 module's own 5 second busy timeout
+UNTUNED_OPTIONS = {}
+
+
+def percentile(samples, percent):
+    """Percentile of a list of samples, interpolating between ranks"""
+    if len(samples) == 1:
+        return samples[0]
+    return statistics.quantiles(samples, n=100, method='inclusive')[percent - 1]
+
+
+@contextmanager
+def scratch_database(path, db_options):
+    """Point the default database at a scratch file with the given OPTIONS"""
+    settings_dict = connections['default'].settings_dict
+    saved = {'NAME': settings_dict['NAME'], 'OPTIONS': settings_dict['OPTIONS']}
+
+    # Every thread's connection is built from this same dictionary
+    connections.close_all()
+    settings_dict.update(NAME=path, OPTIONS=db_options)
+    try:
+        yield
+    finally:
+        connections.close_all()
+        settings_dict.update(saved)
+
+
+class Command(BaseCommand):
+    help = 'Compare concurrent SQLite write throughput with and without the tuned connection settings'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--threads',
+            type=int,
+            default=8,
+            help='Number of concurrent writers',
+        )
+
+        parser.add_argument(
+            '--operations',
+            type=int,
+            default=200,
+            help='Savings contributions per writer',
+        )
+
+        parser.add_argument(
+            '--json',
+            dest='json_path',
+            help='Also write the results to this JSON file',
+        )
+
+    def handle(self, *args, **options):
+        if options['threads'] < 1 or options['operations'] < 1:
+            raise CommandError('--threads and --operations must be at least 1')
+
+        default = connections['default'].settings_dict
+        if default['ENGINE'] != 'django.db.backends.sqlite3':
+            raise CommandError('benchmark_writes measures SQLite settings; DB_ENGINE is not sqlite')
+
+        tuned_options = database_config(os.environ, settings.BASE_DIR)['OPTIONS']
+        self.threads = options['threads']
+        self.operations = options['operations']
+
+        results = {}
+        with tempfile.TemporaryDirectory() as directory:
+            template = os.path.join(directory, 'template.sqlite3')
+            with scratch_database(template, UNTUNED_OPTIONS):
+                self.stdout.write('Creating a scratch database...')
+                call_command('migrate', verbosity=0, interactive=False)
+
+            for name, db_options in (('untuned', UNTUNED_OPTIONS), ('tuned', tuned_options)):
+                path = os.path.join(directory, f'{name}.sqlite3')
+                shutil.copy(template, path)
+                with scratch_database(path, db_options):
+                    results[name] = self.run()
+                self.report(name, results[name])
+
+        if options['json_path']:
+            with open(options['json_path'], 'w') as f:
+                json.dump(results, f, indent=2)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Ran {self.threads} writers x {self.operations} contributions per configuration'
+        ))
+
+    def setup_writers(self):
+        """One user, savings goal and category per writer"""
+        now = timezone.now()
+        category = Category.objects.create(name='Savings', icon='piggy-bank', is_expense=True)
+        goals = []
+        for i in range(self.threads):
+            user = User.objects.create(username=f'writer_{i}')
+            goals.append(SavingsGoal.objects.create(
+                user=user,
+                name='Benchmark',
+                target_amount=Decimal('1000000.00'),
+                target_date=(now + timedelta(days=365)).date()
+            ))
+        connections.close_all()
+        return category, goals
+
+    def contribute(self, goal, category):
+        """A multi-statement write like a savings contribution: read, then write"""
+        with atomic():
+            goal = SavingsGoal.objects.get(pk=goal.pk)
+            SavingsGoal.objects.filter(pk=goal.pk).update(current_amount=F('current_amount') + 1)
+            Transaction.objects.create(
+                user_id=goal.user_id,
+                category=category,
+                amount=Decimal('1.00'),
+                description=f'Contribution to {goal.name}',
+                date=timezone.now(),
+                is_expense=True
+            )
+
+    def run(self):
+        category, goals = self.setup_writers()
+        latencies = []
+        errors = []
+        failures = []
+        lock = threading.Lock()
+        ready = threading.Barrier(self.threads + 1)
+
+        def worker(goal):
+            try:
+                ready.wait()
+                for _ in range(self.operations):
+                    started = time.perf_counter()
+                    try:
+                        self.contribute(goal, category)
+                    except OperationalError as e:
+                        with lock:
+                            errors.append(str(e))
+                        continue
+                    elapsed = (time.perf_counter() - started) * 1000
+                    with lock:
+                        latencies.append(elapsed)
+            except Exception as e:
+                failures.append(e)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=worker, args=(goal,)) for goal in goals]
+        for thread in threads:
+            thread.start()
+        ready.wait()
+        started = time.perf_counter()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        if failures:
+            raise CommandError(f'A writer failed: {failures[0]!r}')
+
+        return {
+            'operations': self.threads * self.operations,
+            'committed': len(latencies),
+            'locked_errors': sum('locked' in error for error in errors),
+            'errors': len(errors),
+            'p50_ms': round(percentile(latencies, 50), 2) if latencies else None,
+            'p95_ms': round(percentile(latencies, 95), 2) if latencies else None,
+            'throughput_ops': round(len(latencies) / elapsed, 2),
+        }
+
+    def report(self, name, result):
+        latency = (
+            f"p50 {result['p50_ms']:>8.2f} ms  p95 {result['p95_ms']:>8.2f} ms"
+            if result['committed'] else 'no writes committed'
+        )
+        self.stdout.write(
+            f"{name:<8} {result['committed']:>6}/{result['operations']:<6} committed "
+            f"{result['errors']:>5} errors ({result['locked_errors']} locked)  "
+            f"{latency}  {result['throughput_ops']:>8.2f} writes/s"
+        )
@@ -0,0 +1,226 @@
+import random
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from core.caching import bump_version
+from core.models import Budget, Category, MonthlySummary, SavingsGoal, Transaction, UserProfile
+from core.reports import add_months, month_start
+
+# (name, icon, color, is_expense, transactions per month, min amount, max amount)
+CATEGORY_PROFILES = [
+    ('Food', 'utensils', '#FF5733', True, 18, 40, 600),
+    ('Transportation', 'car', '#3498DB', True, 10, 20, 300),
+    ('Rent', 'home', '#9B59B6', True, 1, 4000, 12000),
+    ('Utilities', 'bolt', '#F1C40F', True, 2, 200, 1500),
+    ('Entertainment', 'film', '#2ECC71', True, 4, 100, 1200),
+    ('Education', 'graduation-cap', '#E74C3C', True, 1, 500, 5000),
+    ('Healthcare', 'medkit', '#1ABC9C', True, 0.5, 200, 3000),
+    ('Shopping', 'shopping-cart', '#F39C12', True, 3, 300, 4000),
+    ('Salary', 'wallet', '#27AE60', False, 1, 8000, 25000),
+    ('Freelance', 'laptop', '#16A085', False, 0.7, 1000, 8000),
+    ('Gifts', 'gift', '#E91E63', False, 0.3, 500, 3000),
+]
+
+GOAL_NAMES = ['Emergency Fund', 'New Laptop', 'Semester Fees', 'Trip Home', 'Bike', 'Phone']
+
+DEFAULT_PASSWORD = 'loadtest123'
+
+
+class Command(BaseCommand):
+    help = 'Generate users with realistic transaction histories, budgets and savings goals for load testing'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--users',
+            type=int,
+            default=100,
+            help='Number of users to generate',
+        )
+
+        parser.add_argument(
+            '--months',
+            type=int,
+            default=24,
+            help='Months of transaction history per user, including the current month',
+        )
+
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=42,
+            help='Random seed; the same seed always generates the same data',
+        )
+
+        parser.add_argument(
+            '--prefix',
+            default='load_',
+            help='Username prefix of the generated users',
+        )
+
+        parser.add_argument(
+            '--password',
+            default=DEFAULT_PASSWORD,
+            help='Password set for every generated user',
+        )
+
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Rows per bulk insert',
+        )
+
+        parser.add_argument(
+            '--clear',
+            action='store_true',
+            help='Delete previously generated users with the same prefix first',
+        )
+
+    def handle(self, *args, **options):
+        if options['users'] < 1 or options['months'] < 1:
+            raise CommandError('--users and --months must be at least 1')
+
+        prefix = options['prefix']
+        existing = User.objects.filter(username__startswith=prefix)
+        if options['clear']:
+            self.clear(existing)
+        elif existing.exists():
+            raise CommandError(f"Users starting with '{prefix}' already exist; use --clear to replace them")
+
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.now = timezone.now()
+
+        categories = self.get_categories()
+        users = self.create_users(prefix, options['users'], options['password'])
+        self.stdout.write(f'Created {len(users)} users')
+
+        count = self.create_transactions(users, categories, options['months'])
+        self.stdout.write(f'Created {count} transactions')
+
+        self.create_budgets(users, categories)
+        self.create_goals(users)
+
+        # bulk_create skips the signals that maintain summaries and caches
+        MonthlySummary.objects.rebuild(users)
+        for user in users:
+            bump_version(user.pk)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Generated {len(users)} users ('{prefix}0' to '{prefix}{len(users) - 1}', "
+            f"password '{options['password']}')"
+        ))
+
+    def clear(self, users):
+        """Delete generated users and their data"""
+        # Skip the per-row delete signals; the summaries go with the users
+        Transaction.objects.filter(user__in=users)._raw_delete(connection.alias)
+        users.delete()
+        self.stdout.write('Removed previously generated users')
+
+    def get_categories(self):
+        """Map each category profile to a Category, creating missing ones"""
+        categories = []
+        for name, icon, color, is_expense, frequency, low, high in CATEGORY_PROFILES:
+            category, _ = Category.objects.get_or_create(
+                name=name,
+                is_expense=is_expense,
+                defaults={'icon': icon, 'color': color}
+            )
+            categories.append((category, frequency, low, high))
+        return categories
+
+    def create_users(self, prefix, count, password):
+        # Hashing is slow on purpose, so every user shares one hash
+        password_hash = make_password(password)
+        with transaction.atomic():
+            users = User.objects.bulk_create([
+                User(username=f'{prefix}{i}', email=f'{prefix}{i}@example.com', password=password_hash)
+                for i in range(count)
+            ])
+            UserProfile.objects.bulk_create([
+                UserProfile(
+                    user=user,
+                    monthly_income=Decimal(self.rng.randrange(8000, 30000, 500)),
+                    emergency_fund_goal=Decimal(self.rng.randrange(10000, 60000, 5000))
+                )
+                for user in users
+            ])
+        return users
+
+    def create_transactions(self, users, categories, months):
+        """Insert each user's history month by month, in batches"""
+        batch = []
+        count = 0
+
+        for user in users:
+            # Spending habits differ from user to user
+            scale = self.rng.uniform(0.6, 1.5)
+            for offset in range(months):
+                year, month = add_months(self.now.year, self.now.month, -offset)
+                start = month_start(year, month)
+                end = min(month_start(*add_months(year, month, 1)), self.now)
+                seconds = int((end - start).total_seconds())
+                if seconds <= 0:
+                    continue
+
+                for category, frequency, low, high in categories:
+                    occurrences = int(frequency * scale) + (self.rng.random() < (frequency * scale) % 1)
+                    for _ in range(occurrences):
+                        batch.append(Transaction(
+                            user=user,
+                            category=category,
+                            amount=Decimal(self.rng.randint(low * 100, high * 100)) / 100,
+                            description=f'{category.name} {self.rng.randint(1, 999)}',
+                            date=start + timedelta(seconds=self.rng.randrange(seconds)),
+                            is_expense=category.is_expense
+                        ))
+
+                if len(batch) >= self.batch_size:
+                    Transaction.objects.bulk_create(batch)
+                    count += len(batch)
+                    batch = []
+
+        if batch:
+            Transaction.objects.bulk_create(batch)
+            count += len(batch)
+
+        return count
+
+    def create_budgets(self, users, categories):
+        """Budgets for the current month on most expense categories"""
+        budgets = []
+        for user in users:
+            for category, frequency, low, high in categories:
+                if category.is_expense and self.rng.random() < 0.7:
+                    typical = Decimal(frequency * (low + high) / 2)
+                    budgets.append(Budget(
+                        user=user,
+                        category=category,
+                        amount=typical.quantize(Decimal('1')) or Decimal('100'),
+                        month=self.now.month,
+                        year=self.now.year
+                    ))
+        Budget.objects.bulk_create(budgets, batch_size=self.batch_size)
+
+    def create_goals(self, users):
+        goals = []
+        for user in users:
+            for name in self.rng.sample(GOAL_NAMES, self.rng.randint(1, 4)):
+                target = Decimal(self.rng.randrange(5000, 100000, 1000))
+                current = (target * Decimal(self.rng.uniform(0, 1.1))).quantize(Decimal('0.01'))
+                goals.append(SavingsGoal(
+                    user=user,
+                    name=name,
+                    target_amount=target,
+                    current_amount=min(current, target),
+                    target_date=(self.now + timedelta(days=self.rng.randint(30, 720))).date(),
+                    is_completed=current >= target
+                ))
+        SavingsGoal.objects.bulk_create(goals, batch_size=self.batch_size)
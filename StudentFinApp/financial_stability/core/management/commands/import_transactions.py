@@ -0,0 +1,68 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from core.importers import IMPORT_FORMATS, detect_format, import_transactions
+
+
+class Command(BaseCommand):
+    help = 'Import transactions for a user from a CSV or OFX bank export'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path',
+            help='CSV or OFX file to import',
+        )
+        
+        parser.add_argument(
+            '--user',
+            required=True,
+            help='Username the transactions belong to',
+        )
+        
+        parser.add_argument(
+            '--format',
+            choices=IMPORT_FORMATS,
+            help='File format (detected from the file name by default)',
+        )
+        
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Number of rows written per database transaction',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f"User '{options['user']}' does not exist")
+        
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1')
+        
+        format = options['format'] or detect_format(options['path'])
+        
+        def progress(result):
+            self.stdout.write(f'{result.rows} rows read, {result.created} imported, {result.error_count} errors')
+        
+        try:
+            with open(options['path'], 'rb') as stream:
+                result = import_transactions(
+                    user,
+                    stream,
+                    format,
+                    batch_size=options['batch_size'],
+                    progress=progress
+                )
+        except OSError as e:
+            raise CommandError(f'Could not read {options["path"]}: {e}')
+        
+        for row, message in result.errors:
+            self.stderr.write(f'Row {row}: {message}')
+        if result.error_count > len(result.errors):
+            self.stderr.write(f'... and {result.error_count - len(result.errors)} more errors')
+        
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {result.created} of {result.rows} rows for {user.username}'
+        ))
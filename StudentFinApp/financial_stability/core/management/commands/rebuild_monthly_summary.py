@@ -0,0 +1,48 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from core.models import MonthlySummary
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the monthly summary table from transactions, or check it for drift'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Only report rows that disagree with the transactions, without rebuilding',
+        )
+
+        parser.add_argument(
+            '--user',
+            action='append',
+            dest='usernames',
+            help='Limit to this username (can be repeated)',
+        )
+
+    def handle(self, *args, **options):
+        users = None
+        if options['usernames']:
+            users = User.objects.filter(username__in=options['usernames'])
+            missing = set(options['usernames']) - set(users.values_list('username', flat=True))
+            if missing:
+                raise CommandError(f'Unknown user(s): {", ".join(sorted(missing))}')
+
+        if options['check']:
+            drift = MonthlySummary.objects.drift(users)
+            for (user_id, year, month, category_id, is_expense), stored, expected in drift:
+                kind = 'expense' if is_expense else 'income'
+                self.stdout.write(
+                    f'user={user_id} {year}-{month:02d} category={category_id} {kind}: '
+                    f'stored={stored} expected={expected}'
+                )
+            if drift:
+                raise CommandError(f'{len(drift)} monthly summary row(s) have drifted')
+            self.stdout.write(self.style.SUCCESS('Monthly summaries match the transactions'))
+            return
+
+        MonthlySummary.objects.rebuild(users)
+        self.stdout.write(self.style.SUCCESS(
+            f'Monthly summaries rebuilt: {MonthlySummary.objects.count()} rows'
+        ))
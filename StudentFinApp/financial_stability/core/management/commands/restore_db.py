@@ -0,0 +1,75 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from core.backups import BackupError, restore_mysql, restore_sqlite
+
+
+class Command(BaseCommand):
+    help = 'Restore the database from a backup made by backup_db, after verifying its checksums'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'manifest',
+            help='Manifest (.json) of the backup to restore; incremental backups bring their chain along',
+        )
+
+        parser.add_argument(
+            '--database',
+            default=DEFAULT_DB_ALIAS,
+            help='Database alias to restore into',
+        )
+
+        parser.add_argument(
+            '--target',
+            help='SQLite only: database file to replace (the alias\'s NAME by default)',
+        )
+
+        parser.add_argument(
+            '--noinput',
+            '--no-input',
+            action='store_false',
+            dest='interactive',
+            help='Do not ask for confirmation',
+        )
+
+    def handle(self, *args, **options):
+        connection = connections[options['database']]
+        db_settings = connection.settings_dict
+        engine = db_settings['ENGINE']
+
+        if engine == 'django.db.backends.sqlite3':
+            target = options['target'] or str(db_settings['NAME'])
+        elif engine == 'django.db.backends.mysql':
+            if options['target']:
+                raise CommandError('--target is only supported for SQLite')
+            target = db_settings['NAME']
+        else:
+            raise CommandError(f'restore_db cannot restore {engine}; use sqlite or mysql')
+
+        if options['interactive']:
+            confirm = input(
+                f'This will replace the database {target} with the backup in {options["manifest"]}.\n'
+                "Stop the app first. Type 'yes' to continue, or 'no' to cancel: "
+            )
+            if confirm != 'yes':
+                raise CommandError('Restore cancelled.')
+
+        started = time.perf_counter()
+        # The restored file replaces the old one, which must not stay open
+        connection.close()
+        try:
+            if engine == 'django.db.backends.sqlite3':
+                manifest = restore_sqlite(options['manifest'], target)
+            else:
+                manifest = restore_mysql(options['manifest'], db_settings)
+        except BackupError as e:
+            raise CommandError(f'Restore failed: {e}')
+        except OSError as e:
+            raise CommandError(f'An error occurred: {e}')
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Restored {target} from {manifest['artifact']} ({manifest['created']}) "
+            f"in {time.perf_counter() - started:.2f}s"
+        ))
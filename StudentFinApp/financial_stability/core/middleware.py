@@ -0,0 +1,342 @@
+import logging
+import random
+import threading
+import time
+import warnings
+import zoneinfo
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.auth.signals import user_logged_in
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.utils import timezone
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+from .models import user_timezone
+
+logger = logging.getLogger('core.metrics')
+
+# Recorder of the request being measured; context variables follow the
+# request into sync_to_async threads, so queries run there are counted too
+_current_recorder = ContextVar('query_recorder', default=None)
+
+# Longest SQL text kept for the slowest statement of a view
+MAX_SQL_LENGTH = 500
+
+# Session entry holding the signed-in user's timezone name
+TIMEZONE_SESSION_KEY = '_timezone'
+
+
+class QueryRecorder:
+    """Execute wrapper that counts and times every SQL statement it sees"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.count = 0
+        self.duration = 0.0
+        self.slowest_sql = None
+        self.slowest_duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - started
+            with self.lock:
+                self.count += 1
+                self.duration += duration
+                if duration >= self.slowest_duration:
+                    self.slowest_duration = duration
+                    self.slowest_sql = sql
+
+
+def record_query(execute, sql, params, many, context):
+    """Execute wrapper installed on every connection; a no-op outside sampled requests"""
+    recorder = _current_recorder.get()
+    if recorder is None:
+        return execute(sql, params, many, context)
+    return recorder(execute, sql, params, many, context)
+
+
+def install_query_recorder(connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+connection_created.connect(install_query_recorder)
+
+
+class ViewMetrics:
+    """Running totals for every sampled request to one URL name"""
+
+    def __init__(self):
+        self.requests = 0
+        self.queries = 0
+        self.max_queries = 0
+        self.sql_time = 0.0
+        self.wall_time = 0.0
+        self.max_wall_time = 0.0
+        self.slowest_sql = None
+        self.slowest_sql_time = 0.0
+
+    def add(self, recorder, wall_time):
+        self.requests += 1
+        self.queries += recorder.count
+        self.max_queries = max(self.max_queries, recorder.count)
+        self.sql_time += recorder.duration
+        self.wall_time += wall_time
+        self.max_wall_time = max(self.max_wall_time, wall_time)
+        if recorder.slowest_sql and recorder.slowest_duration >= self.slowest_sql_time:
+            self.slowest_sql_time = recorder.slowest_duration
+            self.slowest_sql = recorder.slowest_sql[:MAX_SQL_LENGTH]
+
+    def as_dict(self):
+        return {
+            'requests': self.requests,
+            'avg_queries': round(self.queries / self.requests, 2),
+            'max_queries': self.max_queries,
+            'avg_sql_ms': round(self.sql_time * 1000 / self.requests, 2),
+            'avg_wall_ms': round(self.wall_time * 1000 / self.requests, 2),
+            'max_wall_ms': round(self.max_wall_time * 1000, 2),
+            'slowest_sql_ms': round(self.slowest_sql_time * 1000, 2),
+            'slowest_sql': self.slowest_sql,
+        }
+
+
+class MetricsRegistry:
+    """Per-view metrics for this process"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.views = {}
+
+    def record(self, view_name, recorder, wall_time):
+        with self.lock:
+            if view_name not in self.views:
+                self.views[view_name] = ViewMetrics()
+            self.views[view_name].add(recorder, wall_time)
+
+    def report(self):
+        """Metrics per view, most total wall time first"""
+        with self.lock:
+            views = sorted(
+                self.views.items(),
+                key=lambda item: item[1].wall_time,
+                reverse=True
+            )
+            return {name: metrics.as_dict() for name, metrics in views}
+
+    def reset(self):
+        with self.lock:
+            self.views = {}
+
+
+registry = MetricsRegistry()
+
+
+class QueryMetricsMiddleware:
+    """
+    Record query count, SQL time, the slowest statement and wall time for a
+    sample of requests, aggregated per URL name.
+
+    Sampled requests are logged to the core.metrics logger (at WARNING when
+    they cross the slow request thresholds, INFO otherwise) and can carry a
+    Server-Timing header. Queries run while a streaming response is being
+    sent happen after this middleware returns and are not counted. Works
+    under both WSGI and ASGI without forcing async views onto a thread.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+        # Connections opened before this module was imported
+        for connection in connections.all(initialized_only=True):
+            install_query_recorder(connection)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+
+        if random.random() >= settings.QUERY_METRICS_SAMPLE_RATE:
+            return self.get_response(request)
+
+        recorder = QueryRecorder()
+        token = _current_recorder.set(recorder)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current_recorder.reset(token)
+
+        return self.finish(request, response, recorder, time.perf_counter() - started)
+
+    async def __acall__(self, request):
+        if random.random() >= settings.QUERY_METRICS_SAMPLE_RATE:
+            return await self.get_response(request)
+
+        recorder = QueryRecorder()
+        token = _current_recorder.set(recorder)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current_recorder.reset(token)
+
+        return self.finish(request, response, recorder, time.perf_counter() - started)
+
+    def finish(self, request, response, recorder, wall_time):
+        match = getattr(request, 'resolver_match', None)
+        view_name = match.view_name if match and match.view_name else 'unresolved'
+        registry.record(view_name, recorder, wall_time)
+
+        self.log(request, response, view_name, recorder, wall_time)
+
+        if settings.QUERY_METRICS_SERVER_TIMING:
+            response['Server-Timing'] = (
+                f'db;dur={recorder.duration * 1000:.2f};desc="{recorder.count} queries", '
+                f'total;dur={wall_time * 1000:.2f}'
+            )
+
+        return response
+
+    def log(self, request, response, view_name, recorder, wall_time):
+        slow = (
+            wall_time * 1000 >= settings.QUERY_METRICS_SLOW_MS
+            or recorder.count >= settings.QUERY_METRICS_MAX_QUERIES
+        )
+        level = logging.WARNING if slow else logging.INFO
+        if not logger.isEnabledFor(level):
+            return
+
+        metrics = {
+            'view': view_name,
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'queries': recorder.count,
+            'sql_ms': round(recorder.duration * 1000, 2),
+            'wall_ms': round(wall_time * 1000, 2),
+            'slowest_sql_ms': round(recorder.slowest_duration * 1000, 2),
+        }
+        logger.log(
+            level,
+            ' '.join(f'{key}={value}' for key, value in metrics.items()),
+            extra={'metrics': metrics, 'slowest_sql': recorder.slowest_sql}
+        )
+
+
+async def _read_chunks(file, block_size):
+    """Read a file in a worker thread, one block at a time"""
+    read = sync_to_async(file.read, thread_sensitive=False)
+    while chunk := await read(block_size):
+        yield chunk
+
+
+class StaticFilesMiddleware(WhiteNoiseMiddleware):
+    """
+    Serve collected static files with WhiteNoise under both WSGI and ASGI.
+
+    WhiteNoise sends the .br or .gz file built by collectstatic when the
+    client accepts it, and marks files with a content hash in their name as
+    immutable for WHITENOISE_MAX_AGE seconds. Its own middleware is sync
+    only, which would put every async view behind a thread; here async
+    requests look up the file directly and stream it from a worker thread.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, settings=settings):
+        with warnings.catch_warnings():
+            # STATIC_ROOT only exists once collectstatic has run. Development
+            # and tests don't need it, and in production a missing manifest
+            # already fails every page that links a static file.
+            warnings.filterwarnings('ignore', message='No directory at', category=UserWarning)
+            super().__init__(get_response, settings)
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            # Only in development; finds files on disk for every request
+            static_file = await sync_to_async(self.find_file, thread_sensitive=False)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is None:
+            return await self.get_response(request)
+
+        response = await sync_to_async(self.serve, thread_sensitive=False)(static_file, request)
+        if response.file_to_stream is not None:
+            # The file is still closed with the response
+            response.streaming_content = _read_chunks(response.file_to_stream, response.block_size)
+        return response
+
+
+@receiver(user_logged_in)
+def store_session_timezone(sender, request, user, **kwargs):
+    """Keep the user's timezone in the session for UserTimezoneMiddleware"""
+    if hasattr(request, 'session'):
+        request.session[TIMEZONE_SESSION_KEY] = user_timezone(user.pk).key
+
+
+class UserTimezoneMiddleware:
+    """
+    Activate the signed-in user's timezone for the request.
+
+    "This month", report windows and displayed times then use the same
+    calendar as the user's Transaction.year_month buckets. The name is read
+    from the session, where it is stored at login and when the profile
+    changes, so no extra query is needed. Sessions without it, such as ones
+    started before the timezone setting existed, use the cached timezone of
+    the signed-in user.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+
+        name = request.session.get(TIMEZONE_SESSION_KEY)
+        if not name and request.user.is_authenticated:
+            name = user_timezone(request.user.pk).key
+
+        with timezone.override(self.timezone(name)):
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        name = await request.session.aget(TIMEZONE_SESSION_KEY)
+        if not name:
+            user = await request.auser()
+            if user.is_authenticated:
+                name = (await sync_to_async(user_timezone)(user.pk)).key
+
+        with timezone.override(self.timezone(name)):
+            return await self.get_response(request)
+
+    def timezone(self, name):
+        # None keeps the default TIME_ZONE for anonymous requests
+        return zoneinfo.ZoneInfo(name) if name else None
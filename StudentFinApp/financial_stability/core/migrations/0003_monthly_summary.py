@@ -0,0 +1,65 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:18
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncMonth
+
+
+def populate_summaries(apps, schema_editor):
+    """Build the summary rows for transactions that already exist"""
+    Transaction = apps.get_model('core', 'Transaction')
+    MonthlySummary = apps.get_model('core', 'MonthlySummary')
+
+    rows = (
+        Transaction.objects
+        .annotate(period=TruncMonth('date'))
+        .values('user', 'period', 'category', 'is_expense')
+        .annotate(total=Sum('amount'), transaction_count=Count('id'))
+        .order_by()
+    )
+    MonthlySummary.objects.bulk_create(
+        (
+            MonthlySummary(
+                user_id=row['user'],
+                year=row['period'].year,
+                month=row['period'].month,
+                category_id=row['category'],
+                is_expense=row['is_expense'],
+                total=row['total'],
+                transaction_count=row['transaction_count'],
+            )
+            for row in rows.iterator()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_transaction_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MonthlySummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.IntegerField()),
+                ('month', models.IntegerField()),
+                ('is_expense', models.BooleanField()),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('transaction_count', models.IntegerField(default=0)),
+                ('category', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='monthly_summaries', to='core.category')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='monthly_summaries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name_plural': 'Monthly summaries',
+                'constraints': [models.UniqueConstraint(fields=('user', 'year', 'month', 'category', 'is_expense'), name='core_summary_unique_key'), models.UniqueConstraint(condition=models.Q(('category__isnull', True)), fields=('user', 'year', 'month', 'is_expense'), name='core_summary_unique_uncategorized')],
+            },
+        ),
+        migrations.RunPython(populate_summaries, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:50
+
+import core.models
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_monthly_summary'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='timezone',
+            field=models.CharField(default='UTC', help_text='Timezone whose calendar months transactions are counted in', max_length=63, validators=[core.models.validate_timezone]),
+        ),
+        # Nullable until 0005 has filled it in
+        migrations.AddField(
+            model_name='transaction',
+            name='year_month',
+            field=models.IntegerField(editable=False, null=True),
+        ),
+    ]
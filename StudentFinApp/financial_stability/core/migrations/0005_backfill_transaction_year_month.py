@@ -0,0 +1,58 @@
+import zoneinfo
+
+from django.conf import settings
+from django.db import migrations, transaction
+from django.utils import timezone
+
+BATCH_SIZE = 2000
+
+
+def backfill_year_month(apps, schema_editor):
+    """
+    Set year_month on existing transactions, in each owner's timezone.
+
+    Rows are walked in primary key order and each batch is written in its
+    own transaction, so a large table is never locked for long and an
+    interrupted run picks up where it stopped.
+    """
+    Transaction = apps.get_model('core', 'Transaction')
+    UserProfile = apps.get_model('core', 'UserProfile')
+
+    timezones = {
+        user_id: zoneinfo.ZoneInfo(name)
+        for user_id, name in UserProfile.objects.values_list('user_id', 'timezone')
+    }
+    default = zoneinfo.ZoneInfo(settings.TIME_ZONE)
+
+    last_pk = 0
+    while True:
+        rows = list(
+            Transaction.objects
+            .filter(pk__gt=last_pk, year_month__isnull=True)
+            .order_by('pk')
+            .values_list('pk', 'user_id', 'date')[:BATCH_SIZE]
+        )
+        if not rows:
+            break
+
+        batch = []
+        for pk, user_id, date in rows:
+            local = timezone.localtime(date, timezones.get(user_id, default))
+            batch.append(Transaction(pk=pk, year_month=local.year * 100 + local.month))
+        with transaction.atomic():
+            Transaction.objects.bulk_update(batch, ['year_month'])
+        last_pk = rows[-1][0]
+
+
+class Migration(migrations.Migration):
+
+    # Each batch commits on its own
+    atomic = False
+
+    dependencies = [
+        ('core', '0004_transaction_year_month_userprofile_timezone'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_year_month, migrations.RunPython.noop),
+    ]
@@ -1,7 +1,19 @@
-from django.db import models
+import zoneinfo
+from collections import namedtuple
+from datetime import datetime
+from decimal import Decimal
+from itertools import islice
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, models, transaction
+from django.db.models import Case, Count, F, FilteredRelation, Q, Sum, Value, When
+from django.db.models.functions import Cast, Ceil, Coalesce, Floor, Round
+from django.db.models.lookups import GreaterThan, GreaterThanOrEqual
 from django.contrib.auth.models import User
 from django.utils import timezone
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_init, post_save, pre_delete, pre_save
 from django.dispatch import receiver
 
 class Category(models.Model):
@@ -17,6 +29,11 @@ class Category(models.Model):
     def __str__(self):
         return self.name
 
+def validate_timezone(value):
+    """Accept IANA timezone names such as Asia/Karachi"""
+    if value not in zoneinfo.available_timezones():
+        raise ValidationError(f'"{value}" is not a known timezone')
+
 class UserProfile(models.Model):
     """Extended user profile with financial settings"""
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='profile')
@@ -24,6 +41,12 @@ class UserProfile(models.Model):
     emergency_fund_goal = models.DecimalField(max_digits=10, decimal_places=2, default=5000)
     preferred_currency = models.CharField(max_length=3, default="Rs.")
     dark_mode = models.BooleanField(default=False)
+    timezone = models.CharField(
+        max_length=63,
+        default='UTC',
+        validators=[validate_timezone],
+        help_text="Timezone whose calendar months transactions are counted in"
+    )
     
     def __str__(self):
         return f"{self.user.username}'s Profile"
@@ -31,33 +54,10 @@ class UserProfile(models.Model):
     def calculate_savings(self, year=None, month=None):
         """Calculate user's total savings"""
         if year and month:
-            # Calculate for specific month
-            income = Transaction.objects.filter(
-                user=self.user, 
-                is_expense=False,
-                date__year=year,
-                date__month=month
-            ).aggregate(models.Sum('amount'))['amount__sum'] or 0
-            
-            expenses = Transaction.objects.filter(
-                user=self.user, 
-                is_expense=True,
-                date__year=year,
-                date__month=month
-            ).aggregate(models.Sum('amount'))['amount__sum'] or 0
-        else:
-            # Calculate total
-            income = Transaction.objects.filter(
-                user=self.user, 
-                is_expense=False
-            ).aggregate(models.Sum('amount'))['amount__sum'] or 0
-            
-            expenses = Transaction.objects.filter(
-                user=self.user, 
-                is_expense=True
-            ).aggregate(models.Sum('amount'))['amount__sum'] or 0
-        
-        return income - expenses
+            # Calculate for specific month, one row per category and type
+            return MonthlySummary.objects.filter(user=self.user, year=year, month=month).totals().net
+        
+        return period_totals(self.user).net
 
 @receiver(post_save, sender=User)
 def create_user_profile(sender, instance, created, **kwargs):
@@ -70,6 +70,123 @@ def save_user_profile(sender, instance, **kwargs):
     """Save UserProfile when User is saved"""
     instance.profile.save()
 
+# A user's timezone is needed whenever one of their transactions is saved
+TIMEZONE_CACHE_KEY = 'profile:timezone:{}'
+
+def user_timezone(user_id):
+    """The timezone a user's transactions are bucketed into months in"""
+    key = TIMEZONE_CACHE_KEY.format(user_id)
+    name = cache.get(key)
+    if name is None:
+        name = (
+            UserProfile.objects.filter(user_id=user_id).values_list('timezone', flat=True).first()
+            or settings.TIME_ZONE
+        )
+        cache.set(key, name, None)
+    return zoneinfo.ZoneInfo(name)
+
+@receiver(post_init, sender=UserProfile)
+def remember_timezone(sender, instance, **kwargs):
+    instance._saved_timezone = instance.timezone if instance.pk else None
+
+@receiver(post_save, sender=UserProfile)
+def rebucket_on_timezone_change(sender, instance, created, **kwargs):
+    """Move the user's transactions into the months of their new timezone"""
+    if kwargs.get('raw') or instance.timezone == instance._saved_timezone:
+        return
+    
+    cache.delete(TIMEZONE_CACHE_KEY.format(instance.user_id))
+    if not created:
+        # caching imports this module
+        from .caching import invalidate_version
+        
+        tz = zoneinfo.ZoneInfo(instance.timezone)
+        with transaction.atomic():
+            Transaction.objects.filter(user_id=instance.user_id).rebucket(tz)
+            MonthlySummary.objects.rebuild([instance.user_id])
+        # Neither step sends the signals that drop the user's cached pages
+        invalidate_version(instance.user_id)
+    instance._saved_timezone = instance.timezone
+
+Totals = namedtuple('Totals', ['income', 'expenses', 'net', 'count'])
+
+def year_month(year, month):
+    """The Transaction.year_month bucket of a calendar month, e.g. 202405"""
+    return year * 100 + month
+
+def month_bucket(value, tz):
+    """The year_month bucket a transaction date falls in, read in the timezone tz"""
+    if isinstance(value, datetime) and timezone.is_aware(value):
+        value = timezone.localtime(value, tz)
+    return year_month(value.year, value.month)
+
+def _totals(aggregates):
+    income = aggregates['income'] or Decimal('0')
+    expenses = aggregates['expenses'] or Decimal('0')
+    return Totals(income, expenses, income - expenses, aggregates['count'] or 0)
+
+# Transaction and category columns the transaction listings display
+LISTING_FIELDS = (
+    'id', 'date', 'description', 'amount', 'is_expense',
+    'category', 'category__name', 'category__icon', 'category__color',
+)
+
+class TransactionQuerySet(models.QuerySet):
+    def for_listing(self):
+        """Rows for transaction listings, with their category joined in and only the displayed columns"""
+        return self.select_related('category').only(*LISTING_FIELDS)
+    
+    def in_month(self, year, month):
+        """Transactions in a calendar month of their user's timezone, by the indexed bucket"""
+        return self.filter(year_month=year_month(year, month))
+    
+    def bulk_create(self, objs, *args, **kwargs):
+        """bulk_create that fills in year_month, which save() would have set"""
+        objs = list(objs)
+        timezones = {}
+        for obj in objs:
+            if obj.year_month is None:
+                if obj.user_id not in timezones:
+                    timezones[obj.user_id] = user_timezone(obj.user_id)
+                obj.year_month = month_bucket(obj.date, timezones[obj.user_id])
+        return super().bulk_create(objs, *args, **kwargs)
+    
+    def rebucket(self, tz, batch_size=1000):
+        """Recompute year_month for the selected rows in tz, writing only the ones that moved"""
+        rows = self.order_by().values_list('pk', 'date', 'year_month').iterator(chunk_size=batch_size)
+        moved = (
+            (pk, month_bucket(date, tz))
+            for pk, date, bucket in rows
+            if month_bucket(date, tz) != bucket
+        )
+        count = 0
+        while batch := list(islice(moved, batch_size)):
+            # One UPDATE per month in the batch
+            buckets = {}
+            for pk, bucket in batch:
+                buckets.setdefault(bucket, []).append(pk)
+            for bucket, pks in buckets.items():
+                Transaction.objects.filter(pk__in=pks).update(year_month=bucket)
+            count += len(batch)
+        return count
+    
+    def between(self, start=None, end=None):
+        """Transactions dated in the half-open range [start, end); either end may be open"""
+        queryset = self
+        if start is not None:
+            queryset = queryset.filter(date__gte=start)
+        if end is not None:
+            queryset = queryset.filter(date__lt=end)
+        return queryset
+    
+    def totals(self):
+        """Return income, expenses, net and count over the selected rows in a single query"""
+        return _totals(self.aggregate(
+            income=Sum('amount', filter=Q(is_expense=False)),
+            expenses=Sum('amount', filter=Q(is_expense=True)),
+            count=Count('id')
+        ))
+
 class Transaction(models.Model):
     """Individual financial transaction"""
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='transactions')
@@ -78,14 +195,94 @@ class Transaction(models.Model):
     description = models.CharField(max_length=255)
     date = models.DateTimeField(default=timezone.now)
     is_expense = models.BooleanField(default=True)
+    # Calendar month of date in the user's timezone as year * 100 + month,
+    # so monthly queries are equality lookups on an index
+    year_month = models.IntegerField(editable=False)
+    
+    objects = TransactionQuerySet.as_manager()
     
     class Meta:
         ordering = ['-date']
+        indexes = [
+            # Listings and recent transactions: user filter, newest first
+            models.Index(fields=['user', '-date'], name='core_txn_user_date_idx'),
+            # Monthly income/expense totals and rollups
+            models.Index(fields=['user', 'is_expense', 'date'], name='core_txn_user_type_date_idx'),
+            # Budget spending per category and category filters
+            models.Index(fields=['user', 'category', 'is_expense', 'date'], name='core_txn_user_cat_date_idx'),
+            # Monthly totals and budget spending by month bucket
+            models.Index(fields=['user', 'year_month', 'is_expense'], name='core_txn_user_month_idx'),
+            models.Index(fields=['user', 'category', 'year_month'], name='core_txn_user_cat_month_idx'),
+        ]
     
     def __str__(self):
         transaction_type = "Expense" if self.is_expense else "Income"
         return f"{transaction_type}: {self.amount} for {self.description}"
 
+def _whole_percentage(part, whole):
+    """
+    SQL expression for int(part / whole * 100), or 0 when whole is not positive.
+
+    Both operands are converted to whole cents first so the division happens
+    on integers and truncates towards zero exactly like the Python model
+    methods do, negative parts included.
+    """
+    part_cents = Cast(Round(part * 100), models.IntegerField())
+    whole_cents = Cast(Round(whole * 100), models.IntegerField())
+    ratio = part_cents * 100 / whole_cents
+    return Case(
+        When(
+            GreaterThan(whole, 0),
+            then=Case(
+                When(GreaterThanOrEqual(part, 0), then=Cast(Floor(ratio), models.IntegerField())),
+                default=Cast(Ceil(ratio), models.IntegerField()),
+            ),
+        ),
+        default=Value(0),
+        output_field=models.IntegerField(),
+    )
+
+class BudgetQuerySet(models.QuerySet):
+    def with_progress(self, year=None, month=None):
+        """
+        Annotate each budget with spent, remaining and percentage.
+
+        Spending comes from a join against the budget's own month of expenses,
+        so a whole page of budgets costs a single query. Passing year and month
+        also limits the budgets to that period.
+        """
+        queryset = self
+        if year and month:
+            queryset = queryset.filter(year=year, month=month)
+            in_month = Q(category__transactions__year_month=year_month(year, month))
+        else:
+            in_month = Q(category__transactions__year_month=F('year') * 100 + F('month'))
+        
+        return queryset.annotate(
+            month_expenses=FilteredRelation(
+                'category__transactions',
+                condition=Q(
+                    in_month,
+                    category__transactions__user=F('user'),
+                    category__transactions__is_expense=True,
+                )
+            ),
+        ).annotate(
+            spent=Coalesce(
+                Sum('month_expenses__amount'),
+                Value(Decimal('0')),
+                output_field=models.DecimalField(max_digits=12, decimal_places=2)
+            ),
+        ).annotate(
+            # Rounded to cents, like SavingsGoal's remaining
+            remaining=Round(
+                F('amount') - F('spent'),
+                2,
+                output_field=models.DecimalField(max_digits=12, decimal_places=2)
+            ),
+            percentage=_whole_percentage(F('spent'), F('amount')),
+        )
+
 class Budget(models.Model):
     """Monthly budget for a specific category"""
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='budgets')
@@ -94,6 +291,8 @@ class Budget(models.Model):
     month = models.IntegerField()
     year = models.IntegerField()
     
+    objects = BudgetQuerySet.as_manager()
+    
     class Meta:
         unique_together = ['user', 'category', 'month', 'year']
     
@@ -102,21 +301,60 @@ class Budget(models.Model):
     
     def get_spent_amount(self):
         """Calculate how much has been spent in this category this month"""
+        if hasattr(self, 'spent'):
+            # Annotated by Budget.objects.with_progress()
+            return self.spent
+        
         return Transaction.objects.filter(
             user=self.user,
             category=self.category,
-            is_expense=True,
-            date__year=self.year,
-            date__month=self.month
-        ).aggregate(models.Sum('amount'))['amount__sum'] or 0
+            is_expense=True
+        ).in_month(self.year, self.month).aggregate(models.Sum('amount'))['amount__sum'] or 0
     
     def get_percentage(self):
         """Calculate percentage of budget used"""
+        if hasattr(self, 'percentage'):
+            return self.percentage
+        
         spent = self.get_spent_amount()
         if self.amount > 0:
             return int((spent / self.amount) * 100)
         return 0
 
+SAVINGS_GOAL_STATUSES = ('Completed', 'Overdue', 'On Track', 'Slightly Behind', 'Behind')
+
+class SavingsGoalQuerySet(models.QuerySet):
+    def with_progress(self, today=None):
+        """
+        Annotate each goal with percentage, remaining and status.
+
+        The same rules as SavingsGoal.get_percentage() and get_status() are
+        evaluated in SQL against today's date, so goals can be filtered and
+        ordered by status without loading them all.
+        """
+        if today is None:
+            today = timezone.now().date()
+        
+        return self.annotate(
+            percentage=_whole_percentage(F('current_amount'), F('target_amount')),
+            # Rounded to cents, since SQLite subtracts decimals as floats
+            remaining=Round(
+                F('target_amount') - F('current_amount'),
+                2,
+                output_field=models.DecimalField(max_digits=12, decimal_places=2)
+            ),
+        ).annotate(
+            status=Case(
+                When(is_completed=True, then=Value('Completed')),
+                When(target_date__lt=today, then=Value('Overdue')),
+                When(percentage__gte=50, then=Value('On Track')),
+                When(percentage__gte=25, target_date__isnull=False, then=Value('Slightly Behind')),
+                When(percentage__gte=25, then=Value('On Track')),
+                default=Value('Behind'),
+                output_field=models.CharField(),
+            ),
+        )
+
 class SavingsGoal(models.Model):
     """Savings goal for user"""
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='savings_goals')
@@ -126,17 +364,33 @@ class SavingsGoal(models.Model):
     target_date = models.DateField(null=True, blank=True)
     is_completed = models.BooleanField(default=False)
     
+    objects = SavingsGoalQuerySet.as_manager()
+    
     def __str__(self):
         return f"{self.name} - {self.current_amount}/{self.target_amount}"
     
     def get_percentage(self):
         """Calculate percentage of savings goal achieved"""
+        if hasattr(self, 'percentage'):
+            # Annotated by SavingsGoal.objects.with_progress()
+            return self.percentage
+        
         if self.target_amount > 0:
             return int((self.current_amount / self.target_amount) * 100)
         return 0
     
+    def get_remaining_amount(self):
+        """Amount still to save, negative once the target is exceeded"""
+        if hasattr(self, 'remaining'):
+            return self.remaining
+        
+        return self.target_amount - self.current_amount
+    
     def get_status(self):
         """Get the status of the savings goal"""
+        if hasattr(self, 'status'):
+            return self.status
+        
         percentage = self.get_percentage()
         
         if self.is_completed:
@@ -177,3 +431,235 @@ class Achievement(models.Model):
     
     def __str__(self):
         return f"{self.user.username} earned {self.name}"
+
+def _month_of(value):
+    """Return the (year, month) a transaction date falls in, in the current timezone"""
+    if isinstance(value, datetime) and timezone.is_aware(value):
+        value = timezone.localtime(value)
+    return value.year, value.month
+
+class MonthlySummaryQuerySet(models.QuerySet):
+    def between(self, start=None, end=None):
+        """
+        Rows for the whole months from start's month up to, but not including,
+        end's month; either end may be open.
+        """
+        queryset = self
+        if start is not None:
+            start_year, start_month = _month_of(start)
+            queryset = queryset.filter(Q(year__gt=start_year) | Q(year=start_year, month__gte=start_month))
+        if end is not None:
+            end_year, end_month = _month_of(end)
+            queryset = queryset.filter(Q(year__lt=end_year) | Q(year=end_year, month__lt=end_month))
+        return queryset
+    
+    def totals(self):
+        """Return income, expenses, net and count over the selected rows in a single query"""
+        return _totals(self.aggregate(
+            income=Sum('total', filter=Q(is_expense=False)),
+            expenses=Sum('total', filter=Q(is_expense=True)),
+            count=Sum('transaction_count')
+        ))
+    
+    def record(self, user_id, bucket, category_id, is_expense, amount, count):
+        """Add amount and count to the running totals for a year_month bucket"""
+        year, month = divmod(bucket, 100)
+        key = dict(
+            user_id=user_id,
+            year=year,
+            month=month,
+            category_id=category_id,
+            is_expense=is_expense
+        )
+        changes = dict(
+            total=F('total') + amount,
+            transaction_count=F('transaction_count') + count
+        )
+        
+        if self.filter(**key).update(**changes):
+            return
+        
+        try:
+            with transaction.atomic():
+                self.create(**key, total=amount, transaction_count=count)
+        except IntegrityError:
+            # Another request created the row first
+            self.filter(**key).update(**changes)
+    
+    def expected(self, users=None):
+        """Recompute the summary rows from the raw Transaction table"""
+        transactions = Transaction.objects.all()
+        if users is not None:
+            transactions = transactions.filter(user__in=users)
+        
+        return (
+            transactions
+            .values('user', 'year_month', 'category', 'is_expense')
+            .annotate(total=Sum('amount'), transaction_count=Count('id'))
+            .order_by()
+        )
+    
+    def rebuild(self, users=None, batch_size=1000):
+        """Replace the summary rows (for some users, or everyone) with fresh totals"""
+        rows = (
+            MonthlySummary(
+                user_id=row['user'],
+                year=row['year_month'] // 100,
+                month=row['year_month'] % 100,
+                category_id=row['category'],
+                is_expense=row['is_expense'],
+                total=row['total'],
+                transaction_count=row['transaction_count']
+            )
+            for row in self.expected(users).iterator(chunk_size=batch_size)
+        )
+        
+        with transaction.atomic():
+            existing = self.all() if users is None else self.filter(user__in=users)
+            existing.delete()
+            while batch := list(islice(rows, batch_size)):
+                self.bulk_create(batch)
+    
+    def drift(self, users=None):
+        """Return (key, stored, expected) for every summary row that disagrees with the raw data"""
+        expected = {
+            (row['user'], *divmod(row['year_month'], 100), row['category'], row['is_expense']):
+                (row['total'], row['transaction_count'])
+            for row in self.expected(users)
+        }
+        stored = {}
+        summaries = self.all() if users is None else self.filter(user__in=users)
+        for row in summaries.values_list('user', 'year', 'month', 'category', 'is_expense', 'total', 'transaction_count'):
+            if row[6] or row[5]:
+                stored[row[:5]] = (row[5], row[6])
+        
+        return [
+            (key, stored.get(key), expected.get(key))
+            for key in sorted(stored.keys() | expected.keys(), key=str)
+            if stored.get(key) != expected.get(key)
+        ]
+
+class MonthlySummary(models.Model):
+    """Running monthly totals per user, category and transaction type"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='monthly_summaries')
+    year = models.IntegerField()
+    month = models.IntegerField()
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, null=True, related_name='monthly_summaries')
+    is_expense = models.BooleanField()
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    transaction_count = models.IntegerField(default=0)
+    
+    objects = MonthlySummaryQuerySet.as_manager()
+    
+    class Meta:
+        verbose_name_plural = "Monthly summaries"
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'year', 'month', 'category', 'is_expense'],
+                name='core_summary_unique_key'
+            ),
+            # NULL categories never collide in the constraint above
+            models.UniqueConstraint(
+                fields=['user', 'year', 'month', 'is_expense'],
+                condition=Q(category__isnull=True),
+                name='core_summary_unique_uncategorized'
+            ),
+        ]
+    
+    def __str__(self):
+        transaction_type = "expenses" if self.is_expense else "income"
+        return f"{self.user.username}'s {transaction_type} for {self.month}/{self.year}: {self.total}"
+
+def _is_month_boundary(value):
+    local = timezone.localtime(value)
+    return (local.day, local.hour, local.minute, local.second, local.microsecond) == (1, 0, 0, 0, 0)
+
+def period_totals(user, start=None, end=None):
+    """
+    Income, expenses, net and transaction count for a user in [start, end).
+
+    Either bound may be left open. Ranges made of whole months are read from
+    the MonthlySummary table; anything else is summed from the transactions
+    with a half-open date range, which the (user, is_expense, date) index
+    can serve. Both paths take a single query.
+    """
+    if all(bound is None or _is_month_boundary(bound) for bound in (start, end)):
+        return MonthlySummary.objects.filter(user=user).between(start, end).totals()
+    
+    return Transaction.objects.filter(user=user).between(start, end).totals()
+
+def _summary_state(transaction):
+    """The fields of a transaction that decide which summary row it counts towards"""
+    return (
+        transaction.user_id,
+        transaction.year_month,
+        transaction.category_id,
+        transaction.is_expense,
+        Decimal(str(transaction.amount))
+    )
+
+_SUMMARY_FIELDS = {'user_id', 'year_month', 'category_id', 'is_expense', 'amount'}
+
+@receiver(post_init, sender=Transaction)
+def remember_summary_state(sender, instance, **kwargs):
+    """Remember what a loaded transaction counted towards, so edits can move it"""
+    if instance.pk and not _SUMMARY_FIELDS & instance.get_deferred_fields():
+        instance._summary_state = _summary_state(instance)
+    else:
+        instance._summary_state = None
+
+@receiver(pre_save, sender=Transaction)
+def set_year_month(sender, instance, **kwargs):
+    """Bucket the transaction into its month in the user's timezone"""
+    if not kwargs.get('raw'):
+        instance.year_month = month_bucket(instance.date, user_timezone(instance.user_id))
+
+@receiver(pre_save, sender=Transaction)
+def load_summary_state(sender, instance, **kwargs):
+    """Fetch the stored values for edited transactions that were loaded with deferred fields"""
+    if instance.pk and instance._summary_state is None and not kwargs.get('raw'):
+        previous = Transaction.objects.filter(pk=instance.pk).first()
+        if previous is not None:
+            instance._summary_state = previous._summary_state
+
+@receiver(post_save, sender=Transaction)
+def update_monthly_summary(sender, instance, created, **kwargs):
+    """Move a transaction's amount between summary rows when it is created or edited"""
+    if kwargs.get('raw'):
+        return
+    
+    new_state = _summary_state(instance)
+    old_state = None if created else instance._summary_state
+    
+    if old_state != new_state:
+        if old_state is not None:
+            user_id, bucket, category_id, is_expense, amount = old_state
+            MonthlySummary.objects.record(user_id, bucket, category_id, is_expense, -amount, -1)
+        user_id, bucket, category_id, is_expense, amount = new_state
+        MonthlySummary.objects.record(user_id, bucket, category_id, is_expense, amount, 1)
+    
+    instance._summary_state = new_state
+
+@receiver(post_delete, sender=Transaction)
+def remove_from_monthly_summary(sender, instance, origin=None, **kwargs):
+    """Take a deleted transaction out of its summary row"""
+    if isinstance(origin, User) or getattr(origin, 'model', None) is User:
+        # The user's summary rows are being deleted along with them
+        return
+    
+    user_id, bucket, category_id, is_expense, amount = instance._summary_state or _summary_state(instance)
+    MonthlySummary.objects.record(user_id, bucket, category_id, is_expense, -amount, -1)
+
+@receiver(pre_delete, sender=Category)
+def fold_category_summaries(sender, instance, **kwargs):
+    """Move a deleted category's totals into the uncategorized rows its transactions fall back to"""
+    for summary in MonthlySummary.objects.filter(category=instance):
+        MonthlySummary.objects.filter(pk=summary.pk).delete()
+        MonthlySummary.objects.record(
+            summary.user_id,
+            year_month(summary.year, summary.month),
+            None,
+            summary.is_expense,
+            summary.total,
+            summary.transaction_count
+        )
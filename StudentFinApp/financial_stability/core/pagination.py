@@ -0,0 +1,93 @@
+import base64
+import json
+from datetime import datetime
+
+from django.db.models import Q
+
+
+def encode_cursor(transaction, direction):
+    """Build an opaque cursor pointing just past a transaction"""
+    payload = json.dumps([direction, transaction.date.isoformat(), transaction.pk])
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Return (direction, date, pk) for a cursor, or None if it is not valid"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        direction, date, pk = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if direction not in ('next', 'prev'):
+            return None
+        return direction, datetime.fromisoformat(date), int(pk)
+    except (ValueError, TypeError):
+        return None
+
+
+class KeysetPage:
+    """One page of a keyset-paginated queryset"""
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+def keyset_paginate(queryset, cursor=None, per_page=50):
+    """
+    Paginate a queryset newest first on (date, id) without OFFSET.
+
+    Each page seeks straight to its first row using the (date, id) of the
+    row before it, so page 500 costs the same as page 1.
+    """
+    position = decode_cursor(cursor) if cursor else None
+
+    if position is None:
+        rows = list(queryset.order_by('-date', '-id')[:per_page + 1])
+        has_more = len(rows) > per_page
+        rows = rows[:per_page]
+        return KeysetPage(
+            rows,
+            next_cursor=encode_cursor(rows[-1], 'next') if has_more else None,
+        )
+
+    direction, date, pk = position
+    if direction == 'next':
+        rows = list(
+            queryset.filter(Q(date__lt=date) | Q(date=date, id__lt=pk))
+            .order_by('-date', '-id')[:per_page + 1]
+        )
+        has_more = len(rows) > per_page
+        rows = rows[:per_page]
+        return KeysetPage(
+            rows,
+            next_cursor=encode_cursor(rows[-1], 'next') if has_more else None,
+            previous_cursor=encode_cursor(rows[0], 'prev') if rows else None,
+        )
+
+    # Walking backwards: fetch the rows just newer than the cursor, oldest
+    # first, then flip them back into display order
+    rows = list(
+        queryset.filter(Q(date__gt=date) | Q(date=date, id__gt=pk))
+        .order_by('date', 'id')[:per_page + 1]
+    )
+    has_more = len(rows) > per_page
+    rows = rows[:per_page][::-1]
+    return KeysetPage(
+        rows,
+        next_cursor=encode_cursor(rows[-1], 'next') if rows else None,
+        previous_cursor=encode_cursor(rows[0], 'prev') if has_more else None,
+    )
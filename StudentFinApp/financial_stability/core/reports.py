@@ -0,0 +1,114 @@
+from datetime import datetime
+from decimal import Decimal
+
+from django.db.models import Q, Sum
+from django.utils import timezone
+
+from .models import MonthlySummary, Transaction
+
+UNCATEGORIZED_LABEL = 'Uncategorized'
+UNCATEGORIZED_COLOR = '#adb5bd'
+# Longest report window, in months
+MAX_REPORT_MONTHS = 120
+
+
+def month_start(year, month):
+    """Return the aware datetime for midnight on the first day of a month"""
+    return timezone.make_aware(datetime(year, month, 1))
+
+
+def add_months(year, month, count):
+    """Shift a (year, month) pair by count months, which may be negative"""
+    index = year * 12 + (month - 1) + count
+    return index // 12, index % 12 + 1
+
+
+def month_window(months, now=None):
+    """Return the [start, end) range covering the last `months` months,
+    including the current one"""
+    now = timezone.localtime(now or timezone.now())
+    start_year, start_month = add_months(now.year, now.month, -(months - 1))
+    end_year, end_month = add_months(now.year, now.month, 1)
+    return month_start(start_year, start_month), month_start(end_year, end_month)
+
+
+def monthly_rollup(user, start, end):
+    """
+    Income, expenses, savings and savings rate per month for [start, end).
+
+    Totals are read from the MonthlySummary table in a single grouped query,
+    so the cost depends on the number of months rather than transactions.
+    The window is treated as whole months. Months without transactions are
+    included with zero totals so charts always get a continuous series.
+    """
+    rows = (
+        MonthlySummary.objects
+        .filter(user=user)
+        .between(start, end)
+        .values('year', 'month')
+        .annotate(
+            income=Sum('total', filter=Q(is_expense=False)),
+            expenses=Sum('total', filter=Q(is_expense=True)),
+        )
+        .order_by('year', 'month')
+    )
+    totals = {
+        (row['year'], row['month']): row
+        for row in rows
+    }
+
+    local_start = timezone.localtime(start)
+    year, month = local_start.year, local_start.month
+    rollup = []
+    while month_start(year, month) < end:
+        row = totals.get((year, month), {})
+        income = row.get('income') or Decimal('0')
+        expenses = row.get('expenses') or Decimal('0')
+        savings = income - expenses
+
+        if income > 0:
+            savings_rate = (savings / income) * 100
+        else:
+            savings_rate = 0
+
+        rollup.append({
+            'year': year,
+            'month': month,
+            'month_name': month_start(year, month).strftime('%b %Y'),
+            'income': income,
+            'expenses': expenses,
+            'savings': savings,
+            'savings_rate': round(float(savings_rate), 2),
+        })
+        year, month = add_months(year, month, 1)
+
+    return rollup
+
+
+def category_breakdown(user, start, end):
+    """
+    Expense and income totals per category for transactions in [start, end).
+
+    One grouped query does the summing in the database. Transactions whose
+    category was deleted are reported under an "Uncategorized" bucket. Each
+    side is returned as chart data (labels, data, colors), largest first.
+    """
+    rows = (
+        Transaction.objects
+        .filter(user=user, date__gte=start, date__lt=end)
+        .values('category__name', 'category__color', 'is_expense')
+        .annotate(total=Sum('amount'))
+        .order_by('-total', 'category__name')
+    )
+
+    breakdown = {
+        True: {'labels': [], 'data': [], 'colors': []},
+        False: {'labels': [], 'data': [], 'colors': []},
+    }
+    for row in rows:
+        chart = breakdown[row['is_expense']]
+        chart['labels'].append(row['category__name'] or UNCATEGORIZED_LABEL)
+        chart['data'].append(float(row['total']))
+        chart['colors'].append(row['category__color'] or UNCATEGORIZED_COLOR)
+
+    return breakdown[True], breakdown[False]
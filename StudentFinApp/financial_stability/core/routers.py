@@ -0,0 +1,73 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+
+# Set while code that may read slightly stale data runs; context variables
+# follow the request into sync_to_async threads
+_use_replica = ContextVar('use_replica', default=False)
+
+
+@contextmanager
+def replica_reads():
+    """Send reads of the app's models to the replica inside the block"""
+    token = _use_replica.set(True)
+    try:
+        yield
+    finally:
+        _use_replica.reset(token)
+
+
+def reads_from_replica(view):
+    """
+    Serve a view's reads of the app's models from the replica.
+
+    Only for read-only pages: the replica may lag behind, so a change the
+    user just made can take a moment to show up.
+    """
+    if iscoroutinefunction(view):
+        @wraps(view)
+        async def wrapper(*args, **kwargs):
+            with replica_reads():
+                return await view(*args, **kwargs)
+    else:
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            with replica_reads():
+                return view(*args, **kwargs)
+
+    return wrapper
+
+
+class ReplicaRouter:
+    """
+    Route reads inside replica_reads() to settings.DATABASE_REPLICA.
+
+    Everything else, including writes, sessions and users, stays on the
+    default database, as does every read when no replica is configured.
+    """
+
+    app_label = 'core'
+
+    def db_for_read(self, model, **hints):
+        if (
+            settings.DATABASE_REPLICA
+            and _use_replica.get()
+            and model._meta.app_label == self.app_label
+        ):
+            return settings.DATABASE_REPLICA
+        return None
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replica holds the same rows as the default database
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db == settings.DATABASE_REPLICA:
+            return False
+        return None
@@ -0,0 +1,82 @@
+from collections import namedtuple
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Achievement, Category, SavingsGoal, Transaction
+
+SAVINGS_CATEGORY_KEY = 'category:savings:id'
+
+SAVINGS_CATEGORY_NAME = 'Savings'
+SAVINGS_CATEGORY_DEFAULTS = {'is_expense': True, 'icon': 'piggy-bank', 'color': '#4CAF50'}
+
+Contribution = namedtuple('Contribution', ['goal', 'transaction', 'achievement'])
+
+
+def savings_category_id():
+    """
+    Id of the shared Savings category, created on first use and cached.
+
+    An existing category named Savings is used whatever its other fields.
+    The id is cached once the current transaction commits, so a lookup
+    inside an outer atomic block that rolls back caches nothing.
+    """
+    category_id = cache.get(SAVINGS_CATEGORY_KEY)
+    if category_id is None:
+        category, created = Category.objects.get_or_create(
+            name=SAVINGS_CATEGORY_NAME, defaults=SAVINGS_CATEGORY_DEFAULTS
+        )
+        category_id = category.pk
+        # A category created inside a transaction that rolls back must not be cached
+        transaction.on_commit(lambda: cache.set(SAVINGS_CATEGORY_KEY, category_id, None))
+    return category_id
+
+
+def contribute_to_goal(goal, amount, date=None):
+    """
+    Add amount to a savings goal and record it as a Savings expense.
+
+    The goal is incremented with an F() expression in the database, so
+    concurrent contributions cannot overwrite each other, and the increment,
+    the transaction and any achievement commit together. The achievement is
+    only created by the contribution that takes the goal from below its
+    target to at or above it. Returns a Contribution with the goal's new
+    current_amount set.
+    """
+    category_id = savings_category_id()
+
+    with transaction.atomic():
+        SavingsGoal.objects.filter(pk=goal.pk).update(current_amount=F('current_amount') + amount)
+        # The row stays locked by the update until commit, so this is the
+        # total including our contribution and no one else's after it
+        current_amount, target_amount = (
+            SavingsGoal.objects
+            .filter(pk=goal.pk)
+            .values_list('current_amount', 'target_amount')
+            .get()
+        )
+
+        entry = Transaction.objects.create(
+            user_id=goal.user_id,
+            category_id=category_id,
+            amount=amount,
+            description=f"Contribution to {goal.name}",
+            date=date or timezone.now(),
+            is_expense=True
+        )
+
+        achievement = None
+        if current_amount - amount < target_amount <= current_amount:
+            achievement = Achievement.objects.create(
+                user_id=goal.user_id,
+                name=f"Savings Goal Achieved: {goal.name}",
+                description=f"Successfully saved Rs. {target_amount} for {goal.name}",
+                icon="trophy",
+                date_earned=timezone.now()
+            )
+
+    goal.current_amount = current_amount
+    goal.target_amount = target_amount
+    return Contribution(goal, entry, achievement)
@@ -1,9 +1,35 @@
-from django.test import TestCase, Client
-from django.urls import reverse
-from django.contrib.auth.models import User
+from django.test import TestCase, TransactionTestCase, Client, RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection, connections
+from django.db.models import F, Sum
+from django.db.models.signals import post_init
+from django.templatetags.static import static
+from django.urls import get_resolver, reverse
+from django.contrib.auth.models import AnonymousUser, User
+from django.contrib.sessions.backends.cache import SessionStore
 from django.utils import timezone
+from asgiref.sync import async_to_sync
+from unittest import mock
 from decimal import Decimal
+from io import BytesIO, StringIO
+from pathlib import Path
+import csv
 import datetime
+import http.client
+import json
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
 
 from .models import (
     Category, 
@@ -11,7 +37,10 @@ from .models import (
     Transaction, 
     Budget, 
     SavingsGoal, 
-    Achievement
+    Achievement,
+    MonthlySummary,
+    SAVINGS_GOAL_STATUSES,
+    period_totals
 )
 from .forms import (
     CustomUserCreationForm,
@@ -23,6 +52,17 @@ from .forms import (
     UpdateSavingsForm,
     CategoryForm
 )
+from financial_stability.database import database_config, databases
+from .async_queries import gather_queries
+from .backups import BackupError, backup_sqlite, read_manifest, restore_sqlite, sqlite_snapshot
+from .caching import dashboard_cache_stats, get_version
+from .catalogue import get_catalogue
+from .importers import import_transactions
+from .middleware import TIMEZONE_SESSION_KEY, UserTimezoneMiddleware, registry as metrics_registry
+from .reports import add_months, category_breakdown, month_start, month_window, monthly_rollup
+from .routers import ReplicaRouter, reads_from_replica, replica_reads
+from .services import contribute_to_goal, savings_category_id
+from .views import TRANSACTIONS_PER_PAGE
 
 class ModelTests(TestCase):
     """Tests for core application models"""
@@ -307,7 +347,7 @@ class ViewTests(TestCase):
         self.budget_url = reverse('budgets')
         self.add_budget_url = reverse('add_budget')
         self.savings_url = reverse('savings')
-        self.add_savings_url = reverse('add_savings')
+        self.add_savings_url = reverse('add_savings_goal')
         self.categories_url = reverse('categories')
         self.add_category_url = reverse('add_category')
         self.reports_url = reverse('income_expense_report')
@@ -502,6 +542,20 @@ class ViewTests(TestCase):
         self.assertEqual(response.status_code, 302)  # Redirect after successful creation
         self.assertEqual(Category.objects.count(), 3)  # Original 2 + new category
     
+    def test_category_edit_and_delete_are_staff_only(self):
+        self.client.login(username='testuser', password='testpassword123')
+        edit_url = reverse('edit_category', args=[self.expense_category.pk])
+        delete_url = reverse('delete_category', args=[self.expense_category.pk])
+        
+        self.assertEqual(self.client.post(edit_url, {'name': 'Renamed', 'icon': 'tag'}).status_code, 403)
+        self.assertEqual(self.client.post(delete_url).status_code, 403)
+        self.assertTrue(Budget.objects.filter(pk=self.budget.pk).exists())
+        
+        self.user.is_staff = True
+        self.user.save()
+        self.assertEqual(self.client.post(delete_url).status_code, 302)
+        self.assertFalse(Category.objects.filter(pk=self.expense_category.pk).exists())
+    
     def test_category_create_view_unauthenticated(self):
         response = self.client.post(self.add_category_url, {
             'name': 'New Category',
@@ -1294,3 +1348,2218 @@ class ViewTests(TestCase):
         # Access the dashboard again to make sure it loads with the updated data
         response = self.client.get(self.dashboard_url)
         self.assertEqual(response.status_code, 200)
+
+
+class MonthlyRollupTests(TestCase):
+    """Tests for the grouped monthly rollup used by reports"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='rollupuser',
+            password='testpassword123'
+        )
+        
+        self.income_category = Category.objects.create(
+            name='Salary',
+            icon='money',
+            color='#00ff00',
+            is_expense=False
+        )
+        
+        self.expense_category = Category.objects.create(
+            name='Food',
+            icon='food',
+            color='#ff0000',
+            is_expense=True
+        )
+        
+        # Seed two transactions in each of the last 60 months
+        now = timezone.now()
+        for offset in range(60):
+            year, month = add_months(now.year, now.month, -offset)
+            Transaction.objects.create(
+                user=self.user,
+                category=self.income_category,
+                amount=Decimal('1000.00'),
+                description='Salary',
+                date=month_start(year, month) + datetime.timedelta(days=1),
+                is_expense=False
+            )
+            Transaction.objects.create(
+                user=self.user,
+                category=self.expense_category,
+                amount=Decimal('250.00'),
+                description='Groceries',
+                date=month_start(year, month) + datetime.timedelta(days=2),
+                is_expense=True
+            )
+    
+    def test_rollup_query_count_is_constant(self):
+        for months in (12, 24, 60):
+            start, end = month_window(months)
+            with self.assertNumQueries(1):
+                rollup = monthly_rollup(self.user, start, end)
+            self.assertEqual(len(rollup), months)
+    
+    def test_rollup_totals(self):
+        start, end = month_window(12)
+        rollup = monthly_rollup(self.user, start, end)
+        
+        for data in rollup:
+            self.assertEqual(data['income'], Decimal('1000.00'))
+            self.assertEqual(data['expenses'], Decimal('250.00'))
+            self.assertEqual(data['savings'], Decimal('750.00'))
+            self.assertEqual(data['savings_rate'], 75.0)
+    
+    def test_rollup_includes_empty_months(self):
+        now = timezone.now()
+        start = month_start(*add_months(now.year, now.month, -70))
+        end = month_start(*add_months(now.year, now.month, -60))
+        rollup = monthly_rollup(self.user, start, end)
+        
+        self.assertEqual(len(rollup), 10)
+        for data in rollup:
+            self.assertEqual(data['income'], 0)
+            self.assertEqual(data['expenses'], 0)
+            self.assertEqual(data['savings_rate'], 0)
+    
+    def test_report_view_uses_rollup(self):
+        self.client.login(username='rollupuser', password='testpassword123')
+        response = self.client.get(reverse('income_expense_report'), {'months': 24})
+        self.assertEqual(response.status_code, 200)
+        self.assertTemplateUsed(response, 'core/income_expense_report.html')
+        self.assertEqual(len(json.loads(response.context['chart_data'])['labels']), 24)
+    
+    def test_report_months_are_limited_and_validated(self):
+        self.client.login(username='rollupuser', password='testpassword123')
+        
+        response = self.client.get(reverse('income_expense_report'), {'months': 100000})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['selected_months'], 120)
+        
+        response = self.client.get(reverse('export_income_expense_report', args=['csv']), {'months': 100000})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(b''.join(response.streaming_content).decode().splitlines()), 121)
+        
+        for name, args in (('income_expense_report', []), ('export_income_expense_report', ['csv'])):
+            response = self.client.get(reverse(name, args=args), {'months': 'abc'})
+            self.assertEqual(response.status_code, 400)
+
+    
+    def test_category_breakdown_is_one_query(self):
+        start, end = month_window(60)
+        with self.assertNumQueries(1):
+            expenses, income = category_breakdown(self.user, start, end)
+        
+        self.assertEqual(expenses, {'labels': ['Food'], 'data': [15000.0], 'colors': ['#ff0000']})
+        self.assertEqual(income, {'labels': ['Salary'], 'data': [60000.0], 'colors': ['#00ff00']})
+    
+    def test_category_breakdown_uncategorized_bucket(self):
+        now = timezone.now()
+        Transaction.objects.create(
+            user=self.user,
+            category=None,
+            amount=Decimal('40.00'),
+            description='Unknown',
+            date=now,
+            is_expense=True
+        )
+        self.expense_category.delete()
+        
+        start, end = month_window(1)
+        expenses, income = category_breakdown(self.user, start, end)
+        self.assertEqual(expenses['labels'], ['Uncategorized'])
+        self.assertEqual(expenses['data'], [290.0])
+        self.assertEqual(income['labels'], ['Salary'])
+    
+    def test_report_view_breakdown_range(self):
+        self.client.login(username='rollupuser', password='testpassword123')
+        now = timezone.localtime()
+        year, month = add_months(now.year, now.month, -2)
+        first = month_start(year, month)
+        
+        response = self.client.get(reverse('income_expense_report'), {
+            'breakdown_from': first.strftime('%Y-%m-%d'),
+            'breakdown_to': (first + datetime.timedelta(days=1)).strftime('%Y-%m-%d'),
+        })
+        self.assertEqual(json.loads(response.context['income_chart_data'])['data'], [1000.0])
+        self.assertEqual(json.loads(response.context['expense_chart_data'])['data'], [])
+        self.assertIsNone(response.context['top_expense_category'])
+
+class BudgetProgressTests(TestCase):
+    """Tests for the annotated budget progress queryset"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='budgetuser',
+            password='testpassword123'
+        )
+        self.now = timezone.now()
+        
+        self.categories = [
+            Category.objects.create(
+                name=f'Expense {i}',
+                icon='tag',
+                color='#ff0000',
+                is_expense=True
+            )
+            for i in range(6)
+        ]
+        
+        for i, category in enumerate(self.categories):
+            Budget.objects.create(
+                user=self.user,
+                category=category,
+                amount=Decimal('300.00'),
+                month=self.now.month,
+                year=self.now.year
+            )
+            Transaction.objects.create(
+                user=self.user,
+                category=category,
+                amount=Decimal('100.00') * i,
+                description='Spending',
+                date=self.now,
+                is_expense=True
+            )
+    
+    def test_with_progress_matches_model_methods(self):
+        annotated = {
+            budget.pk: budget
+            for budget in Budget.objects.with_progress(self.now.year, self.now.month)
+        }
+        
+        for budget in Budget.objects.all():
+            self.assertEqual(annotated[budget.pk].spent, budget.get_spent_amount())
+            self.assertEqual(annotated[budget.pk].percentage, budget.get_percentage())
+            self.assertEqual(annotated[budget.pk].remaining, budget.amount - budget.get_spent_amount())
+    
+    def test_remaining_is_rounded_to_cents(self):
+        budget = Budget.objects.get(category=self.categories[1])
+        budget.amount = Decimal('300.10')
+        budget.save()
+        Transaction.objects.create(
+            user=self.user,
+            category=self.categories[1],
+            amount=Decimal('0.20'),
+            description='Spending',
+            date=self.now,
+            is_expense=True
+        )
+        
+        remaining = Budget.objects.with_progress(self.now.year, self.now.month).get(pk=budget.pk).remaining
+        self.assertEqual(remaining, Decimal('199.90'))
+    
+    def test_with_progress_ignores_other_months_and_income(self):
+        category = self.categories[1]
+        Transaction.objects.create(
+            user=self.user,
+            category=category,
+            amount=Decimal('500.00'),
+            description='Last year',
+            date=self.now - datetime.timedelta(days=400),
+            is_expense=True
+        )
+        Transaction.objects.create(
+            user=self.user,
+            category=category,
+            amount=Decimal('500.00'),
+            description='Refund',
+            date=self.now,
+            is_expense=False
+        )
+        
+        budget = Budget.objects.with_progress().get(category=category)
+        self.assertEqual(budget.spent, Decimal('100.00'))
+        self.assertEqual(budget.percentage, 33)
+    
+    def test_budget_pages_query_count_is_constant(self):
+        self.client.login(username='budgetuser', password='testpassword123')
+        
+        for url in (reverse('budgets'), reverse('dashboard')):
+            with CaptureQueriesContext(connection) as few_budgets:
+                self.client.get(url)
+            
+            for i in range(10):
+                category = Category.objects.create(name=f'Extra {i}', icon='tag', is_expense=True)
+                Budget.objects.create(
+                    user=self.user,
+                    category=category,
+                    amount=Decimal('50.00'),
+                    month=self.now.month,
+                    year=self.now.year
+                )
+            
+            with CaptureQueriesContext(connection) as many_budgets:
+                response = self.client.get(url)
+            
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(many_budgets), len(few_budgets))
+
+
+class SavingsGoalProgressTests(TestCase):
+    """Tests that the annotated savings goal progress agrees with the model methods"""
+    
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='goaluser', password='testpassword123')
+        rng = random.Random(11)
+        today = timezone.now().date()
+        
+        # Amounts around the status thresholds, targets of zero and
+        # negative or overshooting contributions, dates around today
+        targets = [Decimal('0.00'), Decimal('0.03'), Decimal('3.00'), Decimal('100.00'), Decimal('333.33'), Decimal('9999999.99')]
+        dates = [None, today - datetime.timedelta(days=1), today, today + datetime.timedelta(days=1)]
+        goals = []
+        for i in range(400):
+            target = rng.choice(targets + [Decimal(rng.randint(1, 10 ** 7)) / 100])
+            fraction = rng.choice([0, 0.2499, 0.25, 0.4999, 0.5, 0.99, 1, 1.5, -0.1, rng.random()])
+            goals.append(SavingsGoal(
+                user=cls.user,
+                name=f'Goal {i}',
+                target_amount=target,
+                current_amount=(target * Decimal(str(fraction))).quantize(Decimal('0.01')),
+                target_date=rng.choice(dates + [today + datetime.timedelta(days=rng.randint(-400, 400))]),
+                is_completed=rng.random() < 0.1
+            ))
+        SavingsGoal.objects.bulk_create(goals)
+    
+    def test_with_progress_matches_model_methods(self):
+        annotated = {goal.pk: goal for goal in SavingsGoal.objects.with_progress()}
+        
+        self.assertEqual(len(annotated), 400)
+        for goal in SavingsGoal.objects.all():
+            with self.subTest(target=goal.target_amount, current=goal.current_amount, date=goal.target_date):
+                self.assertEqual(annotated[goal.pk].percentage, goal.get_percentage())
+                self.assertEqual(annotated[goal.pk].remaining, goal.get_remaining_amount())
+                self.assertEqual(annotated[goal.pk].status, goal.get_status())
+                self.assertEqual(annotated[goal.pk].get_status(), goal.get_status())
+    
+    def test_every_status_occurs(self):
+        statuses = set(SavingsGoal.objects.with_progress().values_list('status', flat=True))
+        self.assertEqual(statuses, set(SAVINGS_GOAL_STATUSES))
+    
+    def test_filtering_by_status_matches_model_methods(self):
+        goals = list(SavingsGoal.objects.all())
+        for status in SAVINGS_GOAL_STATUSES:
+            with self.subTest(status=status):
+                expected = {goal.pk for goal in goals if goal.get_status() == status}
+                matching = SavingsGoal.objects.with_progress().filter(status=status)
+                self.assertEqual(set(matching.values_list('pk', flat=True)), expected)
+    
+    def test_status_is_relative_to_the_given_date(self):
+        goal = SavingsGoal.objects.create(
+            user=self.user,
+            name='Laptop',
+            target_amount=Decimal('1000.00'),
+            current_amount=Decimal('600.00'),
+            target_date=datetime.date(2030, 6, 1)
+        )
+        goals = SavingsGoal.objects.filter(pk=goal.pk)
+        
+        self.assertEqual(goals.with_progress(today=datetime.date(2030, 6, 1)).get().status, 'On Track')
+        self.assertEqual(goals.with_progress(today=datetime.date(2030, 6, 2)).get().status, 'Overdue')
+    
+    def test_savings_page_filters_by_status_in_the_query(self):
+        self.client.login(username='goaluser', password='testpassword123')
+        
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('savings'), {'status': 'Slightly Behind'})
+        
+        goals = list(response.context['savings_goals'])
+        self.assertTrue(goals)
+        self.assertTrue(all(goal.get_status() == 'Slightly Behind' for goal in goals))
+        self.assertEqual(response.context['selected_status'], 'Slightly Behind')
+        goal_queries = [q for q in queries if 'FROM "core_savingsgoal"' in q['sql']]
+        self.assertEqual(len(goal_queries), 1)
+        
+        # Unknown statuses show every goal
+        response = self.client.get(reverse('savings'), {'status': 'Unknown'})
+        self.assertEqual(len(response.context['savings_goals']), 400)
+        self.assertIsNone(response.context['selected_status'])
+
+class KeysetPaginationTests(TestCase):
+    """Tests for cursor pagination of the transaction list"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='pageuser',
+            password='testpassword123'
+        )
+        self.food = Category.objects.create(name='Food', icon='food', is_expense=True)
+        self.rent = Category.objects.create(name='Rent', icon='home', is_expense=True)
+        
+        # Several transactions share a timestamp so ties on date are exercised
+        now = timezone.now()
+        for i in range(125):
+            Transaction.objects.create(
+                user=self.user,
+                category=self.food if i % 2 else self.rent,
+                amount=Decimal('10.00'),
+                description=f'Transaction {i}',
+                date=now - datetime.timedelta(hours=i // 3),
+                is_expense=True
+            )
+        
+        self.expected = list(
+            Transaction.objects.filter(user=self.user).order_by('-date', '-id').values_list('id', flat=True)
+        )
+        self.client.login(username='pageuser', password='testpassword123')
+    
+    def walk(self, params=None):
+        """Follow the 'Older' cursors and return the pages seen"""
+        params = dict(params or {})
+        pages = []
+        while True:
+            response = self.client.get(reverse('transactions'), params)
+            self.assertEqual(response.status_code, 200)
+            page = response.context['page']
+            pages.append(response)
+            if not page.has_next:
+                return pages
+            params['cursor'] = page.next_cursor
+    
+    def test_forward_walk_covers_every_transaction_once(self):
+        pages = self.walk()
+        seen = [t.id for response in pages for t in response.context['transactions']]
+        self.assertEqual(seen, self.expected)
+        self.assertEqual(len(pages), 3)
+    
+    def test_backward_walk_returns_to_first_page(self):
+        last = self.walk()[-1].context['page']
+        response = self.client.get(reverse('transactions'), {'cursor': last.previous_cursor})
+        middle = [t.id for t in response.context['transactions']]
+        self.assertEqual(middle, self.expected[50:100])
+        
+        response = self.client.get(reverse('transactions'), {'cursor': response.context['page'].previous_cursor})
+        self.assertEqual([t.id for t in response.context['transactions']], self.expected[:50])
+        self.assertFalse(response.context['page'].has_previous)
+    
+    def test_filters_are_kept_across_pages(self):
+        pages = self.walk({'category': self.food.id})
+        seen = [t for response in pages for t in response.context['transactions']]
+        self.assertEqual(len(seen), Transaction.objects.filter(category=self.food).count())
+        self.assertTrue(all(t.category_id == self.food.id for t in seen))
+        self.assertContains(pages[0], f'?category={self.food.id}&cursor=')
+    
+    def test_pages_do_not_use_offset(self):
+        first = self.walk()[0].context['page']
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('transactions'), {'cursor': first.next_cursor})
+        self.assertFalse(any('OFFSET' in query['sql'].upper() for query in queries))
+    
+    def test_invalid_cursor_falls_back_to_first_page(self):
+        response = self.client.get(reverse('transactions'), {'cursor': 'not-a-cursor'})
+        self.assertEqual([t.id for t in response.context['transactions']], self.expected[:50])
+
+
+class MonthlySummaryTests(TestCase):
+    """Tests for the incrementally maintained monthly summary table"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='summaryuser',
+            password='testpassword123'
+        )
+        self.food = Category.objects.create(name='Food', icon='food', is_expense=True)
+        self.rent = Category.objects.create(name='Rent', icon='home', is_expense=True)
+        self.salary = Category.objects.create(name='Salary', icon='money', is_expense=False)
+        
+        self.this_month = timezone.now()
+        self.last_month = month_start(*add_months(self.this_month.year, self.this_month.month, -1)) + datetime.timedelta(days=3)
+    
+    def add(self, amount, category, date=None, is_expense=True):
+        return Transaction.objects.create(
+            user=self.user,
+            category=category,
+            amount=Decimal(amount),
+            description='Test',
+            date=date or self.this_month,
+            is_expense=is_expense
+        )
+    
+    def assertInSync(self):
+        self.assertEqual(MonthlySummary.objects.drift(), [])
+    
+    def test_create_updates_totals(self):
+        self.add('10.00', self.food)
+        self.add('15.50', self.food)
+        self.add('1000.00', self.salary, is_expense=False)
+        
+        summary = MonthlySummary.objects.get(user=self.user, category=self.food)
+        self.assertEqual(summary.total, Decimal('25.50'))
+        self.assertEqual(summary.transaction_count, 2)
+        self.assertEqual(self.user.profile.calculate_savings(), Decimal('974.50'))
+        self.assertInSync()
+    
+    def test_edit_moves_between_months_and_categories(self):
+        transaction = self.add('40.00', self.food)
+        
+        transaction.date = self.last_month
+        transaction.save()
+        self.assertInSync()
+        
+        transaction = Transaction.objects.get(pk=transaction.pk)
+        transaction.category = self.rent
+        transaction.amount = Decimal('55.00')
+        transaction.save()
+        self.assertInSync()
+        
+        year, month = self.last_month.year, self.last_month.month
+        self.assertEqual(self.user.profile.calculate_savings(year, month), Decimal('-55.00'))
+        self.assertEqual(self.user.profile.calculate_savings(self.this_month.year, self.this_month.month), 0)
+    
+    def test_edit_of_deferred_instance(self):
+        transaction = self.add('40.00', self.food)
+        
+        transaction = Transaction.objects.only('id', 'description').get(pk=transaction.pk)
+        transaction.amount = Decimal('60.00')
+        transaction.save()
+        self.assertInSync()
+    
+    def test_delete_removes_totals(self):
+        keep = self.add('20.00', self.food)
+        self.add('30.00', self.food).delete()
+        Transaction.objects.filter(pk=self.add('5.00', self.rent).pk).delete()
+        
+        self.assertInSync()
+        self.assertEqual(MonthlySummary.objects.get(category=self.food).total, keep.amount)
+    
+    def test_category_delete_folds_into_uncategorized(self):
+        self.add('20.00', self.food)
+        self.add('30.00', self.rent)
+        Transaction.objects.create(
+            user=self.user, category=None, amount=Decimal('5.00'),
+            description='Misc', date=self.this_month, is_expense=True
+        )
+        
+        self.food.delete()
+        self.assertInSync()
+        self.assertEqual(MonthlySummary.objects.get(category=None).total, Decimal('25.00'))
+    
+    def test_user_delete_cascades(self):
+        self.add('20.00', self.food)
+        self.user.delete()
+        self.assertFalse(MonthlySummary.objects.exists())
+    
+    def test_rebuild_command_and_drift_check(self):
+        self.add('20.00', self.food)
+        self.add('35.00', self.rent, date=self.last_month)
+        MonthlySummary.objects.filter(category=self.food).update(total=Decimal('999.00'))
+        
+        with self.assertRaises(CommandError):
+            call_command('rebuild_monthly_summary', '--check', stdout=StringIO())
+        
+        call_command('rebuild_monthly_summary', stdout=StringIO())
+        self.assertInSync()
+        call_command('rebuild_monthly_summary', '--check', stdout=StringIO())
+    
+    def test_read_paths_do_not_scan_transactions(self):
+        self.add('20.00', self.food)
+        
+        with CaptureQueriesContext(connection) as queries:
+            self.user.profile.calculate_savings()
+            start, end = month_window(12)
+            monthly_rollup(self.user, start, end)
+        self.assertFalse(any('core_transaction' in query['sql'] for query in queries))
+
+
+class DashboardCacheTests(TestCase):
+    """Tests for the per-user dashboard cache"""
+    
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.user = User.objects.create_user(
+            username='cacheuser',
+            password='testpassword123'
+        )
+        self.other = User.objects.create_user(
+            username='otheruser',
+            password='testpassword123'
+        )
+        self.food = Category.objects.create(name='Food', icon='food', is_expense=True)
+        self.client.login(username='cacheuser', password='testpassword123')
+    
+    def add(self, user, amount):
+        return Transaction.objects.create(
+            user=user,
+            category=self.food,
+            amount=Decimal(amount),
+            description='Test',
+            date=timezone.now(),
+            is_expense=True
+        )
+    
+    def assertCached(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('dashboard'))
+        self.assertFalse(any('core_transaction' in query['sql'] for query in queries))
+    
+    def test_repeat_request_is_served_from_cache(self):
+        self.add(self.user, '20.00')
+        first = self.client.get(reverse('dashboard'))
+        self.assertCached()
+        second = self.client.get(reverse('dashboard'))
+        self.assertEqual(first.context['expenses'], second.context['expenses'])
+        self.assertEqual(dashboard_cache_stats()['hits'], 2)
+        self.assertEqual(dashboard_cache_stats()['misses'], 1)
+    
+    def test_transaction_changes_invalidate(self):
+        transaction = self.add(self.user, '20.00')
+        self.client.get(reverse('dashboard'))
+        
+        transaction.amount = Decimal('30.00')
+        transaction.save()
+        response = self.client.get(reverse('dashboard'))
+        self.assertEqual(response.context['expenses'], Decimal('30.00'))
+        
+        transaction.delete()
+        response = self.client.get(reverse('dashboard'))
+        self.assertEqual(response.context['expenses'], Decimal('0'))
+    
+    def test_budget_goal_and_achievement_changes_invalidate(self):
+        now = timezone.now()
+        for create in (
+            lambda: Budget.objects.create(user=self.user, category=self.food, amount=Decimal('100.00'), month=now.month, year=now.year),
+            lambda: SavingsGoal.objects.create(user=self.user, name='Laptop', target_amount=Decimal('500.00'), target_date=now.date()),
+            lambda: Achievement.objects.create(user=self.user, name='Saver', description='Saved', icon='star'),
+        ):
+            self.client.get(reverse('dashboard'))
+            create()
+            misses = dashboard_cache_stats()['misses']
+            self.client.get(reverse('dashboard'))
+            self.assertEqual(dashboard_cache_stats()['misses'], misses + 1)
+    
+    def test_other_users_changes_keep_cache(self):
+        self.client.get(reverse('dashboard'))
+        self.add(self.other, '20.00')
+        self.assertCached()
+    
+    def test_category_changes_invalidate(self):
+        self.client.get(reverse('dashboard'))
+        self.food.color = '#000000'
+        self.food.save()
+        self.client.get(reverse('dashboard'))
+        self.assertEqual(dashboard_cache_stats()['misses'], 2)
+    
+    def test_cache_is_invalidated_again_when_the_change_commits(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.add(self.user, '20.00')
+            self.food.save()
+            # Another request reading the old rows would cache them under these
+            versions = (get_version(self.user.pk), get_version('categories'))
+        
+        self.assertNotEqual(get_version(self.user.pk), versions[0])
+        self.assertNotEqual(get_version('categories'), versions[1])
+    
+    def test_widget_fragments_follow_data_changes(self):
+        now = timezone.now()
+        first = self.client.get(reverse('dashboard'))
+        self.assertNotContains(first, 'Laptop')
+        
+        SavingsGoal.objects.create(user=self.user, name='Laptop', target_amount=Decimal('500.00'), target_date=now.date())
+        Achievement.objects.create(user=self.user, name='First Saver', description='Saved', icon='star')
+        second = self.client.get(reverse('dashboard'))
+        
+        self.assertNotEqual(first.context['fragment_key'], second.context['fragment_key'])
+        self.assertContains(second, 'Laptop')
+        self.assertContains(second, 'First Saver')
+    
+    def test_widget_fragments_are_per_user(self):
+        SavingsGoal.objects.create(user=self.user, name='Laptop', target_amount=Decimal('500.00'))
+        self.assertContains(self.client.get(reverse('dashboard')), 'Laptop')
+        
+        self.client.force_login(self.other)
+        self.assertNotContains(self.client.get(reverse('dashboard')), 'Laptop')
+    
+    def test_stats_endpoint_is_staff_only(self):
+        response = self.client.get(reverse('dashboard_cache_stats'))
+        self.assertEqual(response.status_code, 403)
+        
+        self.user.is_staff = True
+        self.user.save()
+        response = self.client.get(reverse('dashboard_cache_stats'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response.json()), {'hits', 'misses', 'hit_rate'})
+
+
+class TransactionImportTests(TestCase):
+    """Tests for the CSV/OFX import pipeline"""
+    
+    OFX = (
+        'OFXHEADER:100\nDATA:OFXSGML\n\n'
+        '<OFX><BANKMSGSRSV1><STMTTRNRS><STMTRS><BANKTRANLIST>\n'
+        '<STMTTRN>\n<TRNTYPE>DEBIT\n<DTPOSTED>20240115093000.000[-5:EST]\n<TRNAMT>-12.50\n<NAME>Coffee\n</STMTTRN>\n'
+        '<STMTTRN>\n<TRNTYPE>CREDIT\n<DTPOSTED>20240131\n<TRNAMT>1500.00\n<NAME>Salary\n</STMTTRN>\n'
+        '</BANKTRANLIST></STMTRS></STMTTRNRS></BANKMSGSRSV1></OFX>\n'
+    )
+    
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(
+            username='importuser',
+            password='testpassword123'
+        )
+        self.food = Category.objects.create(name='Food', icon='food', is_expense=True)
+        self.salary = Category.objects.create(name='Salary', icon='money', is_expense=False)
+    
+    def csv_file(self, *rows, header='date,description,amount,category,type'):
+        return ('\n'.join((header,) + rows) + '\n').encode()
+    
+    def test_csv_rows_are_imported_with_categories(self):
+        data = self.csv_file(
+            '2024-01-05,Groceries,45.20,food,expense',
+            '2024-01-31 09:00,Stipend,1500.00,Salary,income',
+            '2024-02-02,Snacks,-3.50,,',
+        )
+        result = import_transactions(self.user, BytesIO(data))
+        
+        self.assertEqual((result.rows, result.created, result.error_count), (3, 3, 0))
+        groceries = Transaction.objects.get(description='Groceries')
+        self.assertEqual(groceries.category, self.food)
+        self.assertTrue(groceries.is_expense)
+        self.assertFalse(Transaction.objects.get(description='Stipend').is_expense)
+        snacks = Transaction.objects.get(description='Snacks')
+        self.assertTrue(snacks.is_expense)
+        self.assertEqual(snacks.amount, Decimal('3.50'))
+        self.assertEqual(MonthlySummary.objects.drift(), [])
+    
+    def test_invalid_rows_are_reported_and_skipped(self):
+        data = self.csv_file(
+            '2024-01-05,Groceries,45.20,Food,expense',
+            'not a date,Bad date,10.00,,expense',
+            '2024-01-06,Bad amount,abc,,expense',
+            '2024-01-07,Bad category,10.00,Travel,expense',
+            '2024-01-08,,10.00,,expense',
+        )
+        result = import_transactions(self.user, BytesIO(data))
+        
+        self.assertEqual(result.created, 1)
+        self.assertEqual(result.error_count, 4)
+        self.assertEqual([row for row, message in result.errors], [3, 4, 5, 6])
+        self.assertIn('Travel', result.errors[2][1])
+    
+    def test_rows_with_a_category_of_the_other_type_are_rejected(self):
+        data = self.csv_file(
+            '2024-01-05,Refund,20.00,Food,income',
+            '2024-01-06,Stipend,-1500.00,Salary,',
+            '2024-01-07,Groceries,45.20,Food,expense',
+        )
+        result = import_transactions(self.user, BytesIO(data))
+        
+        self.assertEqual((result.created, result.error_count), (1, 2))
+        self.assertEqual(result.errors, [
+            (2, '"Food" is not an income category'),
+            (3, '"Salary" is not an expense category'),
+        ])
+        self.assertFalse(Transaction.objects.exclude(is_expense=F('category__is_expense')).exists())
+    
+    def test_queries_scale_with_batches_not_rows(self):
+        rows = [f'2024-01-{day % 28 + 1:02d},Item {day},1.00,Food,expense' for day in range(500)]
+        
+        with CaptureQueriesContext(connection) as queries:
+            result = import_transactions(self.user, BytesIO(self.csv_file(*rows)), batch_size=100)
+        
+        self.assertEqual(result.created, 500)
+        inserts = [query for query in queries if query['sql'].startswith('INSERT INTO "core_transaction"')]
+        self.assertEqual(len(inserts), 5)
+        self.assertLess(len(queries), 40)
+        self.assertEqual(MonthlySummary.objects.get(category=self.food).transaction_count, 500)
+    
+    def test_ofx_transactions_are_imported(self):
+        result = import_transactions(self.user, BytesIO(self.OFX.encode()), 'ofx')
+        
+        self.assertEqual(result.created, 2)
+        coffee = Transaction.objects.get(description='Coffee')
+        self.assertTrue(coffee.is_expense)
+        self.assertEqual(coffee.amount, Decimal('12.50'))
+        self.assertEqual(timezone.localtime(coffee.date).date(), datetime.date(2024, 1, 15))
+        self.assertFalse(Transaction.objects.get(description='Salary').is_expense)
+    
+    def test_import_view(self):
+        self.client.login(username='importuser', password='testpassword123')
+        upload = SimpleUploadedFile('export.csv', self.csv_file('2024-01-05,Groceries,45.20,Food,expense'))
+        
+        response = self.client.post(reverse('import_transactions'), {'file': upload, 'format': 'auto'})
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['result'].created, 1)
+        self.assertEqual(Transaction.objects.filter(user=self.user).count(), 1)
+    
+    def test_import_command(self):
+        with tempfile.NamedTemporaryFile(suffix='.ofx') as export:
+            export.write(self.OFX.encode())
+            export.flush()
+            out = StringIO()
+            call_command('import_transactions', export.name, '--user', 'importuser', stdout=out)
+        
+        self.assertIn('Imported 2 of 2 rows', out.getvalue())
+        with self.assertRaises(CommandError):
+            call_command('import_transactions', 'missing.csv', '--user', 'nobody', stdout=StringIO())
+
+
+class ExportTests(TestCase):
+    """Tests for the streaming CSV/JSON exports"""
+    
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(
+            username='exportuser',
+            password='testpassword123'
+        )
+        self.other = User.objects.create_user(
+            username='otheruser',
+            password='testpassword123'
+        )
+        self.food = Category.objects.create(name='Food', icon='food', is_expense=True)
+        self.salary = Category.objects.create(name='Salary', icon='money', is_expense=False)
+        self.now = timezone.now()
+        
+        self.add(self.user, '12.50', self.food, True)
+        self.add(self.user, '1500.00', self.salary, False)
+        self.add(self.user, '3.00', None, True)
+        self.add(self.other, '99.00', self.food, True)
+        self.client.login(username='exportuser', password='testpassword123')
+    
+    def add(self, user, amount, category, is_expense):
+        return Transaction.objects.create(
+            user=user,
+            category=category,
+            amount=Decimal(amount),
+            description='Test',
+            date=self.now,
+            is_expense=is_expense
+        )
+    
+    def content(self, response):
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+    
+    def test_transactions_csv(self):
+        response = self.client.get(reverse('export_transactions', args=['csv']))
+        
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        rows = list(csv.reader(StringIO(self.content(response))))
+        self.assertEqual(rows[0], ['id', 'date', 'description', 'category', 'type', 'amount'])
+        self.assertEqual(len(rows), 4)
+        self.assertIn(['Test', 'Food', 'expense', '12.50'], [row[2:] for row in rows[1:]])
+        self.assertIn(['Test', '', 'expense', '3.00'], [row[2:] for row in rows[1:]])
+    
+    def test_transactions_json_honours_filters(self):
+        response = self.client.get(reverse('export_transactions', args=['json']), {'type': 'income'})
+        
+        data = json.loads(self.content(response))
+        self.assertEqual(len(data), 1)
+        self.assertEqual(data[0]['category'], 'Salary')
+        self.assertEqual(data[0]['amount'], '1500.00')
+        
+        response = self.client.get(reverse('export_transactions', args=['json']), {'category': self.food.id})
+        self.assertEqual([row['amount'] for row in json.loads(self.content(response))], ['12.50'])
+    
+    def test_export_builds_no_model_instances(self):
+        built = []
+        
+        def count(sender, **kwargs):
+            built.append(sender)
+        
+        post_init.connect(count, sender=Transaction)
+        try:
+            with CaptureQueriesContext(connection) as queries:
+                self.content(self.client.get(reverse('export_transactions', args=['csv'])))
+        finally:
+            post_init.disconnect(count, sender=Transaction)
+        
+        self.assertEqual(built, [])
+        self.assertEqual(len([query for query in queries if 'core_transaction' in query['sql']]), 1)
+    
+    def test_report_export(self):
+        response = self.client.get(reverse('export_income_expense_report', args=['json']), {'months': 3})
+        
+        data = json.loads(self.content(response))
+        self.assertEqual(len(data), 3)
+        self.assertEqual(data[-1]['income'], '1500.00')
+        self.assertEqual(data[-1]['expenses'], '15.50')
+        
+        response = self.client.get(reverse('export_income_expense_report', args=['csv']))
+        self.assertEqual(len(self.content(response).splitlines()), 7)
+    
+    def test_unknown_format(self):
+        response = self.client.get(reverse('export_transactions', args=['xml']))
+        self.assertEqual(response.status_code, 404)
+
+
+@override_settings(QUERY_METRICS_SAMPLE_RATE=1.0, QUERY_METRICS_SERVER_TIMING=True)
+class QueryMetricsTests(TestCase):
+    """Tests for the query metrics middleware and report"""
+    
+    def setUp(self):
+        metrics_registry.reset()
+        self.client = Client()
+        self.user = User.objects.create_user(
+            username='metricsuser',
+            password='testpassword123'
+        )
+        self.client.login(username='metricsuser', password='testpassword123')
+    
+    def test_requests_are_recorded_per_view(self):
+        self.client.get(reverse('transactions'))
+        response = self.client.get(reverse('transactions'))
+        
+        self.assertRegex(response['Server-Timing'], r'^db;dur=[\d.]+;desc="\d+ queries", total;dur=[\d.]+$')
+        metrics = metrics_registry.report()['transactions']
+        self.assertEqual(metrics['requests'], 2)
+        self.assertGreater(metrics['avg_queries'], 0)
+        self.assertIn('SELECT', metrics['slowest_sql'])
+    
+    @override_settings(QUERY_METRICS_SAMPLE_RATE=0.0)
+    def test_unsampled_requests_are_skipped(self):
+        response = self.client.get(reverse('transactions'))
+        
+        self.assertNotIn('Server-Timing', response)
+        self.assertEqual(metrics_registry.report(), {})
+    
+    @override_settings(QUERY_METRICS_MAX_QUERIES=1)
+    def test_chatty_requests_are_logged(self):
+        with self.assertLogs('core.metrics', level='WARNING') as logs:
+            self.client.get(reverse('transactions'))
+        
+        self.assertIn('view=transactions', logs.output[0])
+        self.assertGreater(logs.records[0].metrics['queries'], 1)
+    
+    def test_report_is_staff_only(self):
+        response = self.client.get(reverse('query_metrics'))
+        self.assertEqual(response.status_code, 403)
+        
+        self.user.is_staff = True
+        self.user.save()
+        self.client.get(reverse('transactions'))
+        response = self.client.get(reverse('query_metrics'))
+        self.assertIn('transactions', response.json()['views'])
+        
+        self.client.post(reverse('query_metrics'))
+        self.assertEqual(list(metrics_registry.report()), ['query_metrics'])
+
+
+class QueryBudgetTests(TestCase):
+    """
+    Query budgets and render time baselines for every named route.
+    
+    Each route is requested by a user with a realistic amount of data and
+    must stay within its query budget. Median render times are compared
+    with core/performance_baseline.json; run with PERF_BASELINE_UPDATE=1 to
+    rewrite the baseline and PERF_TOLERANCE to change the allowed slowdown.
+    """
+    
+    BASELINE_PATH = Path(__file__).with_name('performance_baseline.json')
+    
+    # Allowed slowdown over the baseline, as a fraction, plus a fixed
+    # allowance so very fast views do not fail on timer noise
+    TOLERANCE = float(os.environ.get('PERF_TOLERANCE', 1.0))
+    SLACK_MS = 20
+    TIMED_RUNS = 3
+    
+    # (route name, URL argument, maximum queries)
+    ROUTES = [
+        ('register', None, 2),
+        ('login', None, 2),
+        ('dashboard', None, 7),
+        ('profile', None, 6),
+        ('transactions', None, 4),
+        ('add_transaction', None, 3),
+        ('import_transactions', None, 2),
+        ('export_transactions', 'csv', 3),
+        ('edit_transaction', 'transaction', 4),
+        ('delete_transaction', 'transaction', 4),
+        ('budgets', None, 3),
+        ('add_budget', None, 3),
+        ('edit_budget', 'budget', 4),
+        ('delete_budget', 'budget', 4),
+        ('savings', None, 3),
+        ('add_savings_goal', None, 2),
+        ('edit_savings_goal', 'goal', 3),
+        ('delete_savings_goal', 'goal', 3),
+        ('update_savings', 'goal', 3),
+        ('categories', None, 3),
+        ('add_category', None, 2),
+        ('edit_category', 'category', 3),
+        ('delete_category', 'category', 3),
+        ('income_expense_report', None, 4),
+        ('export_income_expense_report', 'csv', 3),
+        ('debug_urls', None, 2),
+        ('dashboard_cache_stats', None, 2),
+        ('query_metrics', None, 2),
+        ('logout', None, 4),
+    ]
+    
+    # Async views read through their own connections in worker threads,
+    # which cannot see the data of a TestCase transaction; AsyncViewTests
+    # covers them
+    ASYNC_ROUTES = {'dashboard_async', 'income_expense_report_async'}
+    
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='budgetuser',
+            password='testpassword123',
+            is_staff=True
+        )
+        rng = random.Random(7)
+        now = timezone.now()
+        
+        categories = [
+            Category.objects.create(
+                name=f'Category {i}',
+                icon='tag',
+                is_expense=i >= 4
+            )
+            for i in range(20)
+        ]
+        expense_categories = [category for category in categories if category.is_expense]
+        
+        Budget.objects.bulk_create([
+            Budget(
+                user=cls.user,
+                category=category,
+                amount=Decimal('500.00'),
+                month=now.month,
+                year=now.year
+            )
+            for category in expense_categories[:12]
+        ])
+        
+        SavingsGoal.objects.bulk_create([
+            SavingsGoal(
+                user=cls.user,
+                name=f'Goal {i}',
+                target_amount=Decimal('10000.00'),
+                current_amount=Decimal(250 * i),
+                target_date=(now + datetime.timedelta(days=30 * (i + 1))).date()
+            )
+            for i in range(8)
+        ])
+        
+        Achievement.objects.bulk_create([
+            Achievement(user=cls.user, name=f'Achievement {i}', description='Earned', icon='star')
+            for i in range(6)
+        ])
+        
+        transactions = []
+        for i in range(3000):
+            category = rng.choice(categories)
+            transactions.append(Transaction(
+                user=cls.user,
+                category=category,
+                amount=Decimal(rng.randint(100, 500000)) / 100,
+                description=f'Transaction {i}',
+                date=now - datetime.timedelta(minutes=rng.randint(0, 2 * 365 * 24 * 60)),
+                is_expense=category.is_expense
+            ))
+        Transaction.objects.bulk_create(transactions)
+        MonthlySummary.objects.rebuild([cls.user])
+        
+        cls.objects = {
+            'transaction': Transaction.objects.filter(user=cls.user).first().pk,
+            'budget': Budget.objects.filter(user=cls.user).first().pk,
+            'goal': SavingsGoal.objects.filter(user=cls.user).first().pk,
+            'category': categories[-1].pk,
+            'csv': 'csv',
+        }
+    
+    def setUp(self):
+        cache.clear()
+    
+    def url(self, name, argument):
+        if argument is None:
+            return reverse(name)
+        return reverse(name, args=[self.objects[argument]])
+    
+    def logged_in_client(self):
+        """A fresh session of the seeded user with an empty cache"""
+        cache.clear()
+        client = Client()
+        client.force_login(self.user)
+        return client
+    
+    def fetch(self, client, url):
+        response = client.get(url)
+        if response.streaming:
+            b''.join(response.streaming_content)
+        return response
+    
+    def test_every_route_has_a_budget(self):
+        names = {pattern.name for pattern in get_resolver('core.urls').url_patterns}
+        self.assertEqual(names - self.ASYNC_ROUTES, {name for name, argument, budget in self.ROUTES})
+    
+    def test_query_budgets(self):
+        for name, argument, budget in self.ROUTES:
+            with self.subTest(route=name):
+                client = self.logged_in_client()
+                url = self.url(name, argument)
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.fetch(client, url)
+                self.assertLess(response.status_code, 400)
+                self.assertLessEqual(
+                    len(queries),
+                    budget,
+                    f'{name} ran {len(queries)} queries, budget is {budget}'
+                )
+    
+    def test_render_times_against_baseline(self):
+        timings = {}
+        for name, argument, budget in self.ROUTES:
+            url = self.url(name, argument)
+            self.fetch(self.logged_in_client(), url)  # Warm up templates and the database
+            samples = []
+            for _ in range(self.TIMED_RUNS):
+                client = self.logged_in_client()
+                started = time.perf_counter()
+                self.fetch(client, url)
+                samples.append((time.perf_counter() - started) * 1000)
+            timings[name] = round(statistics.median(samples), 2)
+        
+        if os.environ.get('PERF_BASELINE_UPDATE') == '1':
+            self.BASELINE_PATH.write_text(json.dumps(timings, indent=2, sort_keys=True) + '\n')
+            return
+        
+        if not self.BASELINE_PATH.exists():
+            self.skipTest('No performance baseline recorded')
+        
+        baseline = json.loads(self.BASELINE_PATH.read_text())
+        for name, median in timings.items():
+            if name not in baseline:
+                continue
+            with self.subTest(route=name):
+                allowed = baseline[name] * (1 + self.TOLERANCE) + self.SLACK_MS
+                self.assertLessEqual(
+                    median,
+                    allowed,
+                    f'{name} took {median} ms, baseline is {baseline[name]} ms'
+                )
+
+
+class GenerateDataTests(TestCase):
+    """Tests for the synthetic data generator"""
+    
+    def generate(self, *args):
+        call_command('generate_data', '--users', '3', '--months', '3', *args, stdout=StringIO())
+        transactions = Transaction.objects.filter(user__username__startswith='load_')
+        return transactions.count(), transactions.aggregate(total=Sum('amount'))['total']
+    
+    def test_generates_consistent_data(self):
+        self.generate()
+        
+        users = User.objects.filter(username__startswith='load_')
+        self.assertEqual(users.count(), 3)
+        self.assertTrue(all(user.check_password('loadtest123') for user in users[:1]))
+        self.assertEqual(UserProfile.objects.filter(user__in=users).count(), 3)
+        self.assertTrue(Budget.objects.filter(user__in=users).exists())
+        self.assertTrue(SavingsGoal.objects.filter(user__in=users).exists())
+        self.assertEqual(MonthlySummary.objects.drift(), [])
+    
+    def test_seed_is_deterministic(self):
+        first = self.generate('--seed', '5')
+        second = self.generate('--seed', '5', '--clear')
+        third = self.generate('--seed', '6', '--clear')
+        
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, third)
+    
+    def test_refuses_to_duplicate_users(self):
+        self.generate()
+        with self.assertRaises(CommandError):
+            self.generate()
+
+
+class PeriodTotalsTests(TestCase):
+    """Tests for the shared single-query income/expense totals"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='totalsuser',
+            password='testpassword123'
+        )
+        self.food = Category.objects.create(name='Food', icon='food', is_expense=True)
+        self.salary = Category.objects.create(name='Salary', icon='money', is_expense=False)
+        
+        now = timezone.localtime()
+        self.year, self.month = add_months(now.year, now.month, -1)
+        self.start = month_start(self.year, self.month)
+        for day, amount, category, is_expense in [
+            (1, '1000.00', self.salary, False),
+            (3, '120.00', self.food, True),
+            (10, '80.50', self.food, True),
+            (20, '200.00', self.salary, False),
+        ]:
+            Transaction.objects.create(
+                user=self.user,
+                category=category,
+                amount=Decimal(amount),
+                description='Test',
+                date=self.start + datetime.timedelta(days=day - 1, hours=12),
+                is_expense=is_expense
+            )
+    
+    def test_whole_months_read_the_summary(self):
+        end = month_start(*add_months(self.year, self.month, 1))
+        with CaptureQueriesContext(connection) as queries:
+            totals = period_totals(self.user, self.start, end)
+        
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('core_transaction', queries[0]['sql'])
+        self.assertEqual(totals, (Decimal('1200.00'), Decimal('200.50'), Decimal('999.50'), 4))
+        self.assertEqual(period_totals(self.user), totals)
+    
+    def test_partial_ranges_use_half_open_date_ranges(self):
+        start = self.start + datetime.timedelta(days=2)
+        end = self.start + datetime.timedelta(days=19, hours=12)
+        with CaptureQueriesContext(connection) as queries:
+            totals = period_totals(self.user, start, end)
+        
+        self.assertEqual(len(queries), 1)
+        sql = queries[0]['sql']
+        self.assertIn('core_transaction', sql)
+        self.assertNotIn('django_datetime_extract', sql)
+        # The transaction exactly at the end of the range is excluded
+        self.assertEqual(totals, (Decimal('0'), Decimal('200.50'), Decimal('-200.50'), 2))
+    
+    def test_calculate_savings_for_a_month(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(self.user.profile.calculate_savings(self.year, self.month), Decimal('999.50'))
+    
+    def test_budget_progress_for_a_month_avoids_date_extraction(self):
+        Budget.objects.create(user=self.user, category=self.food, amount=Decimal('400.00'), month=self.month, year=self.year)
+        
+        with CaptureQueriesContext(connection) as queries:
+            budget = Budget.objects.filter(user=self.user).with_progress(self.year, self.month).get()
+        self.assertNotIn('django_datetime_extract', queries[0]['sql'])
+        self.assertEqual(budget.spent, Decimal('200.50'))
+        
+        budget = Budget.objects.get(pk=budget.pk)
+        self.assertEqual(budget.get_spent_amount(), Decimal('200.50'))
+
+
+class AsyncViewTests(TransactionTestCase):
+    """
+    Tests for the async dashboard and report views. The concurrent queries
+    run on their own connections, so the data must be committed.
+    """
+    
+    def setUp(self):
+        cache.clear()
+        metrics_registry.reset()
+        self.user = User.objects.create_user(
+            username='asyncuser',
+            password='testpassword123'
+        )
+        food = Category.objects.create(name='Food', icon='food', is_expense=True)
+        salary = Category.objects.create(name='Salary', icon='money', is_expense=False)
+        
+        now = timezone.now()
+        for amount, category, is_expense in [
+            ('3000.00', salary, False),
+            ('120.00', food, True),
+            ('80.50', food, True),
+        ]:
+            Transaction.objects.create(
+                user=self.user,
+                category=category,
+                amount=Decimal(amount),
+                description='Test',
+                date=now,
+                is_expense=is_expense
+            )
+        Budget.objects.create(user=self.user, category=food, amount=Decimal('400.00'), month=now.month, year=now.year)
+        SavingsGoal.objects.create(user=self.user, name='Laptop', target_amount=Decimal('500.00'), target_date=now.date())
+        Achievement.objects.create(user=self.user, name='Saver', description='Saved', icon='star')
+        
+        self.client.force_login(self.user)
+        self.async_client.force_login(self.user)
+    
+    def get_async(self, name, **params):
+        return async_to_sync(self.async_client.get)(reverse(name), params)
+    
+    def test_async_dashboard_matches_sync_dashboard(self):
+        expected = self.client.get(reverse('dashboard')).context
+        cache.clear()
+        response = self.get_async('dashboard_async')
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertTemplateUsed(response, 'core/dashboard.html')
+        for key in ('income', 'expenses', 'savings_rate', 'budget_data'):
+            self.assertEqual(response.context[key], expected[key])
+        for key in ('recent_transactions', 'budgets', 'savings_goals', 'achievements'):
+            self.assertEqual(
+                [item.pk for item in response.context[key]],
+                [item.pk for item in expected[key]]
+            )
+    
+    def test_async_dashboard_uses_the_dashboard_cache(self):
+        self.get_async('dashboard_async')
+        self.get_async('dashboard_async')
+        self.assertEqual(dashboard_cache_stats()['misses'], 1)
+        self.assertEqual(dashboard_cache_stats()['hits'], 1)
+    
+    def test_dashboards_are_built_from_the_primary(self):
+        # There is no 'replica' connection here, so a read sent to it fails
+        with override_settings(DATABASE_REPLICA='replica'):
+            self.assertEqual(self.client.get(reverse('dashboard')).status_code, 200)
+            cache.clear()
+            self.assertEqual(self.get_async('dashboard_async').status_code, 200)
+    
+    def test_async_report_matches_sync_report(self):
+        params = {'months': 3, 'breakdown_from': '2020-01-01'}
+        expected = self.client.get(reverse('income_expense_report'), params).context
+        response = self.get_async('income_expense_report_async', **params)
+        
+        self.assertEqual(response.status_code, 200)
+        for key in ('selected_months', 'chart_data', 'expense_chart_data', 'income_chart_data',
+                    'top_expense_category', 'breakdown_from', 'breakdown_to'):
+            self.assertEqual(response.context[key], expected[key])
+    
+    def test_async_views_require_login(self):
+        self.async_client.logout()
+        for name in ('dashboard_async', 'income_expense_report_async'):
+            response = self.get_async(name)
+            self.assertEqual(response.status_code, 302)
+            self.assertIn(reverse('login'), response.url)
+    
+    def test_queries_in_worker_threads_are_measured(self):
+        self.get_async('dashboard_async')
+        
+        metrics = metrics_registry.report()['dashboard_async']
+        self.assertGreaterEqual(metrics['max_queries'], 5)
+    
+    def test_gather_queries_runs_concurrently(self):
+        def slow(value):
+            time.sleep(0.2)
+            return value
+        
+        started = time.perf_counter()
+        results = async_to_sync(gather_queries)({
+            'first': lambda: slow(1),
+            'second': lambda: slow(2),
+            'third': lambda: slow(3),
+        })
+        
+        self.assertEqual(results, {'first': 1, 'second': 2, 'third': 3})
+        self.assertLess(time.perf_counter() - started, 0.5)
+
+
+class DatabaseConfigTests(TestCase):
+    """Tests for the environment-driven database settings and the replica router"""
+    
+    def test_sqlite_is_the_default_and_uses_wal(self):
+        config = database_config({}, '/srv/app')
+        self.assertEqual(config['ENGINE'], 'django.db.backends.sqlite3')
+        self.assertEqual(config['NAME'], Path('/srv/app/db.sqlite3'))
+        self.assertIn('PRAGMA journal_mode=WAL', config['OPTIONS']['init_command'])
+        
+        self.assertEqual(config['OPTIONS']['transaction_mode'], 'IMMEDIATE')
+        
+        config = database_config({'DB_NAME': '/data/bb.sqlite3 ', 'DB_SQLITE_WAL': 'False'}, '/srv/app')
+        self.assertEqual(config['NAME'], Path('/data/bb.sqlite3'))
+        self.assertNotIn('journal_mode', config['OPTIONS']['init_command'])
+        self.assertIn('PRAGMA busy_timeout=5000', config['OPTIONS']['init_command'])
+    
+    def test_sqlite_transaction_mode_is_validated(self):
+        config = database_config({'DB_SQLITE_TRANSACTION_MODE': 'deferred'}, '/srv/app')
+        self.assertEqual(config['OPTIONS']['transaction_mode'], 'DEFERRED')
+        
+        with self.assertRaises(ImproperlyConfigured):
+            database_config({'DB_SQLITE_TRANSACTION_MODE': 'LAZY'}, '/srv/app')
+    
+    def test_sqlite_files_are_opened_with_the_tuned_pragmas(self):
+        from django.db.backends.sqlite3.base import DatabaseWrapper
+        
+        with tempfile.TemporaryDirectory() as directory:
+            config = databases({'DB_ENGINE': 'sqlite', 'DB_NAME': 'primary.sqlite3'}, directory)['default']
+            wrapper = DatabaseWrapper({**connection.settings_dict, **config}, alias='wal_check')
+            try:
+                with wrapper.cursor() as cursor:
+                    cursor.execute('PRAGMA journal_mode')
+                    self.assertEqual(cursor.fetchone()[0], 'wal')
+                    cursor.execute('PRAGMA synchronous')
+                    self.assertEqual(cursor.fetchone()[0], 1)  # NORMAL
+                    cursor.execute('PRAGMA busy_timeout')
+                    self.assertEqual(cursor.fetchone()[0], 5000)
+                    cursor.execute('PRAGMA cache_size')
+                    self.assertEqual(cursor.fetchone()[0], -20000)
+            finally:
+                wrapper.close()
+    
+    def test_server_databases_keep_connections_open(self):
+        config = database_config({'DB_ENGINE': 'postgresql', 'DB_USER': 'bb'}, '/srv/app')
+        self.assertEqual(config['ENGINE'], 'django.db.backends.postgresql')
+        self.assertEqual(config['PORT'], '5432')
+        self.assertEqual(config['CONN_MAX_AGE'], 60)
+        self.assertTrue(config['CONN_HEALTH_CHECKS'])
+        self.assertNotIn('pool', config['OPTIONS'])
+        
+        config = database_config({'DB_ENGINE': 'mysql', 'DB_CONN_MAX_AGE': '300'}, '/srv/app')
+        self.assertEqual(config['PORT'], '3306')
+        self.assertEqual(config['CONN_MAX_AGE'], 300)
+        self.assertEqual(config['OPTIONS']['charset'], 'utf8mb4')
+    
+    def test_postgresql_pool_replaces_persistent_connections(self):
+        config = database_config({'DB_ENGINE': 'postgresql', 'DB_POOL': 'True', 'DB_POOL_MAX_SIZE': '20'}, '/srv/app')
+        self.assertEqual(config['CONN_MAX_AGE'], 0)
+        self.assertEqual(config['OPTIONS']['pool'], {'min_size': 2, 'max_size': 20, 'timeout': 10})
+    
+    def test_replica_settings_fall_back_to_the_primary(self):
+        env = {
+            'DB_ENGINE': 'postgresql',
+            'DB_NAME': 'bachatbuddy',
+            'DB_USER': 'bb',
+            'DB_HOST': 'primary.internal',
+        }
+        self.assertNotIn('replica', databases(env, '/srv/app'))
+        
+        env.update({'DB_REPLICA_NAME': 'bachatbuddy', 'DB_REPLICA_HOST': 'replica.internal'})
+        replica = databases(env, '/srv/app')['replica']
+        self.assertEqual(replica['HOST'], 'replica.internal')
+        self.assertEqual(replica['USER'], 'bb')
+        self.assertEqual(replica['TEST'], {'MIRROR': 'default'})
+    
+    @override_settings(DATABASE_REPLICA='replica')
+    def test_router_sends_reads_in_replica_views_to_the_replica(self):
+        router = ReplicaRouter()
+        self.assertIsNone(router.db_for_read(Transaction))
+        
+        with replica_reads():
+            self.assertEqual(router.db_for_read(Transaction), 'replica')
+            self.assertEqual(router.db_for_read(MonthlySummary), 'replica')
+            # Sessions and users are read right after they are written
+            self.assertIsNone(router.db_for_read(User))
+            self.assertEqual(router.db_for_write(Transaction), 'default')
+        
+        self.assertFalse(router.allow_migrate('replica', 'core'))
+        
+        @reads_from_replica
+        def view():
+            return router.db_for_read(Budget)
+        
+        @reads_from_replica
+        async def async_view():
+            return router.db_for_read(Budget)
+        
+        self.assertEqual(view(), 'replica')
+        self.assertEqual(async_to_sync(async_view)(), 'replica')
+        self.assertIsNone(router.db_for_read(Budget))
+    
+    def test_router_reads_from_default_without_a_replica(self):
+        with replica_reads():
+            self.assertIsNone(ReplicaRouter().db_for_read(Transaction))
+
+
+class ContributionTests(TestCase):
+    """Tests for the atomic savings contribution service"""
+    
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='saver',
+            password='testpassword123'
+        )
+        self.goal = SavingsGoal.objects.create(
+            user=self.user,
+            name='Laptop',
+            target_amount=Decimal('1000.00'),
+            current_amount=Decimal('900.00')
+        )
+    
+    def test_contribution_updates_goal_and_records_transaction(self):
+        contribution = contribute_to_goal(self.goal, Decimal('50.00'))
+        
+        self.goal.refresh_from_db()
+        self.assertEqual(self.goal.current_amount, Decimal('950.00'))
+        self.assertEqual(contribution.goal.current_amount, Decimal('950.00'))
+        self.assertIsNone(contribution.achievement)
+        
+        entry = Transaction.objects.get(user=self.user)
+        self.assertEqual(entry, contribution.transaction)
+        self.assertEqual(entry.category.name, 'Savings')
+        self.assertTrue(entry.is_expense)
+        self.assertEqual(entry.amount, Decimal('50.00'))
+    
+    def test_achievement_is_earned_once_when_the_target_is_crossed(self):
+        self.assertIsNone(contribute_to_goal(self.goal, Decimal('60.00')).achievement)
+        self.assertIsNotNone(contribute_to_goal(self.goal, Decimal('40.00')).achievement)
+        self.assertIsNone(contribute_to_goal(self.goal, Decimal('10.00')).achievement)
+        
+        self.assertEqual(Achievement.objects.filter(user=self.user).count(), 1)
+    
+    def test_savings_category_is_looked_up_once(self):
+        # The id is cached once the category's transaction commits
+        with self.captureOnCommitCallbacks(execute=True):
+            contribute_to_goal(self.goal, Decimal('1.00'))
+        
+        with CaptureQueriesContext(connection) as queries:
+            contribute_to_goal(self.goal, Decimal('1.00'))
+        self.assertFalse(any('FROM "core_category"' in query['sql'] for query in queries))
+    
+    def test_deleted_savings_category_is_recreated(self):
+        first = savings_category_id()
+        Category.objects.filter(pk=first).get().delete()
+        
+        second = savings_category_id()
+        self.assertNotEqual(first, second)
+        self.assertTrue(Category.objects.filter(pk=second, name='Savings').exists())
+    
+    def test_existing_savings_category_is_matched_by_name(self):
+        existing = Category.objects.create(name='Savings', icon='bank', color='#000000', is_expense=False)
+        
+        self.assertEqual(savings_category_id(), existing.pk)
+        self.assertEqual(Category.objects.filter(name='Savings').count(), 1)
+    
+    def test_update_savings_view_contributes(self):
+        client = Client()
+        client.force_login(self.user)
+        response = client.post(reverse('update_savings', args=[self.goal.pk]), {'amount': '100.00'})
+        
+        self.assertRedirects(response, reverse('savings'), fetch_redirect_response=False)
+        self.goal.refresh_from_db()
+        self.assertEqual(self.goal.current_amount, Decimal('1000.00'))
+        self.assertEqual(Achievement.objects.filter(user=self.user).count(), 1)
+
+
+class ContributionConcurrencyTests(TransactionTestCase):
+    """
+    Parallel contributions to one goal must all be counted.
+    
+    The in-memory test database locks whole tables between connections and
+    never waits for them, so the workers use a scratch database file with
+    the project's SQLite settings instead.
+    """
+    
+    WORKERS = 8
+    CONTRIBUTIONS = 5
+    
+    def run_in_thread(self, function):
+        """Call function in a new thread, with its own connection, and return its result"""
+        result = {}
+        
+        def target():
+            try:
+                result['value'] = function()
+            finally:
+                connections.close_all()
+        
+        thread = threading.Thread(target=target)
+        thread.start()
+        thread.join()
+        return result['value']
+    
+    def setUp(self):
+        cache.clear()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        
+        # New connections, which are opened per thread, use the file; this
+        # thread keeps its connection to the in-memory test database
+        settings_dict = connection.settings_dict
+        self.addCleanup(settings_dict.update, {'NAME': settings_dict['NAME']})
+        settings_dict['NAME'] = os.path.join(directory.name, 'contributions.sqlite3')
+        self.run_in_thread(lambda: call_command('migrate', verbosity=0, interactive=False))
+    
+    def test_parallel_contributions_are_not_lost(self):
+        def create_goal():
+            user = User.objects.create_user(username='parallel', password='testpassword123')
+            savings_category_id()
+            return SavingsGoal.objects.create(user=user, name='Trip', target_amount=Decimal('300.00'))
+        
+        goal = self.run_in_thread(create_goal)
+        errors = []
+        ready = threading.Barrier(self.WORKERS)
+        
+        def worker():
+            try:
+                ready.wait()
+                for _ in range(self.CONTRIBUTIONS):
+                    # Each worker holds a copy with a stale current amount
+                    contribute_to_goal(SavingsGoal.objects.get(pk=goal.pk), Decimal('10.00'))
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connections.close_all()
+        
+        threads = [threading.Thread(target=worker) for _ in range(self.WORKERS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        self.assertEqual(errors, [])
+        current_amount, transactions, achievements = self.run_in_thread(lambda: (
+            SavingsGoal.objects.get(pk=goal.pk).current_amount,
+            Transaction.objects.filter(user_id=goal.user_id).count(),
+            Achievement.objects.filter(user_id=goal.user_id).count(),
+        ))
+        self.assertEqual(current_amount, Decimal('400.00'))
+        self.assertEqual(transactions, self.WORKERS * self.CONTRIBUTIONS)
+        self.assertEqual(achievements, 1)
+
+
+
+class StaticFilesTests(TestCase):
+    """Tests for the collectstatic output and how static files are served"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        static_root = cls.enterClassContext(tempfile.TemporaryDirectory())
+        cls.enterClassContext(override_settings(
+            DEBUG=False,
+            STATIC_ROOT=static_root,
+            STORAGES={
+                **settings.STORAGES,
+                'staticfiles': {'BACKEND': 'whitenoise.storage.CompressedManifestStaticFilesStorage'},
+            },
+            WHITENOISE_MAX_AGE=60,
+        ))
+        call_command('collectstatic', interactive=False, verbosity=0)
+        cls.static_root = Path(static_root)
+
+    def get(self, url, encoding):
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING=encoding)
+        body = b''.join(response.streaming_content)
+        response.close()
+        return response, body
+
+    def test_collectstatic_writes_hashed_and_compressed_files(self):
+        for name in ['css/style.css', 'js/main.js', 'js/fix.js']:
+            url = static(name)
+            stem, extension = os.path.splitext(name)
+            self.assertRegex(url, rf'^/static/{stem}\.[0-9a-f]{{12}}\{extension}$')
+            
+            path = self.static_root / url[len('/static/'):]
+            size = path.stat().st_size
+            self.assertLess(Path(f'{path}.gz').stat().st_size, size)
+            self.assertLess(Path(f'{path}.br').stat().st_size, size)
+
+    def test_pages_link_hashed_files(self):
+        response = self.client.get(reverse('login'))
+        
+        self.assertContains(response, static('css/style.css'))
+        self.assertContains(response, static('js/main.js'))
+        self.assertNotContains(response, '/static/css/style.css"')
+
+    def test_hashed_files_are_immutable_and_precompressed(self):
+        url = static('js/main.js')
+        path = self.static_root / url[len('/static/'):]
+        
+        response, body = self.get(url, 'gzip, deflate, br')
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(body, Path(f'{path}.br').read_bytes())
+        
+        response, body = self.get(url, 'gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(body, Path(f'{path}.gz').read_bytes())
+        
+        response, body = self.get(url, '')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(body, path.read_bytes())
+
+    def test_unhashed_files_are_cached_briefly(self):
+        response, body = self.get('/static/css/style.css', 'gzip')
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Cache-Control'], 'max-age=60, public')
+
+    def test_served_under_asgi(self):
+        url = static('css/style.css')
+        path = self.static_root / url[len('/static/'):]
+        
+        async def fetch():
+            response = await self.async_client.get(url, headers={'accept-encoding': 'gzip'})
+            body = b''.join([chunk async for chunk in response.streaming_content])
+            response.close()
+            return response, body
+        
+        response, body = async_to_sync(fetch)()
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(body, Path(f'{path}.gz').read_bytes())
+
+
+
+class DemoServerTests(TestCase):
+    """Tests for simple_server.py, the Django-free kiosk demo server"""
+
+    def setUp(self):
+        import simple_server
+        self.simple_server = simple_server
+        # Keep the request log out of the test output
+        patcher = mock.patch.object(simple_server.FinancialAppHandler, 'log_message')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.httpd = simple_server.DemoServer(('127.0.0.1', 0), simple_server.FinancialAppHandler)
+        thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        thread.start()
+        self.addCleanup(self.httpd.server_close)
+        self.addCleanup(self.httpd.shutdown)
+
+    def get(self, path, method='GET', headers=None):
+        conn = http.client.HTTPConnection(*self.httpd.server_address, timeout=5)
+        self.addCleanup(conn.close)
+        conn.request(method, path, headers=headers or {})
+        response = conn.getresponse()
+        return response, response.read()
+
+    def test_pages_are_rendered_without_template_tags(self):
+        response, body = self.get('/dashboard')
+        
+        self.assertEqual(response.status, 200)
+        self.assertEqual(response.headers['Content-Type'], 'text/html; charset=utf-8')
+        self.assertIn(b'<title>Dashboard - Student Financial Stability</title>', body)
+        self.assertNotIn(b'{% block', body)
+        self.assertNotIn(b'%}', body)
+
+    def test_static_files_have_mime_types_and_validators(self):
+        response, body = self.get('/static/css/style.css')
+        
+        self.assertEqual(response.status, 200)
+        self.assertEqual(response.headers['Content-Type'], 'text/css; charset=utf-8')
+        self.assertEqual(body, (Path(self.simple_server.STATIC_DIR) / 'css' / 'style.css').read_bytes())
+        
+        etag = response.headers['ETag']
+        response, body = self.get('/static/css/style.css', headers={'If-None-Match': etag})
+        self.assertEqual(response.status, 304)
+        self.assertEqual(body, b'')
+        
+        last_modified = response.headers['Last-Modified']
+        response, body = self.get('/static/css/style.css', headers={'If-Modified-Since': last_modified})
+        self.assertEqual(response.status, 304)
+
+    def test_head_sends_headers_only(self):
+        page, body = self.get('/')
+        response, head_body = self.get('/', method='HEAD')
+        
+        self.assertEqual(response.status, 200)
+        self.assertEqual(head_body, b'')
+        self.assertEqual(response.headers['Content-Length'], str(len(body)))
+        self.assertEqual(response.headers['ETag'], page.headers['ETag'])
+
+    def test_only_pages_and_static_files_are_served(self):
+        for path in ('/.env', '/db.sqlite3', '/simple_server.py', '/static/../manage.py', '/templates/home.html'):
+            response, body = self.get(path)
+            self.assertEqual(response.status, 404, path)
+        
+        response, body = self.get('/db.sqlite3', method='HEAD')
+        self.assertEqual(response.status, 404)
+        self.assertEqual(body, b'')
+
+    def test_page_cache_renders_again_when_the_template_changes(self):
+        with tempfile.TemporaryDirectory() as directory:
+            template = Path(directory) / 'home.html'
+            template.write_bytes(b'{% block content %}first{% endblock %}')
+            cache = self.simple_server.PageCache()
+            
+            with mock.patch.object(self.simple_server, 'TEMPLATES_DIR', directory):
+                first = cache.get('home.html', 'Home')
+                self.assertIs(cache.get('home.html', 'Home'), first)
+                
+                template.write_bytes(b'{% block content %}second, longer{% endblock %}')
+                second = cache.get('home.html', 'Home')
+        
+        self.assertEqual(first.body, b'first')
+        self.assertEqual(second.body, b'second, longer')
+        self.assertNotEqual(first.etag, second.etag)
+
+
+
+class BackupTests(TestCase):
+    """Tests for SQLite backups, incremental backups and restores"""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+        self.backups = self.directory / 'backups'
+        self.source = str(self.directory / 'source.sqlite3')
+        
+        db = sqlite3.connect(self.source)
+        db.execute('PRAGMA journal_mode=WAL')
+        db.execute('CREATE TABLE entries (id INTEGER PRIMARY KEY, note TEXT)')
+        db.executemany('INSERT INTO entries (note) VALUES (?)', [(f'entry {i} ' * 50,) for i in range(5000)])
+        db.commit()
+        db.close()
+
+    def rows(self, path):
+        db = sqlite3.connect(path)
+        try:
+            return db.execute('SELECT id, note FROM entries ORDER BY id').fetchall()
+        finally:
+            db.close()
+
+    def test_full_backup_round_trip(self):
+        backup = backup_sqlite(self.source, self.backups)
+        manifest = read_manifest(backup.manifest_path)
+        
+        self.assertEqual(manifest['kind'], 'full')
+        self.assertEqual(manifest['database'], 'source.sqlite3')
+        self.assertTrue((self.backups / manifest['artifact']).name.endswith('.sqlite3.gz'))
+        self.assertLess((self.backups / manifest['artifact']).stat().st_size, manifest['size'])
+        
+        target = str(self.directory / 'restored.sqlite3')
+        restore_sqlite(backup.manifest_path, target)
+        
+        self.assertEqual(self.rows(target), self.rows(self.source))
+        self.assertFalse(os.path.exists(target + '-wal'))
+
+    def test_incremental_backup_stores_only_changed_blocks(self):
+        full = backup_sqlite(self.source, self.backups)
+        
+        db = sqlite3.connect(self.source)
+        db.execute("UPDATE entries SET note = 'changed' WHERE id = 1")
+        db.commit()
+        db.close()
+        
+        incremental = backup_sqlite(self.source, self.backups, incremental=True)
+        manifest = incremental.manifest
+        
+        self.assertEqual(manifest['kind'], 'incremental')
+        self.assertEqual(manifest['base'], os.path.basename(full.manifest_path))
+        self.assertLess(manifest['changed_blocks'], len(manifest['blocks']))
+        
+        target = str(self.directory / 'restored.sqlite3')
+        restore_sqlite(incremental.manifest_path, target)
+        self.assertEqual(self.rows(target), self.rows(self.source))
+        self.assertEqual(self.rows(target)[0][1], 'changed')
+        
+        restore_sqlite(full.manifest_path, target)
+        self.assertEqual(self.rows(target)[0][1], 'entry 0 ' * 50)
+
+    def test_incremental_backup_needs_an_earlier_backup(self):
+        with self.assertRaises(BackupError):
+            backup_sqlite(self.source, self.backups, incremental=True)
+
+    def test_corrupt_backup_is_not_restored(self):
+        backup = backup_sqlite(self.source, self.backups)
+        artifact = self.backups / backup.manifest['artifact']
+        data = bytearray(artifact.read_bytes())
+        data[len(data) // 2] ^= 0xFF
+        artifact.write_bytes(bytes(data))
+        
+        target = self.directory / 'existing.sqlite3'
+        target.write_bytes(b'keep me')
+        
+        with self.assertRaises(BackupError):
+            restore_sqlite(backup.manifest_path, str(target))
+        self.assertEqual(target.read_bytes(), b'keep me')
+        self.assertEqual([p.name for p in self.directory.glob('*.restoring')], [])
+
+    def test_stepped_snapshot_finishes_under_concurrent_writes(self):
+        stop = threading.Event()
+        
+        def write():
+            db = sqlite3.connect(self.source, isolation_level=None)
+            while not stop.is_set():
+                db.execute("INSERT INTO entries (note) VALUES ('concurrent')")
+            db.close()
+        
+        writer = threading.Thread(target=write)
+        writer.start()
+        try:
+            target = str(self.directory / 'snapshot.sqlite3')
+            steps, restarts = sqlite_snapshot(self.source, target, pages=1, max_restarts=2)
+        finally:
+            stop.set()
+            writer.join()
+        
+        self.assertLessEqual(restarts, 2)
+        db = sqlite3.connect(target)
+        self.assertEqual(db.execute('PRAGMA quick_check').fetchone()[0], 'ok')
+        self.assertEqual(db.execute('PRAGMA journal_mode').fetchone()[0], 'delete')
+        db.close()
+
+    def test_backup_and_restore_commands(self):
+        connection = connections['default']
+        # Closing the test database's connection would drop the in-memory database
+        with mock.patch.dict(connection.settings_dict, {'NAME': self.source}), \
+                mock.patch.object(connection, 'close') as close:
+            out = StringIO()
+            call_command('backup_db', output_dir=str(self.backups), stdout=out)
+            self.assertIn('Database backup completed', out.getvalue())
+            manifest_path = str(next(self.backups.glob('*.json')))
+            
+            db = sqlite3.connect(self.source)
+            db.execute('DELETE FROM entries')
+            db.commit()
+            db.close()
+            
+            out = StringIO()
+            call_command('restore_db', manifest_path, interactive=False, stdout=out)
+        
+        close.assert_called_once()
+        self.assertIn('Restored', out.getvalue())
+        self.assertEqual(len(self.rows(self.source)), 5000)
+
+
+
+class TransactionListingTests(TestCase):
+    """Tests that transaction listings load their categories without extra queries"""
+    
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='listinguser', password='testpassword123')
+        categories = [
+            Category.objects.create(name=f'Category {i}', icon='tag', color=f'#00000{i % 10}', is_expense=True)
+            for i in range(20)
+        ]
+        now = timezone.now()
+        Transaction.objects.bulk_create([
+            Transaction(
+                user=cls.user,
+                # Every 10th row has no category
+                category=None if i % 10 == 0 else categories[i % 20],
+                amount=Decimal('10.00'),
+                description=f'Listing {i}',
+                date=now - datetime.timedelta(hours=i),
+                is_expense=True
+            )
+            for i in range(1000)
+        ])
+    
+    def test_for_listing_reads_categories_in_the_same_query(self):
+        with self.assertNumQueries(1):
+            rows = list(Transaction.objects.filter(user=self.user).for_listing())
+            labels = [
+                (row.category.name, row.category.icon, row.category.color) if row.category else None
+                for row in rows
+            ]
+        
+        self.assertEqual(len(rows), 1000)
+        self.assertEqual(labels.count(None), 100)
+        self.assertIn('description', rows[0].__dict__)
+        self.assertNotIn('user_id', rows[0].__dict__)
+    
+    def test_every_page_of_the_list_runs_the_same_queries(self):
+        self.client.login(username='listinguser', password='testpassword123')
+        url = reverse('transactions')
+        counts = []
+        pages = 0
+        
+        while url:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            counts.append(len(queries))
+            pages += 1
+            page = response.context['page']
+            url = f"{reverse('transactions')}?cursor={page.next_cursor}" if page.has_next else None
+        
+        self.assertEqual(pages, 1000 // TRANSACTIONS_PER_PAGE)
+        # Only the first page loads the category catalogue for the filter
+        self.assertLessEqual(counts[0], 4)
+        self.assertEqual(set(counts[1:]), {3})
+    
+    def test_dashboard_recent_transactions_run_no_extra_queries(self):
+        self.client.login(username='listinguser', password='testpassword123')
+        cache.clear()
+        
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('dashboard'))
+        
+        self.assertContains(response, 'Listing 1')
+        # A lazy category load looks up one category by its id
+        lookups = [q for q in queries if 'FROM "core_category" WHERE "core_category"."id" =' in q['sql']]
+        self.assertEqual(lookups, [])
+
+
+class CategoryCatalogueTests(TestCase):
+    """Tests for the process-wide category catalogue and the forms that use it"""
+    
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='catalogueuser', password='testpassword123')
+        cls.food = Category.objects.create(name='Food', icon='utensils', color='#ff0000', is_expense=True)
+        cls.salary = Category.objects.create(name='Salary', icon='money', color='#00ff00', is_expense=False)
+    
+    def setUp(self):
+        cache.clear()
+    
+    def category_queries(self, queries):
+        return [q for q in queries if 'FROM "core_category"' in q['sql']]
+    
+    def test_catalogue_is_loaded_once(self):
+        with CaptureQueriesContext(connection) as queries:
+            catalogue = get_catalogue()
+        self.assertEqual(len(self.category_queries(queries)), 1)
+        self.assertEqual(catalogue.id_for('  FOOD '), self.food.pk)
+        self.assertEqual([entry.id for entry in catalogue.filter(is_expense=False)], [self.salary.pk])
+        
+        with self.assertNumQueries(0):
+            self.assertIs(get_catalogue(), catalogue)
+    
+    def test_saving_or_deleting_a_category_reloads_the_catalogue(self):
+        get_catalogue()
+        self.food.name = 'Groceries'
+        self.food.save()
+        self.assertEqual(get_catalogue().get(self.food.pk).name, 'Groceries')
+        
+        self.salary.delete()
+        self.assertIsNone(get_catalogue().get(self.salary.pk))
+    
+    def test_another_process_reads_the_catalogue_from_the_cache(self):
+        get_catalogue()
+        with mock.patch('core.catalogue._loaded', None):
+            with self.assertNumQueries(0):
+                self.assertEqual(get_catalogue().id_for('salary'), self.salary.pk)
+    
+    def test_transaction_form_reads_categories_from_the_catalogue(self):
+        get_catalogue()
+        with self.assertNumQueries(0):
+            html = TransactionForm(user=self.user).as_p()
+        
+        form = TransactionForm(user=self.user, data={
+            'amount': '12.50',
+            'description': 'Lunch',
+            'category': self.food.pk,
+            'date': '2024-05-01T12:00',
+            'is_expense': True
+        })
+        with CaptureQueriesContext(connection) as queries:
+            self.assertTrue(form.is_valid(), form.errors)
+        
+        # Model validation still checks that the row exists, without loading it
+        self.assertEqual(len(queries), 1)
+        self.assertIn('SELECT 1 AS "a" FROM "core_category"', queries[0]['sql'])
+        self.assertIn(f'<option value="{self.salary.pk}">Salary</option>', html)
+        self.assertEqual(form.cleaned_data['category'], self.food)
+        self.assertEqual(form.cleaned_data['category'].color, '#ff0000')
+        
+        transaction = form.save(commit=False)
+        transaction.user = self.user
+        transaction.save()
+        self.assertEqual(Transaction.objects.get(pk=transaction.pk).category, self.food)
+    
+    def test_unknown_category_is_rejected(self):
+        form = TransactionForm(user=self.user, data={
+            'amount': '12.50',
+            'description': 'Lunch',
+            'category': self.food.pk + self.salary.pk,
+            'date': '2024-05-01T12:00',
+            'is_expense': True
+        })
+        self.assertFalse(form.is_valid())
+        self.assertIn('category', form.errors)
+    
+    def test_budget_form_only_offers_expense_categories(self):
+        form = BudgetForm(user=self.user)
+        html = form.as_p()
+        self.assertIn('Food', html)
+        self.assertNotIn('Salary', html)
+        
+        form = BudgetForm(user=self.user, data={
+            'category': self.salary.pk,
+            'amount': '100.00',
+            'month': 5,
+            'year': 2024
+        })
+        self.assertFalse(form.is_valid())
+        self.assertIn('category', form.errors)
+    
+    def test_editing_a_transaction_keeps_its_category_selected(self):
+        transaction = Transaction.objects.create(
+            user=self.user,
+            category=self.food,
+            amount=Decimal('5.00'),
+            description='Snack',
+            date=timezone.now(),
+            is_expense=True
+        )
+        html = TransactionForm(user=self.user, instance=transaction).as_p()
+        self.assertIn(f'<option value="{self.food.pk}" selected>Food</option>', html)
+
+
+class TransactionMonthBucketTests(TestCase):
+    """Tests for the year_month bucket and per-user timezones"""
+    
+    # 20:00 UTC on 31 January is already February in Karachi (UTC+5)
+    EDGE = datetime.datetime(2024, 1, 31, 20, 0, tzinfo=datetime.timezone.utc)
+    
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='bucketuser', password='testpassword123')
+        self.user.profile.timezone = 'Asia/Karachi'
+        self.user.profile.save()
+        self.food = Category.objects.create(name='Food', icon='food', is_expense=True)
+    
+    def add(self, amount, date, user=None):
+        return Transaction.objects.create(
+            user=user or self.user,
+            category=self.food,
+            amount=Decimal(amount),
+            description='Bucketed',
+            date=date,
+            is_expense=True
+        )
+    
+    def test_save_buckets_in_the_users_timezone(self):
+        other = User.objects.create_user(username='utcuser', password='testpassword123')
+        
+        self.assertEqual(self.add('10.00', self.EDGE).year_month, 202402)
+        self.assertEqual(self.add('10.00', self.EDGE, user=other).year_month, 202401)
+    
+    def test_editing_the_date_moves_the_bucket_and_summary(self):
+        transaction = self.add('10.00', self.EDGE)
+        transaction.date = self.EDGE - datetime.timedelta(days=1)
+        transaction.save()
+        
+        self.assertEqual(Transaction.objects.get(pk=transaction.pk).year_month, 202401)
+        self.assertEqual(MonthlySummary.objects.drift([self.user]), [])
+    
+    def test_bulk_create_fills_in_the_bucket(self):
+        Transaction.objects.bulk_create([
+            Transaction(user=self.user, amount=Decimal('1.00'), description='Bulk', date=self.EDGE),
+            Transaction(user=self.user, amount=Decimal('1.00'), description='Bulk', date=self.EDGE, year_month=203001),
+        ])
+        
+        self.assertEqual(
+            sorted(Transaction.objects.filter(user=self.user).values_list('year_month', flat=True)),
+            [202402, 203001]
+        )
+    
+    def test_monthly_queries_are_equality_lookups_on_the_bucket(self):
+        self.add('40.00', self.EDGE)
+        self.add('5.00', self.EDGE - datetime.timedelta(days=1))
+        budget = Budget.objects.create(user=self.user, category=self.food, amount=Decimal('100.00'), month=2, year=2024)
+        
+        with CaptureQueriesContext(connection) as queries:
+            spent = budget.get_spent_amount()
+        self.assertEqual(spent, Decimal('40.00'))
+        self.assertIn('"core_transaction"."year_month" = 202402', queries[0]['sql'])
+        self.assertNotIn('"core_transaction"."date"', queries[0]['sql'])
+        
+        self.assertEqual(Budget.objects.with_progress(2024, 2).get().spent, Decimal('40.00'))
+        self.assertEqual(Budget.objects.with_progress().get().spent, Decimal('40.00'))
+        self.assertEqual(self.user.profile.calculate_savings(2024, 2), Decimal('-40.00'))
+        self.assertEqual(self.user.profile.calculate_savings(2024, 1), Decimal('-5.00'))
+    
+    def test_monthly_lookup_uses_the_index(self):
+        plan = ' '.join(
+            str(row[-1])
+            for row in connection.cursor().execute(
+                'EXPLAIN QUERY PLAN ' + str(Transaction.objects.filter(user=self.user).in_month(2024, 2).order_by().query)
+            )
+        )
+        self.assertIn('core_txn_user_month_idx', plan)
+    
+    def test_changing_timezone_rebuckets_transactions_and_summaries(self):
+        transaction = self.add('10.00', self.EDGE)
+        
+        profile = UserProfile.objects.get(user=self.user)
+        profile.timezone = 'UTC'
+        profile.save()
+        
+        self.assertEqual(Transaction.objects.get(pk=transaction.pk).year_month, 202401)
+        self.assertEqual(MonthlySummary.objects.drift([self.user]), [])
+        self.assertEqual(MonthlySummary.objects.get(user=self.user).month, 1)
+        # New transactions use the new timezone straight away
+        self.assertEqual(self.add('1.00', self.EDGE).year_month, 202401)
+    
+    def test_export_writes_dates_in_the_users_timezone(self):
+        self.add('10.00', self.EDGE)
+        self.client.login(username='bucketuser', password='testpassword123')
+        
+        response = self.client.get(reverse('export_transactions', args=['csv']))
+        content = b''.join(response.streaming_content).decode()
+        
+        self.assertIn('2024-02-01T01:00:00+05:00', content)
+    
+    def test_changing_timezone_refreshes_the_cached_dashboard(self):
+        profile = UserProfile.objects.get(user=self.user)
+        profile.timezone = 'UTC'
+        profile.save()
+        # 01:00 UTC on 1 October is still 30 September in New York
+        Transaction.objects.create(
+            user=self.user,
+            amount=Decimal('100.00'),
+            description='Stipend',
+            date=datetime.datetime(2026, 10, 1, 1, 0, tzinfo=datetime.timezone.utc),
+            is_expense=False
+        )
+        self.client.login(username='bucketuser', password='testpassword123')
+        
+        with mock.patch('django.utils.timezone.now', return_value=datetime.datetime(2026, 10, 1, 12, 0, tzinfo=datetime.timezone.utc)):
+            response = self.client.get(reverse('dashboard'))
+            self.assertEqual(response.context['income'], Decimal('100.00'))
+            
+            self.client.post(reverse('profile'), {
+                'monthly_income': '1000.00',
+                'emergency_fund_goal': '5000.00',
+                'preferred_currency': 'Rs.',
+                'timezone': 'America/New_York'
+            })
+            response = self.client.get(reverse('dashboard'))
+        
+        self.assertEqual(response.context['income'], Decimal('0'))
+    
+    def test_imported_dates_are_read_in_the_users_timezone(self):
+        data = b'date,description,amount,category,type\n2024-02-01 00:30,Late,12.00,Food,expense\n2024-01-31,Early,3.00,Food,expense\n'
+        import_transactions(self.user, BytesIO(data))
+        
+        late = Transaction.objects.get(user=self.user, description='Late')
+        self.assertEqual(late.date, datetime.datetime(2024, 1, 31, 19, 30, tzinfo=datetime.timezone.utc))
+        self.assertEqual(late.year_month, 202402)
+        self.assertEqual(Transaction.objects.get(user=self.user, description='Early').year_month, 202401)
+        self.assertEqual(MonthlySummary.objects.drift([self.user]), [])
+    
+    def test_invalid_timezone_is_rejected(self):
+        form = UserProfileForm(instance=self.user.profile, data={
+            'monthly_income': '1000.00',
+            'emergency_fund_goal': '5000.00',
+            'preferred_currency': 'Rs.',
+            'timezone': 'Mars/Olympus_Mons'
+        })
+        self.assertFalse(form.is_valid())
+        self.assertIn('timezone', form.errors)
+    
+    def test_middleware_activates_the_session_timezone(self):
+        middleware = UserTimezoneMiddleware(lambda request: timezone.get_current_timezone_name())
+        request = RequestFactory().get('/')
+        
+        request.session = {TIMEZONE_SESSION_KEY: 'Asia/Karachi'}
+        self.assertEqual(middleware(request), 'Asia/Karachi')
+        request.session = {}
+        request.user = AnonymousUser()
+        self.assertEqual(middleware(request), settings.TIME_ZONE)
+    
+    def test_middleware_falls_back_to_the_profile_timezone(self):
+        # Sessions started before the timezone was stored in them
+        middleware = UserTimezoneMiddleware(lambda request: timezone.get_current_timezone_name())
+        request = RequestFactory().get('/')
+        request.session = {}
+        request.user = self.user
+        
+        self.assertEqual(middleware(request), 'Asia/Karachi')
+        
+        async def get_response(request):
+            return timezone.get_current_timezone_name()
+        
+        async def auser():
+            return self.user
+        
+        request.auser = auser
+        request.session = SessionStore()
+        middleware = UserTimezoneMiddleware(get_response)
+        self.assertEqual(async_to_sync(middleware)(request), 'Asia/Karachi')
+    
+    def test_login_and_profile_changes_set_the_session_timezone(self):
+        self.client.login(username='bucketuser', password='testpassword123')
+        self.assertEqual(self.client.session[TIMEZONE_SESSION_KEY], 'Asia/Karachi')
+        
+        self.client.post(reverse('profile'), {
+            'monthly_income': '1000.00',
+            'emergency_fund_goal': '5000.00',
+            'preferred_currency': 'Rs.',
+            'timezone': 'Europe/London'
+        })
+        self.assertEqual(self.client.session[TIMEZONE_SESSION_KEY], 'Europe/London')
+        self.assertEqual(UserProfile.objects.get(user=self.user).timezone, 'Europe/London')
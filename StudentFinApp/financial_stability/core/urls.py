@@ -10,11 +10,14 @@ urlpatterns = [
     # Dashboard and Profile
     path('', views.dashboard_view, name='dashboard'),
     path('dashboard/', views.dashboard_view, name='dashboard'),
+    path('dashboard/async/', views.dashboard_async_view, name='dashboard_async'),
     path('profile/', views.profile_view, name='profile'),
     
     # Transactions
     path('transactions/', views.transaction_list_view, name='transactions'),
     path('transactions/add/', views.transaction_create_view, name='add_transaction'),
+    path('transactions/import/', views.transaction_import_view, name='import_transactions'),
+    path('transactions/export/<str:format>/', views.transaction_export_view, name='export_transactions'),
     path('transactions/<int:pk>/edit/', views.transaction_edit_view, name='edit_transaction'),
     path('transactions/<int:pk>/delete/', views.transaction_delete_view, name='delete_transaction'),
     
@@ -39,7 +42,11 @@ urlpatterns = [
     
     # Reports
     path('reports/income-expense/', views.income_expense_report_view, name='income_expense_report'),
+    path('reports/income-expense/async/', views.income_expense_report_async_view, name='income_expense_report_async'),
+    path('reports/income-expense/export/<str:format>/', views.income_expense_report_export_view, name='export_income_expense_report'),
     
     # Debug
     path('debug/urls/', views.debug_urls, name='debug_urls'),
+    path('debug/cache/', views.dashboard_cache_stats_view, name='dashboard_cache_stats'),
+    path('debug/queries/', views.query_metrics_view, name='query_metrics'),
 ] 
\ No newline at end of file
@@ -1,11 +1,15 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import login, logout, authenticate
 from django.contrib.auth.decorators import login_required
+from django.conf import settings
 from django.contrib import messages
+from django.core.exceptions import BadRequest, PermissionDenied
+from django.http import Http404, JsonResponse
+from django.db.models import Count, Q
+from django.db.transaction import atomic
 from django.utils import timezone
-from django.db.models import Sum
+from asgiref.sync import sync_to_async
 from datetime import datetime, timedelta
-from calendar import monthrange
 import json
 
 from .forms import (
@@ -16,7 +20,8 @@ from .forms import (
     BudgetForm, 
     SavingsGoalForm,
     UpdateSavingsForm,
-    CategoryForm
+    CategoryForm,
+    TransactionImportForm
 )
 from .models import (
     Category,
@@ -24,8 +29,29 @@ from .models import (
     Transaction,
     Budget,
     SavingsGoal,
-    Achievement
+    Achievement,
+    SAVINGS_GOAL_STATUSES,
+    period_totals
 )
+from .async_queries import gather_queries
+from .caching import aget_dashboard_context, dashboard_cache_stats, get_dashboard_context
+from .catalogue import get_catalogue
+from .exports import (
+    EXPORT_FORMATS,
+    REPORT_EXPORT_HEADER,
+    TRANSACTION_EXPORT_HEADER,
+    report_rows,
+    streaming_export,
+    transaction_rows
+)
+from .importers import detect_format, import_transactions
+from .middleware import TIMEZONE_SESSION_KEY, registry as metrics_registry
+from .pagination import keyset_paginate
+from .reports import MAX_REPORT_MONTHS, category_breakdown, month_window, monthly_rollup
+from .routers import reads_from_replica
+from .services import contribute_to_goal
+
+TRANSACTIONS_PER_PAGE = 50
 
 # Authentication views
 def register_view(request):
@@ -69,33 +95,66 @@ def logout_view(request):
     return redirect('login')
 
 # Dashboard and Home views
+# The dashboard is cached under the user's current data version, so it is
+# built from the primary: a lagging replica would be cached as up to date
 @login_required
 def dashboard_view(request):
     user = request.user
     
-    # Get all transactions for the current month
-    now = timezone.now()
-    current_month_start = timezone.make_aware(datetime(now.year, now.month, 1))
-    _, last_day = monthrange(now.year, now.month)
-    current_month_end = timezone.make_aware(datetime(now.year, now.month, last_day, 23, 59, 59))
-    
-    # Get recent transactions (last 5)
-    recent_transactions = Transaction.objects.filter(
-        user=user
-    ).order_by('-date')[:5]
-    
-    # Monthly summary
-    income = Transaction.objects.filter(
-        user=user,
-        is_expense=False,
-        date__range=(current_month_start, current_month_end)
-    ).aggregate(Sum('amount'))['amount__sum'] or 0
-    
-    expenses = Transaction.objects.filter(
-        user=user,
-        is_expense=True,
-        date__range=(current_month_start, current_month_end)
-    ).aggregate(Sum('amount'))['amount__sum'] or 0
+    # Month boundaries follow the active timezone
+    now = timezone.localtime()
+    
+    # Served from the per-user cache until the user's data changes
+    context = get_dashboard_context(user, now, lambda: build_dashboard_context(user, now))
+    
+    return render(request, 'core/dashboard.html', context)
+
+@login_required
+async def dashboard_async_view(request):
+    """Dashboard for ASGI servers; the queries run concurrently on a cache miss"""
+    user = await request.auser()
+    now = timezone.localtime()
+    
+    context = await aget_dashboard_context(user, now, lambda: abuild_dashboard_context(user, now))
+    
+    # Context processors read the lazy request.user, which must not load in the event loop
+    return await sync_to_async(render)(request, 'core/dashboard.html', context)
+
+def dashboard_queries(user, now):
+    """The independent queries behind the dashboard; every queryset is evaluated so it can be cached"""
+    return {
+        # Get recent transactions (last 5)
+        'recent_transactions': lambda: list(Transaction.objects.filter(
+            user=user
+        ).for_listing().order_by('-date')[:5]),
+        
+        # Monthly summary in one query, read from the precomputed monthly totals
+        'totals': lambda: period_totals(user, *month_window(1, now)),
+        
+        # Get budgets for the current month with spending annotated in one query
+        'budgets': lambda: list(Budget.objects.filter(
+            user=user
+        ).with_progress(now.year, now.month).select_related('category')),
+        
+        # Get savings goals with their progress annotated
+        'savings_goals': lambda: list(SavingsGoal.objects.filter(user=user).with_progress()),
+        
+        # Get achievements
+        'achievements': lambda: list(Achievement.objects.filter(user=user).order_by('-date_earned')[:5]),
+    }
+
+def build_dashboard_context(user, now):
+    """Compute the dashboard data for a user, one query after another"""
+    results = {name: query() for name, query in dashboard_queries(user, now).items()}
+    return assemble_dashboard_context(**results)
+
+async def abuild_dashboard_context(user, now):
+    """Compute the dashboard data for a user with the queries running concurrently"""
+    results = await gather_queries(dashboard_queries(user, now))
+    return assemble_dashboard_context(**results)
+
+def assemble_dashboard_context(recent_transactions, totals, budgets, savings_goals, achievements):
+    income, expenses = totals.income, totals.expenses
     
     # Calculate savings rate
     if income > 0:
@@ -103,50 +162,57 @@ def dashboard_view(request):
     else:
         savings_rate = 0
     
-    # Get budgets for the current month
-    current_budgets = Budget.objects.filter(
-        user=user,
-        month=now.month,
-        year=now.year
-    ).select_related('category')
-    
     # Prepare budget data for charts
     budget_data = []
-    for budget in current_budgets:
-        spent = budget.get_spent_amount()
+    for budget in budgets:
         budget_data.append({
             'category': budget.category.name,
             'budget': float(budget.amount),
-            'spent': float(spent),
-            'remaining': float(budget.amount - spent),
-            'percentage': budget.get_percentage()
+            'spent': float(budget.spent),
+            'remaining': float(budget.remaining),
+            'percentage': budget.percentage
         })
     
-    # Get savings goals
-    savings_goals = SavingsGoal.objects.filter(user=user)
-    
-    # Get achievements
-    achievements = Achievement.objects.filter(user=user).order_by('-date_earned')[:5]
-    
-    context = {
+    return {
         'recent_transactions': recent_transactions,
         'income': income,
         'expenses': expenses,
         'savings_rate': savings_rate,
         'budget_data': json.dumps(budget_data),
-        'budgets': current_budgets,
+        'budgets': budgets,
         'savings_goals': savings_goals,
         'achievements': achievements,
     }
+
+@login_required
+def query_metrics_view(request):
+    """Per-view query counts and timings for staff; POST clears them"""
+    if not request.user.is_staff:
+        raise PermissionDenied
     
-    return render(request, 'core/dashboard.html', context)
+    if request.method == 'POST':
+        metrics_registry.reset()
+    
+    return JsonResponse({
+        'sample_rate': settings.QUERY_METRICS_SAMPLE_RATE,
+        'views': metrics_registry.report(),
+    })
+
+@login_required
+def dashboard_cache_stats_view(request):
+    """Dashboard cache hit/miss counters for staff"""
+    if not request.user.is_staff:
+        raise PermissionDenied
+    return JsonResponse(dashboard_cache_stats())
 
 @login_required
 def profile_view(request):
     if request.method == 'POST':
         form = UserProfileForm(request.POST, instance=request.user.profile)
         if form.is_valid():
-            form.save()
+            profile = form.save()
+            # Later requests use the new timezone straight away
+            request.session[TIMEZONE_SESSION_KEY] = profile.timezone
             messages.success(request, "Profile updated successfully!")
             return redirect('profile')
     else:
@@ -155,16 +221,16 @@ def profile_view(request):
     return render(request, 'core/profile.html', {'form': form})
 
 # Transaction views
-@login_required
-def transaction_list_view(request):
+def filter_transactions(user, params):
+    """Apply the transaction list filters in params to the user's transactions"""
     # Get filter parameters
-    category_id = request.GET.get('category')
-    transaction_type = request.GET.get('type')
-    date_from = request.GET.get('date_from')
-    date_to = request.GET.get('date_to')
+    category_id = params.get('category')
+    transaction_type = params.get('type')
+    date_from = params.get('date_from')
+    date_to = params.get('date_to')
     
-    # Base queryset - important: order by newest first
-    transactions = Transaction.objects.filter(user=request.user).order_by('-date')
+    # Base queryset
+    transactions = Transaction.objects.filter(user=user)
     
     # Apply filters
     if category_id:
@@ -189,18 +255,37 @@ def transaction_list_view(request):
         except ValueError:
             pass
     
-    # Get categories for filter dropdown
-    categories = Category.objects.all()
-    
-    context = {
-        'transactions': transactions,
-        'categories': categories,
+    filters = {
         'selected_category': category_id,
         'selected_type': transaction_type,
         'date_from': date_from,
         'date_to': date_to,
     }
     
+    return transactions, filters
+
+@login_required
+def transaction_list_view(request):
+    transactions, filters = filter_transactions(request.user, request.GET)
+    
+    # Only fetch one page, seeking on (date, id) instead of using OFFSET
+    page = keyset_paginate(transactions.for_listing(), request.GET.get('cursor'), TRANSACTIONS_PER_PAGE)
+    
+    # Keep the filters on the pagination links
+    filter_params = request.GET.copy()
+    filter_params.pop('cursor', None)
+    
+    # Categories for the filter dropdown come from the shared catalogue
+    categories = get_catalogue()
+    
+    context = {
+        'transactions': page.object_list,
+        'page': page,
+        'filter_query': filter_params.urlencode(),
+        'categories': categories,
+        **filters,
+    }
+    
     return render(request, 'core/transactions.html', context)
 
 @login_required
@@ -213,7 +298,9 @@ def transaction_create_view(request):
         if form.is_valid():
             transaction = form.save(commit=False)
             transaction.user = request.user
-            transaction.save()
+            # The insert and its monthly summary update commit together
+            with atomic():
+                transaction.save()
             print(f"Transaction saved with ID: {transaction.id}")
             messages.success(request, "Transaction added successfully!")
             return redirect('transactions')
@@ -225,6 +312,45 @@ def transaction_create_view(request):
     
     return render(request, 'core/transaction_form.html', {'form': form, 'action': 'Add'})
 
+@login_required
+def transaction_export_view(request, format):
+    if format not in EXPORT_FORMATS:
+        raise Http404("Unknown export format")
+    
+    # Same filters as the transaction list, streamed without building models
+    transactions, _ = filter_transactions(request.user, request.GET)
+    filename = f"transactions-{timezone.localdate():%Y%m%d}"
+    
+    # The rows are written after the middleware has reset the timezone
+    rows = transaction_rows(transactions, timezone.get_current_timezone())
+    return streaming_export(TRANSACTION_EXPORT_HEADER, rows, format, filename)
+
+@login_required
+def transaction_import_view(request):
+    result = None
+    
+    if request.method == 'POST':
+        form = TransactionImportForm(request.POST, request.FILES)
+        if form.is_valid():
+            upload = form.cleaned_data['file']
+            format = form.cleaned_data['format']
+            if format == 'auto':
+                format = detect_format(upload.name)
+            
+            # Rows are streamed from the upload and written in batches
+            result = import_transactions(request.user, upload.file, format)
+            
+            if result.created:
+                messages.success(request, f"Imported {result.created} of {result.rows} transactions.")
+            if result.error_count:
+                messages.warning(request, f"{result.error_count} rows were skipped because of errors.")
+            elif not result.created:
+                messages.warning(request, "No transactions were found in the file.")
+    else:
+        form = TransactionImportForm()
+    
+    return render(request, 'core/transaction_import.html', {'form': form, 'result': result})
+
 @login_required
 def transaction_edit_view(request, pk):
     transaction = get_object_or_404(Transaction, pk=pk, user=request.user)
@@ -232,7 +358,8 @@ def transaction_edit_view(request, pk):
     if request.method == 'POST':
         form = TransactionForm(request.POST, instance=transaction, user=request.user)
         if form.is_valid():
-            form.save()
+            with atomic():
+                form.save()
             messages.success(request, "Transaction updated successfully!")
             return redirect('transactions')
     else:
@@ -259,10 +386,8 @@ def budget_list_view(request):
     year = int(request.GET.get('year', now.year))
     
     budgets = Budget.objects.filter(
-        user=request.user,
-        month=month,
-        year=year
-    ).select_related('category')
+        user=request.user
+    ).with_progress(year, month).select_related('category')
     
     context = {
         'budgets': budgets,
@@ -337,7 +462,7 @@ def budget_edit_view(request, pk):
 
 @login_required
 def budget_delete_view(request, pk):
-    budget = get_object_or_404(Budget, pk=pk, user=request.user)
+    budget = get_object_or_404(Budget.objects.with_progress(), pk=pk, user=request.user)
     
     if request.method == 'POST':
         budget.delete()
@@ -349,13 +474,23 @@ def budget_delete_view(request, pk):
 # Savings Goal views
 @login_required
 def savings_goal_list_view(request):
-    savings_goals = SavingsGoal.objects.filter(user=request.user)
+    # Progress and status are computed in the query, so filtering by status
+    # only loads the matching goals
+    savings_goals = SavingsGoal.objects.filter(user=request.user).with_progress()
+    
+    status = request.GET.get('status')
+    if status in SAVINGS_GOAL_STATUSES:
+        savings_goals = savings_goals.filter(status=status)
+    else:
+        status = None
     
-    for goal in savings_goals:
-        goal.percentage = goal.get_percentage()
-        goal.status = goal.get_status()
+    context = {
+        'savings_goals': savings_goals,
+        'statuses': SAVINGS_GOAL_STATUSES,
+        'selected_status': status,
+    }
     
-    return render(request, 'core/savings.html', {'savings_goals': savings_goals})
+    return render(request, 'core/savings.html', context)
 
 @login_required
 def savings_goal_create_view(request):
@@ -416,43 +551,13 @@ def update_savings_view(request, pk):
         if form.is_valid():
             amount = form.cleaned_data['amount']
             
-            # Update the savings goal
-            savings_goal.current_amount += amount
-            savings_goal.save()
-            
-            # Create a transaction record for this savings contribution
-            category, created = Category.objects.get_or_create(
-                name="Savings",
-                defaults={
-                    'is_expense': True,
-                    'icon': 'piggy-bank',
-                    'color': '#4CAF50'
-                }
-            )
-            
-            Transaction.objects.create(
-                user=request.user,
-                category=category,
-                amount=amount,
-                description=f"Contribution to {savings_goal.name}",
-                date=timezone.now(),
-                is_expense=True
-            )
+            # Increment the goal, record the transaction and check for the achievement atomically
+            contribution = contribute_to_goal(savings_goal, amount)
             
             messages.success(request, f"Added Rs. {amount} to {savings_goal.name}!")
             
-            # Check if the goal is completed
-            if savings_goal.current_amount >= savings_goal.target_amount:
+            if contribution.achievement:
                 messages.success(request, f"Congratulations! You've reached your savings goal for {savings_goal.name}!")
-                
-                # Create an achievement
-                Achievement.objects.create(
-                    user=request.user,
-                    name=f"Savings Goal Achieved: {savings_goal.name}",
-                    description=f"Successfully saved Rs. {savings_goal.target_amount} for {savings_goal.name}",
-                    icon="trophy",
-                    date_earned=timezone.now()
-                )
             
             return redirect('savings')
         else:
@@ -465,17 +570,26 @@ def update_savings_view(request, pk):
 # Category management
 @login_required
 def category_list_view(request):
-    categories = Category.objects.all()
-    return render(request, 'core/category_list.html', {'categories': categories})
+    # Count only this user's transactions, in the same query as the categories
+    categories = list(Category.objects.annotate(
+        transaction_count=Count('transactions', filter=Q(transactions__user=request.user))
+    ))
+    expense_count = sum(1 for category in categories if category.is_expense)
+    
+    context = {
+        'categories': categories,
+        'expense_count': expense_count,
+        'income_count': len(categories) - expense_count,
+    }
+    
+    return render(request, 'core/category_list.html', context)
 
 @login_required
 def category_create_view(request):
     if request.method == 'POST':
         form = CategoryForm(request.POST)
         if form.is_valid():
-            category = form.save(commit=False)
-            category.user = request.user
-            category.save()
+            form.save()
             messages.success(request, "Category created successfully!")
             return redirect('categories')
     else:
@@ -485,7 +599,11 @@ def category_create_view(request):
 
 @login_required
 def category_edit_view(request, pk):
-    category = get_object_or_404(Category, pk=pk, user=request.user)
+    # Categories are shared by every user
+    if not request.user.is_staff:
+        raise PermissionDenied
+    
+    category = get_object_or_404(Category, pk=pk)
     
     if request.method == 'POST':
         form = CategoryForm(request.POST, instance=category)
@@ -500,7 +618,11 @@ def category_edit_view(request, pk):
 
 @login_required
 def category_delete_view(request, pk):
-    category = get_object_or_404(Category, pk=pk, user=request.user)
+    # Deleting a category also deletes every user's budgets for it
+    if not request.user.is_staff:
+        raise PermissionDenied
+    
+    category = get_object_or_404(Category, pk=pk)
     
     if request.method == 'POST':
         category.delete()
@@ -511,131 +633,124 @@ def category_delete_view(request, pk):
 
 # Reports and Analytics
 @login_required
+@reads_from_replica
 def income_expense_report_view(request):
     user = request.user
+    params = report_params(request.GET)
     
-    # Get date range
-    now = timezone.now()
-    months_back = int(request.GET.get('months', 6))
-    start_date = timezone.make_aware(datetime(now.year, now.month, 1) - timedelta(days=30*months_back))
+    results = {name: query() for name, query in report_queries(user, params).items()}
     
-    # Get all transactions in date range
-    transactions = Transaction.objects.filter(
-        user=user,
-        date__gte=start_date
-    )
+    return render(request, 'core/income_expense_report.html', assemble_report_context(params, **results))
+
+@login_required
+@reads_from_replica
+async def income_expense_report_async_view(request):
+    """Income and expense report for ASGI servers; the queries run concurrently"""
+    user = await request.auser()
+    params = report_params(request.GET)
     
-    # Prepare monthly data
-    monthly_data = {}
-    current = start_date
+    results = await gather_queries(report_queries(user, params))
     
-    while current <= now:
-        month_key = f"{current.year}-{current.month:02d}"
-        
-        # Get month's transactions
-        month_start = timezone.make_aware(datetime(current.year, current.month, 1))
-        _, last_day = monthrange(current.year, current.month)
-        month_end = timezone.make_aware(datetime(current.year, current.month, last_day, 23, 59, 59))
-        
-        month_income = transactions.filter(
-            is_expense=False,
-            date__range=(month_start, month_end)
-        ).aggregate(Sum('amount'))['amount__sum'] or 0
-        
-        month_expenses = transactions.filter(
-            is_expense=True,
-            date__range=(month_start, month_end)
-        ).aggregate(Sum('amount'))['amount__sum'] or 0
-        
-        month_savings = month_income - month_expenses
-        
-        if month_income > 0:
-            savings_rate = (month_savings / month_income) * 100
-        else:
-            savings_rate = 0
-        
-        monthly_data[month_key] = {
-            'month_name': current.strftime('%b %Y'),
-            'income': float(month_income),
-            'expenses': float(month_expenses),
-            'savings': float(month_savings),
-            'savings_rate': round(savings_rate, 2)
-        }
-        
-        # Move to next month
-        if current.month == 12:
-            current = timezone.make_aware(datetime(current.year + 1, 1, 1))
-        else:
-            current = timezone.make_aware(datetime(current.year, current.month + 1, 1))
+    # Context processors read the lazy request.user, which must not load in the event loop
+    return await sync_to_async(render)(
+        request, 'core/income_expense_report.html', assemble_report_context(params, **results)
+    )
+
+def report_months(query):
+    """The report's month count, limited to 1 to MAX_REPORT_MONTHS"""
+    try:
+        months = int(query.get('months', 6))
+    except ValueError:
+        raise BadRequest('months must be a whole number')
+    return min(max(months, 1), MAX_REPORT_MONTHS)
+
+def report_params(query):
+    """Parse the report's month count and category breakdown range"""
+    now = timezone.now()
     
-    # Convert to list for chart.js
-    chart_data = {
-        'labels': [data['month_name'] for month, data in monthly_data.items()],
-        'income': [data['income'] for month, data in monthly_data.items()],
-        'expenses': [data['expenses'] for month, data in monthly_data.items()],
-        'savings': [data['savings'] for month, data in monthly_data.items()],
-        'savings_rate': [data['savings_rate'] for month, data in monthly_data.items()],
-    }
+    # Get date range
+    months_back = report_months(query)
+    start_date, end_date = month_window(months_back, now)
     
-    # Get category breakdown for current month
-    current_month_start = timezone.make_aware(datetime(now.year, now.month, 1))
-    _, last_day = monthrange(now.year, now.month)
-    current_month_end = timezone.make_aware(datetime(now.year, now.month, last_day, 23, 59, 59))
+    # Category breakdown, for the current month unless a range is given
+    breakdown_start, breakdown_end = month_window(1, now)
+    breakdown_from = query.get('breakdown_from')
+    breakdown_to = query.get('breakdown_to')
     
-    # Expense categories
-    expense_categories = {}
-    expense_transactions = transactions.filter(
-        is_expense=True,
-        date__range=(current_month_start, current_month_end)
-    )
+    if breakdown_from:
+        try:
+            breakdown_start = timezone.make_aware(datetime.strptime(breakdown_from, '%Y-%m-%d'))
+        except ValueError:
+            pass
     
-    for transaction in expense_transactions:
-        category_name = transaction.category.name
-        if category_name not in expense_categories:
-            expense_categories[category_name] = {
-                'amount': 0,
-                'color': transaction.category.color
-            }
-        expense_categories[category_name]['amount'] += float(transaction.amount)
-    
-    # Income categories
-    income_categories = {}
-    income_transactions = transactions.filter(
-        is_expense=False,
-        date__range=(current_month_start, current_month_end)
-    )
+    if breakdown_to:
+        try:
+            # The end date is inclusive, so stop at the start of the next day
+            breakdown_end = timezone.make_aware(datetime.strptime(breakdown_to, '%Y-%m-%d') + timedelta(days=1))
+        except ValueError:
+            pass
     
-    for transaction in income_transactions:
-        category_name = transaction.category.name
-        if category_name not in income_categories:
-            income_categories[category_name] = {
-                'amount': 0,
-                'color': transaction.category.color
-            }
-        income_categories[category_name]['amount'] += float(transaction.amount)
-    
-    # Prepare category data for charts
-    expense_chart_data = {
-        'labels': list(expense_categories.keys()),
-        'data': [category['amount'] for category in expense_categories.values()],
-        'colors': [category['color'] for category in expense_categories.values()]
+    return {
+        'months_back': months_back,
+        'start_date': start_date,
+        'end_date': end_date,
+        'breakdown_start': breakdown_start,
+        'breakdown_end': breakdown_end,
     }
-    
-    income_chart_data = {
-        'labels': list(income_categories.keys()),
-        'data': [category['amount'] for category in income_categories.values()],
-        'colors': [category['color'] for category in income_categories.values()]
+
+def report_queries(user, params):
+    """The independent queries behind the report"""
+    return {
+        # Monthly totals come from a single grouped query
+        'monthly_data': lambda: monthly_rollup(user, params['start_date'], params['end_date']),
+        'breakdown': lambda: category_breakdown(user, params['breakdown_start'], params['breakdown_end']),
+    }
+
+def assemble_report_context(params, monthly_data, breakdown):
+    # Convert to list for chart.js
+    chart_data = {
+        'labels': [data['month_name'] for data in monthly_data],
+        'income': [float(data['income']) for data in monthly_data],
+        'expenses': [float(data['expenses']) for data in monthly_data],
+        'savings': [float(data['savings']) for data in monthly_data],
+        'savings_rate': [data['savings_rate'] for data in monthly_data],
     }
     
-    context = {
+    # Averages for the summary cards
+    month_count = len(monthly_data)
+    average_income = sum(chart_data['income']) / month_count
+    average_expenses = sum(chart_data['expenses']) / month_count
+    average_savings_rate = sum(chart_data['savings_rate']) / month_count
+    
+    expense_chart_data, income_chart_data = breakdown
+    
+    return {
         'months_options': [3, 6, 12],
-        'selected_months': months_back,
+        'selected_months': params['months_back'],
         'chart_data': json.dumps(chart_data),
+        'average_income': average_income,
+        'average_expenses': average_expenses,
+        'average_savings_rate': average_savings_rate,
         'expense_chart_data': json.dumps(expense_chart_data),
-        'income_chart_data': json.dumps(income_chart_data)
+        'income_chart_data': json.dumps(income_chart_data),
+        'top_expense_category': expense_chart_data['labels'][0] if expense_chart_data['labels'] else None,
+        'breakdown_from': params['breakdown_start'],
+        'breakdown_to': params['breakdown_end'] - timedelta(days=1),
     }
+
+@login_required
+@reads_from_replica
+def income_expense_report_export_view(request, format):
+    if format not in EXPORT_FORMATS:
+        raise Http404("Unknown export format")
+    
+    months_back = report_months(request.GET)
+    start_date, end_date = month_window(months_back)
+    
+    monthly_data = monthly_rollup(request.user, start_date, end_date)
+    filename = f"income-expense-{months_back}-months"
     
-    return render(request, 'core/income_expense_report.html', context)
+    return streaming_export(REPORT_EXPORT_HEADER, report_rows(monthly_data), format, filename)
 
 # For debugging URLs
 def debug_urls(request):
@@ -0,0 +1,127 @@
+"""
+Database settings built from environment variables.
+
+DB_ENGINE selects the backend: sqlite (the default), postgresql or mysql, or
+a full Django backend path. A read replica is configured by setting
+DB_REPLICA_NAME; every other DB_REPLICA_* variable falls back to the
+matching DB_* one, so usually only the host or file name has to differ.
+"""
+
+from pathlib import Path
+
+from django.core.exceptions import ImproperlyConfigured
+
+ENGINES = {
+    'sqlite': 'django.db.backends.sqlite3',
+    'sqlite3': 'django.db.backends.sqlite3',
+    'postgres': 'django.db.backends.postgresql',
+    'postgresql': 'django.db.backends.postgresql',
+    'mysql': 'django.db.backends.mysql',
+}
+
+DEFAULT_PORTS = {
+    'django.db.backends.postgresql': '5432',
+    'django.db.backends.mysql': '3306',
+}
+
+SQLITE_TRANSACTION_MODES = ('DEFERRED', 'IMMEDIATE', 'EXCLUSIVE')
+
+
+def _flag(value):
+    return str(value).strip() == 'True'
+
+
+def sqlite_pragmas(get):
+    """PRAGMA statements run on every new SQLite connection"""
+    pragmas = []
+    if _flag(get('SQLITE_WAL', 'True')):
+        # Write-ahead logging lets readers carry on while a write is in
+        # progress, and a commit only has to wait for the log, not the
+        # database file
+        pragmas += ['PRAGMA journal_mode=WAL', 'PRAGMA synchronous=NORMAL']
+    pragmas += [
+        # Wait this many milliseconds for a lock instead of failing at once
+        f"PRAGMA busy_timeout={int(get('SQLITE_BUSY_TIMEOUT', '5000'))}",
+        # Read through a memory map of up to this many bytes
+        f"PRAGMA mmap_size={int(get('SQLITE_MMAP_SIZE', str(128 * 1024 * 1024)))}",
+        # Page cache per connection; negative values are in KiB
+        f"PRAGMA cache_size={int(get('SQLITE_CACHE_SIZE', '-20000'))}",
+    ]
+    return pragmas
+
+
+def database_config(env, base_dir, prefix='DB_'):
+    """Return one DATABASES entry from env, reading variables with the given prefix"""
+    def get(key, default=''):
+        value = env.get(prefix + key)
+        if value is None:
+            value = env.get('DB_' + key, default)
+        return str(value).strip()
+
+    engine = get('ENGINE', 'sqlite')
+    engine = ENGINES.get(engine, engine)
+
+    if engine == 'django.db.backends.sqlite3':
+        name = Path(get('NAME', 'db.sqlite3'))
+        config = {
+            'ENGINE': engine,
+            'NAME': name if name.is_absolute() else Path(base_dir) / name,
+            'OPTIONS': {
+                'init_command': '; '.join(sqlite_pragmas(get)),
+            },
+        }
+
+        # A deferred transaction that reads before it writes cannot wait for
+        # the write lock and fails with "database is locked" straight away;
+        # IMMEDIATE takes the lock at BEGIN, where the busy timeout applies
+        transaction_mode = get('SQLITE_TRANSACTION_MODE', 'IMMEDIATE').upper()
+        if transaction_mode not in SQLITE_TRANSACTION_MODES:
+            raise ImproperlyConfigured(
+                f"DB_SQLITE_TRANSACTION_MODE must be one of {', '.join(SQLITE_TRANSACTION_MODES)}"
+            )
+        config['OPTIONS']['transaction_mode'] = transaction_mode
+        return config
+
+    config = {
+        'ENGINE': engine,
+        'NAME': get('NAME', 'bachatbuddy'),
+        'USER': get('USER'),
+        'PASSWORD': get('PASSWORD'),
+        'HOST': get('HOST', 'localhost'),
+        'PORT': get('PORT', DEFAULT_PORTS.get(engine, '')),
+        # Keep connections open between requests and check them before reuse
+        'CONN_MAX_AGE': int(get('CONN_MAX_AGE', '60')),
+        'CONN_HEALTH_CHECKS': _flag(get('CONN_HEALTH_CHECKS', 'True')),
+        'OPTIONS': {},
+    }
+
+    if engine == 'django.db.backends.postgresql':
+        if _flag(get('POOL', 'False')):
+            # psycopg's pool hands connections out per request, which
+            # replaces persistent connections
+            config['CONN_MAX_AGE'] = 0
+            config['OPTIONS']['pool'] = {
+                'min_size': int(get('POOL_MIN_SIZE', '2')),
+                'max_size': int(get('POOL_MAX_SIZE', '10')),
+                'timeout': int(get('POOL_TIMEOUT', '10')),
+            }
+    elif engine == 'django.db.backends.mysql':
+        config['OPTIONS'] = {
+            'init_command': "SET sql_mode='STRICT_TRANS_TABLES'",
+            'charset': 'utf8mb4',
+        }
+
+    return config
+
+
+def databases(env, base_dir):
+    """Return DATABASES with the default database and, if configured, the replica"""
+    result = {'default': database_config(env, base_dir)}
+
+    if env.get('DB_REPLICA_NAME'):
+        replica = database_config(env, base_dir, prefix='DB_REPLICA_')
+        # Tests run against the default database only
+        replica['TEST'] = {'MIRROR': 'default'}
+        result['replica'] = replica
+
+    return result
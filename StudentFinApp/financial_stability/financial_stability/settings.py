@@ -14,6 +14,8 @@ from pathlib import Path
 import os
 from dotenv import load_dotenv
 
+from .database import databases
+
 # Load environment variables from .env file
 load_dotenv()
 
@@ -46,16 +48,21 @@ INSTALLED_APPS = [
     'django.contrib.contenttypes',
     'django.contrib.sessions',
     'django.contrib.messages',
+    # Lets runserver serve static files through WhiteNoise as well
+    'whitenoise.runserver_nostatic',
     'django.contrib.staticfiles',
     'core',
 ]
 
 MIDDLEWARE = [
+    'core.middleware.QueryMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.StaticFilesMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.middleware.UserTimezoneMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -83,27 +90,70 @@ WSGI_APPLICATION = 'financial_stability.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
+# SQLite (in WAL mode) by default; set DB_ENGINE to postgresql or mysql and
+# the DB_* variables in .env-example for a server database. Setting
+# DB_REPLICA_NAME adds a 'replica' database for report and dashboard reads.
+
+DATABASES = databases(os.environ, BASE_DIR)
+
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+
+# Alias that ReplicaRouter sends reads to, or None to read from 'default'
+DATABASE_REPLICA = 'replica' if 'replica' in DATABASES else None
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Local memory by default; set CACHE_BACKEND to
+# django.core.cache.backends.filebased.FileBasedCache and CACHE_LOCATION to a
+# directory to share the cache between worker processes without extra services.
+
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', 'bachatbuddy'),
     }
 }
 
-# Uncomment this section when you want to use MySQL
-# DATABASES = {
-#     'default': {
-#         'ENGINE': os.environ.get('DB_ENGINE', 'django.db.backends.mysql'),
-#         'NAME': os.environ.get('DB_NAME', 'bachatbuddy'),
-#         'USER': os.environ.get('DB_USER', 'bbuser'),
-#         'PASSWORD': os.environ.get('DB_PASSWORD', 'bbpassword'),
-#         'HOST': os.environ.get('DB_HOST', 'localhost'),
-#         'PORT': os.environ.get('DB_PORT', '3306'),
-#         'OPTIONS': {
-#             'init_command': "SET sql_mode='STRICT_TRANS_TABLES'",
-#         },
-#     }
-# }
+# Seconds a computed dashboard stays cached; entries are also invalidated
+# as soon as the user's data changes
+DASHBOARD_CACHE_TIMEOUT = int(os.environ.get('DASHBOARD_CACHE_TIMEOUT', 900))
+
+
+# Request metrics
+# Share of requests (0.0 - 1.0) whose queries and timings are recorded by
+# core.middleware.QueryMetricsMiddleware; staff can read them at /debug/queries/
+
+QUERY_METRICS_SAMPLE_RATE = float(os.environ.get('QUERY_METRICS_SAMPLE_RATE', 1.0 if DEBUG else 0.1))
+
+# Add a Server-Timing header with SQL and total time to sampled responses
+QUERY_METRICS_SERVER_TIMING = os.environ.get('QUERY_METRICS_SERVER_TIMING', str(DEBUG)) == 'True'
+
+# Sampled requests slower or chattier than this are logged as warnings
+QUERY_METRICS_SLOW_MS = int(os.environ.get('QUERY_METRICS_SLOW_MS', 500))
+QUERY_METRICS_MAX_QUERIES = int(os.environ.get('QUERY_METRICS_MAX_QUERIES', 50))
+
+
+# Logging
+# https://docs.djangoproject.com/en/5.2/topics/logging/
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'core.metrics': {
+            'handlers': ['console'],
+            # Set to INFO to log every sampled request, not only slow ones
+            'level': os.environ.get('QUERY_METRICS_LOG_LEVEL', 'WARNING'),
+            'propagate': False,
+        },
+    },
+}
 
 
 # Password validation
@@ -144,6 +194,27 @@ STATIC_URL = 'static/'
 STATICFILES_DIRS = [BASE_DIR / 'static']
 STATIC_ROOT = BASE_DIR / 'staticfiles'
 
+# In production collectstatic gives every file a name with a hash of its
+# content and writes .gz and .br (with the Brotli package) copies next to it.
+# Development, and tests run from a development setup, link the files by
+# their plain names, so no collectstatic run is needed there.
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': (
+            'django.contrib.staticfiles.storage.StaticFilesStorage' if DEBUG
+            else 'whitenoise.storage.CompressedManifestStaticFilesStorage'
+        ),
+    },
+}
+
+# Seconds browsers may cache static files without a hash in their name.
+# Hashed files change name whenever their content does, so WhiteNoise marks
+# them immutable and lets browsers keep them for years without asking again.
+WHITENOISE_MAX_AGE = int(os.environ.get('WHITENOISE_MAX_AGE', 0 if DEBUG else 60))
+
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
@@ -24,6 +24,6 @@ urlpatterns = [
     path('', include('core.urls')),
 ]
 
+# Static files are served by core.middleware.StaticFilesMiddleware
 if settings.DEBUG:
-    urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
     urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
@@ -1,96 +1,236 @@
+"""
+Demo server for the offline kiosks: serves the home and dashboard templates
+as plain pages, plus the static files, without Django.
+
+Pages are preprocessed once and kept in memory until their template changes
+on disk. Static files are sent straight from disk with sendfile. Both answer
+conditional requests with 304 Not Modified, and every client gets its own
+thread.
+"""
+
+import argparse
+import email.utils
+import hashlib
 import http.server
-import socketserver
+import mimetypes
 import os
 import sys
+import threading
 import webbrowser
-from urllib.parse import urlparse, parse_qs
+from urllib.parse import unquote, urlparse
 
 PORT = 8000
 
-class FinancialAppHandler(http.server.SimpleHTTPRequestHandler):
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
+STATIC_DIR = os.path.join(BASE_DIR, 'static')
+
+# URL path: (template, page title)
+PAGES = {
+    '/': ('home.html', 'Student Financial Stability - Home'),
+    '/dashboard/': ('dashboard.html', 'Dashboard - Student Financial Stability'),
+}
+
+# Seconds browsers may use a static file before checking it again
+STATIC_MAX_AGE = 60
+
+
+def render_page(content, title):
+    """Turn a Django template into a plain page by dropping its template tags"""
+    replacements = [
+        (b'{% extends "base.html" %}', b''),
+        (b'{% load static %}', b''),
+        (b'{% block title %}' + title.encode() + b'{% endblock %}', b'<title>' + title.encode() + b'</title>'),
+        (b'{% block content %}', b''),
+        (b'{% endblock %}', b''),
+        (b'{% block extra_js %}', b'<script>'),
+        (b'{% static', b'static'),
+        (b'%}', b''),
+    ]
+    for old, new in replacements:
+        content = content.replace(old, new)
+    return content
+
+
+def http_date(timestamp):
+    return email.utils.formatdate(timestamp, usegmt=True)
+
+
+class Page:
+    """A rendered page and the validators sent with it"""
+
+    def __init__(self, body, mtime):
+        self.body = body
+        self.etag = '"%s"' % hashlib.md5(body).hexdigest()
+        self.last_modified = mtime
+
+
+class PageCache:
+    """Rendered pages, rendered again when their template's mtime or size changes"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pages = {}
+
+    def get(self, template, title):
+        path = os.path.join(TEMPLATES_DIR, template)
+        stat = os.stat(path)
+        key = (stat.st_mtime_ns, stat.st_size)
+
+        with self.lock:
+            cached = self.pages.get(path)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+
+        with open(path, 'rb') as file:
+            page = Page(render_page(file.read(), title), stat.st_mtime)
+        with self.lock:
+            self.pages[path] = (key, page)
+        return page
+
+
+pages = PageCache()
+
+
+class FinancialAppHandler(http.server.BaseHTTPRequestHandler):
+    # Keep connections open between requests; every response has a length
+    protocol_version = 'HTTP/1.1'
+    # Close idle keep-alive connections so they don't hold a thread forever
+    timeout = 30
+
     def do_GET(self):
-        parsed_path = urlparse(self.path)
-        path = parsed_path.path
-        
-        # Serve homepage by default
-        if path == '/' or path == '':
-            self.send_response(200)
-            self.send_header('Content-type', 'text/html')
-            self.end_headers()
-            with open('templates/home.html', 'rb') as file:
-                content = file.read()
-                # Replace template tags with actual content
-                content = content.replace(b'{% extends "base.html" %}', b'')
-                content = content.replace(b'{% load static %}', b'')
-                content = content.replace(b'{% block title %}Student Financial Stability - Home{% endblock %}', b'<title>Student Financial Stability - Home</title>')
-                content = content.replace(b'{% block content %}', b'')
-                content = content.replace(b'{% endblock %}', b'')
-                content = content.replace(b'{% block extra_js %}', b'<script>')
-                content = content.replace(b'{% endblock %}', b'</script>')
-                content = content.replace(b'{% static', b'static')
-                content = content.replace(b'%}', b'')
-                self.wfile.write(content)
+        self.handle_request(send_body=True)
+
+    def do_HEAD(self):
+        self.handle_request(send_body=False)
+
+    def handle_request(self, send_body):
+        path = unquote(urlparse(self.path).path)
+
+        # Serve the homepage and dashboard
+        page_path = path if path.endswith('/') else path + '/'
+        if page_path in PAGES:
+            self.send_page(*PAGES[page_path], send_body=send_body)
             return
-            
-        # Serve dashboard
-        elif path == '/dashboard/' or path == '/dashboard':
+
+        # Serve static files
+        if path.startswith('/static/'):
+            file_path = self.static_path(path[len('/static/'):])
+            if file_path is not None:
+                self.send_static(file_path, send_body)
+                return
+
+        # Nothing else is served: the project directory holds .env and the database
+        self.send_error(404)
+
+    def send_page(self, template, title, send_body):
+        page = pages.get(template, title)
+        if self.not_modified(page.etag, page.last_modified):
+            self.send_not_modified(page.etag, page.last_modified, 'no-cache')
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(page.body)))
+        self.send_validators(page.etag, page.last_modified, 'no-cache')
+        self.end_headers()
+        if send_body:
+            self.wfile.write(page.body)
+
+    def static_path(self, name):
+        """Absolute path of a file under STATIC_DIR, or None"""
+        path = os.path.realpath(os.path.join(STATIC_DIR, name))
+        if os.path.commonpath([path, STATIC_DIR]) != STATIC_DIR or not os.path.isfile(path):
+            return None
+        return path
+
+    def send_static(self, path, send_body):
+        with open(path, 'rb') as file:
+            stat = os.fstat(file.fileno())
+            etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+            cache_control = f'public, max-age={STATIC_MAX_AGE}'
+            if self.not_modified(etag, stat.st_mtime):
+                self.send_not_modified(etag, stat.st_mtime, cache_control)
+                return
+
             self.send_response(200)
-            self.send_header('Content-type', 'text/html')
+            self.send_header('Content-Type', self.content_type(path))
+            self.send_header('Content-Length', str(stat.st_size))
+            self.send_validators(etag, stat.st_mtime, cache_control)
             self.end_headers()
-            with open('templates/dashboard.html', 'rb') as file:
-                content = file.read()
-                # Replace template tags with actual content
-                content = content.replace(b'{% extends "base.html" %}', b'')
-                content = content.replace(b'{% load static %}', b'')
-                content = content.replace(b'{% block title %}Dashboard - Student Financial Stability{% endblock %}', b'<title>Dashboard - Student Financial Stability</title>')
-                content = content.replace(b'{% block content %}', b'')
-                content = content.replace(b'{% endblock %}', b'')
-                content = content.replace(b'{% block extra_js %}', b'<script>')
-                content = content.replace(b'{% endblock %}', b'</script>')
-                content = content.replace(b'{% static', b'static')
-                content = content.replace(b'%}', b'')
-                self.wfile.write(content)
-            return
-            
-        # Serve static files
-        elif path.startswith('/static/'):
+            if send_body:
+                # Copies from the file to the socket in the kernel where it can
+                self.connection.sendfile(file)
+
+    def content_type(self, path):
+        content_type, encoding = mimetypes.guess_type(path)
+        if content_type is None or encoding is not None:
+            return 'application/octet-stream'
+        if content_type.startswith('text/') or content_type in ('application/javascript', 'application/json'):
+            content_type += '; charset=utf-8'
+        return content_type
+
+    def not_modified(self, etag, mtime):
+        """Whether the client's cached copy, going by its request headers, is current"""
+        if_none_match = self.headers.get('If-None-Match')
+        if if_none_match is not None:
+            # If-None-Match takes precedence over If-Modified-Since
+            tags = [tag.strip() for tag in if_none_match.split(',')]
+            return '*' in tags or etag in tags or f'W/{etag}' in tags
+
+        if_modified_since = self.headers.get('If-Modified-Since')
+        if if_modified_since is not None:
             try:
-                file_path = path[1:]  # Remove leading /
-                with open(file_path, 'rb') as file:
-                    self.send_response(200)
-                    if path.endswith('.css'):
-                        self.send_header('Content-type', 'text/css')
-                    elif path.endswith('.js'):
-                        self.send_header('Content-type', 'application/javascript')
-                    elif path.endswith('.png') or path.endswith('.jpg') or path.endswith('.jpeg'):
-                        self.send_header('Content-type', 'image/png')
-                    else:
-                        self.send_header('Content-type', 'text/plain')
-                    self.end_headers()
-                    self.wfile.write(file.read())
-                    return
-            except FileNotFoundError:
-                pass
-        
-        # Default handling for other paths
-        return http.server.SimpleHTTPRequestHandler.do_GET(self)
-
-print(f"Starting server at http://localhost:{PORT}")
-print("Visit:")
-print(f"- Home page: http://localhost:{PORT}/")
-print(f"- Dashboard: http://localhost:{PORT}/dashboard/")
-print("Press Ctrl+C to stop the server")
-
-# Open browser automatically
-webbrowser.open(f"http://localhost:{PORT}/")
-
-# Create server
-handler = FinancialAppHandler
-httpd = socketserver.TCPServer(("", PORT), handler)
-
-try:
-    httpd.serve_forever()
-except KeyboardInterrupt:
-    print("\nServer stopped.")
-    httpd.server_close()
-    sys.exit(0) 
\ No newline at end of file
+                since = email.utils.parsedate_to_datetime(if_modified_since)
+            except (TypeError, ValueError):
+                return False
+            return int(mtime) <= since.timestamp()
+
+        return False
+
+    def send_not_modified(self, etag, mtime, cache_control):
+        self.send_response(304)
+        self.send_validators(etag, mtime, cache_control)
+        self.end_headers()
+
+    def send_validators(self, etag, mtime, cache_control):
+        self.send_header('ETag', etag)
+        self.send_header('Last-Modified', http_date(mtime))
+        self.send_header('Cache-Control', cache_control)
+
+
+class DemoServer(http.server.ThreadingHTTPServer):
+    allow_reuse_address = True
+    # Connections waiting to be accepted while every thread is busy starting up
+    request_queue_size = 64
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Serve the demo pages without Django')
+    parser.add_argument('--port', type=int, default=PORT, help='Port to listen on')
+    parser.add_argument('--no-browser', action='store_true', help="Don't open a browser window")
+    args = parser.parse_args(argv)
+
+    httpd = DemoServer(('', args.port), FinancialAppHandler)
+
+    print(f"Starting server at http://localhost:{args.port}")
+    print("Visit:")
+    print(f"- Home page: http://localhost:{args.port}/")
+    print(f"- Dashboard: http://localhost:{args.port}/dashboard/")
+    print("Press Ctrl+C to stop the server")
+
+    # Open browser automatically
+    if not args.no_browser:
+        webbrowser.open(f"http://localhost:{args.port}/")
+
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        print("\nServer stopped.")
+    finally:
+        httpd.server_close()
+    sys.exit(0)
+
+
+if __name__ == '__main__':
+    main()